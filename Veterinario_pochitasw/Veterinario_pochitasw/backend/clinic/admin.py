@@ -1,6 +1,18 @@
+import io
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Usuario, Cliente, Veterinario, Mascota, Cita, Atencion, ListaEspera, Producto, Venta, DetalleVenta
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from . import importacion
+from .forms import ImportarClientesForm
+from .models import (
+    Usuario, Cliente, Veterinario, Mascota, Cita, Atencion, ListaEspera, Producto, Venta, DetalleVenta,
+    FeriadoManual
+)
 
 class UsuarioAdmin(UserAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name', 'rol', 'is_staff')
@@ -16,6 +28,53 @@ class ClienteAdmin(admin.ModelAdmin):
     list_display = ('rut', 'nombre', 'apellido', 'telefono', 'email')
     search_fields = ('rut', 'nombre', 'apellido')
     inlines = [MascotaInline]
+    change_list_template = 'admin/clinic/cliente/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('importar/', self.admin_site.admin_view(self.importar_view), name='clinic_cliente_importar'),
+        ] + super().get_urls()
+
+    def importar_view(self, request):
+        """Importación masiva de clientes y mascotas (clinic.importacion)."""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        resultado = None
+        form = ImportarClientesForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            archivo = form.cleaned_data['archivo']
+            texto = io.TextIOWrapper(archivo.file, encoding='utf-8-sig', newline='')
+            try:
+                resultado = importacion.importar(
+                    importacion.leer_filas(texto, importacion.formato_de(archivo.name)),
+                    contrasenas_temporales=form.cleaned_data['contrasenas_temporales'],
+                    simular=form.cleaned_data['simular'],
+                )
+            except importacion.ERRORES_LECTURA as e:
+                form.add_error('archivo', f"No se pudo leer el archivo: {e}")
+            else:
+                if form.cleaned_data['contrasenas_temporales']:
+                    # Única oportunidad de ver las contraseñas: no se guardan en claro
+                    response = HttpResponse(content_type='text/csv; charset=utf-8')
+                    response['Content-Disposition'] = 'attachment; filename="contrasenas_temporales.csv"'
+                    response['Cache-Control'] = 'no-store'
+                    resultado.escribir_credenciales(response)
+                    return response
+                if form.cleaned_data['descargar_reporte']:
+                    response = HttpResponse(content_type='text/csv; charset=utf-8')
+                    response['Content-Disposition'] = 'attachment; filename="errores_importacion.csv"'
+                    resultado.escribir_reporte(response)
+                    return response
+
+        return TemplateResponse(request, 'admin/clinic/cliente/importar.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Importar clientes y mascotas',
+            'form': form,
+            'resultado': resultado,
+            'errores': resultado.errores[:200] if resultado else [],
+        })
 
 class VeterinarioAdmin(admin.ModelAdmin):
     list_display = ('rut', 'nombre', 'especialidad', 'telefono')
@@ -36,6 +95,11 @@ class VentaAdmin(admin.ModelAdmin):
     list_display = ('id', 'cliente', 'fecha', 'total')
     inlines = [DetalleVentaInline]
 
+class FeriadoManualAdmin(admin.ModelAdmin):
+    list_display = ('fecha', 'nombre', 'es_feriado')
+    list_filter = ('es_feriado',)
+    date_hierarchy = 'fecha'
+
 admin.site.register(Usuario, UsuarioAdmin)
 admin.site.register(Cliente, ClienteAdmin)
 admin.site.register(Veterinario, VeterinarioAdmin)
@@ -45,3 +109,4 @@ admin.site.register(Atencion, AtencionAdmin)
 admin.site.register(ListaEspera)
 admin.site.register(Producto)
 admin.site.register(Venta, VentaAdmin)
+admin.site.register(FeriadoManual, FeriadoManualAdmin)
@@ -0,0 +1,544 @@
+"""
+Motor de agenda: disponibilidad de bloques horarios y detección de conflictos.
+
+La ocupación de un rango de días se carga con una sola consulta y se
+representa en memoria como un bitmap por (veterinario, día), donde el bit
+``i`` indica que el bloque ``i`` (de 30 minutos desde la apertura) está
+ocupado.
+
+Para validar conflictos se mantiene además un índice de intervalos ocupados
+por (veterinario, día), ordenado por hora de inicio, que responde en
+O(log n) si un horario choca con otra cita y cuál es el próximo horario libre.
+"""
+import threading
+import time as reloj
+from bisect import bisect_left
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+HORA_APERTURA = 9
+HORA_CIERRE = 20
+MINUTOS_BLOQUE = 30
+BLOQUES_POR_DIA = (HORA_CIERRE - HORA_APERTURA) * 60 // MINUTOS_BLOQUE
+
+# Estados de cita que bloquean un horario
+ESTADOS_ACTIVOS = ['AGENDADA', 'CONFIRMADA']
+
+# Máximo de días que se pueden consultar en una sola petición
+MAX_DIAS_CONSULTA = 31
+
+# Duración en minutos de cada tipo de cita.
+# Se puede sobrescribir parcialmente con settings.CLINIC_DURACION_CITAS
+DURACION_POR_TIPO = {
+    'CONSULTA': 30,
+    'CONTROL': 30,
+    'VACUNA': 15,
+    'CIRUGIA': 120,
+    'URGENCIA': 45,
+}
+DURACION_POR_DEFECTO = 30
+
+# Segundos que un día cargado en el índice se considera vigente aunque su
+# semana no haya cambiado de versión (resguardo por si la caché se vacía).
+INDICE_TTL_SEGUNDOS = 60
+
+# Días hacia adelante en que se busca un horario libre
+MAX_DIAS_BUSQUEDA = 30
+
+
+def duracion_cita(tipo):
+    """Retorna la duración (timedelta) de una cita según su tipo."""
+    duraciones = {**DURACION_POR_TIPO, **getattr(settings, 'CLINIC_DURACION_CITAS', {})}
+    return timedelta(minutes=duraciones.get(tipo, DURACION_POR_DEFECTO))
+
+
+def inicio_bloque(fecha, indice):
+    """
+    Retorna el datetime (naive, hora local) en que comienza un bloque.
+
+    Args:
+        fecha (date): Día del bloque
+        indice (int): Índice del bloque (0 = apertura)
+    """
+    minutos = HORA_APERTURA * 60 + indice * MINUTOS_BLOQUE
+    return datetime.combine(fecha, time(minutos // 60, minutos % 60))
+
+
+def indice_bloque(fecha_hora):
+    """
+    Retorna el índice del bloque en que cae una fecha/hora local,
+    o None si está fuera del horario de atención.
+    """
+    minutos = fecha_hora.hour * 60 + fecha_hora.minute - HORA_APERTURA * 60
+    if minutos < 0:
+        return None
+    indice = minutos // MINUTOS_BLOQUE
+    return indice if indice < BLOQUES_POR_DIA else None
+
+
+def mascara_intervalo(inicio_local, duracion):
+    """
+    Bitmap de los bloques del día que se solapan con un intervalo.
+
+    Args:
+        inicio_local (datetime): Inicio en hora local
+        duracion (timedelta): Duración del intervalo
+    """
+    apertura = HORA_APERTURA * 60
+    inicio = inicio_local.hour * 60 + inicio_local.minute - apertura
+    fin = inicio + int(duracion.total_seconds() // 60)
+    primero = max(inicio, 0) // MINUTOS_BLOQUE
+    ultimo = min(-(-fin // MINUTOS_BLOQUE), BLOQUES_POR_DIA)
+    if fin <= 0 or primero >= ultimo:
+        return 0
+    return ((1 << (ultimo - primero)) - 1) << primero
+
+
+def rango_dias(desde, hasta):
+    """Lista de fechas entre desde y hasta (ambas inclusive)."""
+    return [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+
+
+def cargar_ocupacion(desde, hasta, veterinario_ids=None):
+    """
+    Carga en una sola consulta las citas activas del rango y calcula los
+    bloques ocupados.
+
+    Args:
+        desde (date): Primer día (inclusive)
+        hasta (date): Último día (inclusive)
+        veterinario_ids (list, optional): Restringir a estos veterinarios
+
+    Returns:
+        dict: {(veterinario_id, fecha): bitmap}
+    """
+    from .models import Cita
+
+    inicio = timezone.make_aware(datetime.combine(desde, time.min))
+    fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+
+    citas = Cita.objects.filter(
+        fecha_hora__gte=inicio,
+        fecha_hora__lt=fin,
+        estado__in=ESTADOS_ACTIVOS
+    )
+    if veterinario_ids:
+        citas = citas.filter(veterinario_id__in=veterinario_ids)
+
+    ocupacion = {}
+    for veterinario_id, fecha_hora, tipo in citas.values_list('veterinario_id', 'fecha_hora', 'tipo'):
+        local = timezone.localtime(fecha_hora)
+        mascara = mascara_intervalo(local, duracion_cita(tipo))
+        if not mascara:
+            continue
+        clave = (veterinario_id, local.date())
+        ocupacion[clave] = ocupacion.get(clave, 0) | mascara
+    return ocupacion
+
+
+def bloques_dia(fecha, bitmap):
+    """
+    Expande el bitmap de un día a la lista de bloques que consume el frontend.
+
+    Returns:
+        list: [{'hora': 'HH:MM', 'datetime': ISO, 'disponible': bool}, ...]
+    """
+    bloques = []
+    for indice in range(BLOQUES_POR_DIA):
+        inicio = inicio_bloque(fecha, indice)
+        bloques.append({
+            'hora': inicio.strftime('%H:%M'),
+            'datetime': inicio.isoformat(),
+            'disponible': not (bitmap >> indice) & 1
+        })
+    return bloques
+
+
+def calcular_disponibilidad(desde, hasta, veterinario_ids=None):
+    """
+    Calcula la disponibilidad de uno o varios veterinarios en un rango de días.
+
+    Si no se indican veterinarios, un bloque se considera ocupado cuando
+    cualquier veterinario tiene una cita en él (clave None).
+
+    Returns:
+        dict: {fecha: {veterinario_id: bitmap}}
+    """
+    ocupacion = cargar_ocupacion(desde, hasta, veterinario_ids)
+
+    if not veterinario_ids:
+        agregado = {}
+        for (_, dia), bitmap in ocupacion.items():
+            agregado[(None, dia)] = agregado.get((None, dia), 0) | bitmap
+        ocupacion = agregado
+        veterinario_ids = [None]
+
+    return {
+        fecha: {vet_id: ocupacion.get((vet_id, fecha), 0) for vet_id in veterinario_ids}
+        for fecha in rango_dias(desde, hasta)
+    }
+
+
+class IntervalosDia:
+    """
+    Intervalos ocupados de un veterinario en un día, ordenados por inicio.
+
+    Además de los inicios se guarda el máximo acumulado de los fines, lo que
+    permite responder si un intervalo se solapa con alguno existente con una
+    búsqueda binaria, aun cuando existan citas antiguas que se solapan entre sí.
+    """
+
+    def __init__(self):
+        self.inicios = []
+        self.fines = []
+        self.ids = []
+        self.max_fin = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _recalcular_desde(self, posicion):
+        maximo = self.max_fin[posicion - 1] if posicion > 0 else None
+        for i in range(posicion, len(self.fines)):
+            maximo = self.fines[i] if maximo is None else max(maximo, self.fines[i])
+            self.max_fin[i] = maximo
+
+    def insertar(self, inicio, fin, cita_id):
+        posicion = bisect_left(self.inicios, inicio)
+        self.inicios.insert(posicion, inicio)
+        self.fines.insert(posicion, fin)
+        self.ids.insert(posicion, cita_id)
+        self.max_fin.insert(posicion, fin)
+        self._recalcular_desde(posicion)
+
+    def eliminar(self, cita_id):
+        if cita_id not in self.ids:
+            return
+        posicion = self.ids.index(cita_id)
+        for lista in (self.inicios, self.fines, self.ids, self.max_fin):
+            del lista[posicion]
+        self._recalcular_desde(posicion)
+
+    def conflicto(self, inicio, fin, excluir=None):
+        """
+        Retorna (inicio, fin, cita_id) de una cita que se solapa con
+        [inicio, fin), o None si el horario está libre.
+        """
+        # Candidatas: citas que comienzan antes de que termine el intervalo
+        j = bisect_left(self.inicios, fin) - 1
+        while j >= 0 and self.max_fin[j] > inicio:
+            if self.fines[j] > inicio and self.ids[j] != excluir:
+                return self.inicios[j], self.fines[j], self.ids[j]
+            j -= 1
+        return None
+
+    def siguiente_libre(self, desde, duracion, limite, excluir=None):
+        """
+        Primer inicio alineado a bloques, a partir de `desde`, en que cabe
+        un intervalo de `duracion` sin superar `limite`. None si no hay.
+        """
+        paso = timedelta(minutes=MINUTOS_BLOQUE)
+        candidato = desde
+        while candidato + duracion <= limite:
+            choque = self.conflicto(candidato, candidato + duracion, excluir)
+            if choque is None:
+                return candidato
+            # Saltar al primer bloque que comienza después del choque
+            while candidato < choque[1]:
+                candidato += paso
+        return None
+
+
+class IndiceAgenda:
+    """
+    Índice en memoria de intervalos ocupados por (veterinario, día).
+
+    Los días se cargan desde la base de datos bajo demanda (una consulta por
+    día o rango) y se mantienen actualizados con las señales de Cita. Cada día
+    recuerda la versión de su semana en el calendario (ver calendario.py) al
+    momento de cargarse: si otro worker cambia una cita, la versión sube al
+    confirmarse y el día se recarga en la próxima consulta.
+    """
+
+    def __init__(self):
+        self._dias = {}
+        self._cargado_en = {}
+        self._version = {}
+        self._ubicacion = {}
+        self._lock = threading.RLock()
+
+    def limpiar(self):
+        with self._lock:
+            self._dias.clear()
+            self._cargado_en.clear()
+            self._version.clear()
+            self._ubicacion.clear()
+
+    def _versiones(self, desde, hasta):
+        from .calendario import semanas_entre, versiones
+
+        return versiones(semanas_entre(desde, hasta))[1]
+
+    def _vigente(self, clave, versiones):
+        from .calendario import lunes_de
+
+        cargado = self._cargado_en.get(clave)
+        return (
+            cargado is not None
+            and reloj.monotonic() - cargado < INDICE_TTL_SEGUNDOS
+            and self._version.get(clave) == versiones.get(lunes_de(clave[1]))
+        )
+
+    def cargar(self, veterinario_ids, desde, hasta, versiones=None):
+        """
+        Carga (o recarga) en una sola consulta los días de un rango para
+        varios veterinarios.
+        """
+        from .calendario import lunes_de
+        from .models import Cita
+
+        # Las versiones se leen antes que las citas: un cambio confirmado
+        # entre ambas lecturas deja el día marcado con la versión anterior
+        if versiones is None:
+            versiones = self._versiones(desde, hasta)
+        inicio = timezone.make_aware(datetime.combine(desde, time.min))
+        fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+        citas = Cita.objects.filter(
+            veterinario_id__in=veterinario_ids,
+            fecha_hora__gte=inicio,
+            fecha_hora__lt=fin,
+            estado__in=ESTADOS_ACTIVOS
+        ).values_list('id', 'veterinario_id', 'fecha_hora', 'tipo')
+
+        with self._lock:
+            ahora = reloj.monotonic()
+            for vet_id in veterinario_ids:
+                for fecha in rango_dias(desde, hasta):
+                    clave = (vet_id, fecha)
+                    anterior = self._dias.get(clave)
+                    if anterior is not None:
+                        for cita_id in anterior.ids:
+                            self._ubicacion.pop(cita_id, None)
+                    self._dias[clave] = IntervalosDia()
+                    self._cargado_en[clave] = ahora
+                    self._version[clave] = versiones.get(lunes_de(fecha))
+            for cita_id, vet_id, fecha_hora, tipo in citas:
+                self._agregar(cita_id, vet_id, fecha_hora, tipo)
+
+    def rango(self, veterinario_id, desde, hasta):
+        """
+        Retorna {fecha: intervalos} de un veterinario en un rango. Si algún
+        día no está vigente, el rango completo se recarga en una sola consulta.
+        """
+        veterinario_id = int(veterinario_id)
+        fechas = list(rango_dias(desde, hasta))
+        versiones = self._versiones(desde, hasta)
+        with self._lock:
+            if not all(self._vigente((veterinario_id, fecha), versiones) for fecha in fechas):
+                self.cargar([veterinario_id], desde, hasta, versiones)
+            return {fecha: self._dias[(veterinario_id, fecha)] for fecha in fechas}
+
+    def dia(self, veterinario_id, fecha):
+        """Retorna los intervalos de un veterinario en un día, cargándolos si hace falta."""
+        return self.rango(veterinario_id, fecha, fecha)[fecha]
+
+    def _agregar(self, cita_id, veterinario_id, fecha_hora, tipo):
+        inicio = timezone.localtime(fecha_hora)
+        clave = (veterinario_id, inicio.date())
+        intervalos = self._dias.get(clave)
+        if intervalos is None:
+            return
+        intervalos.insertar(inicio, inicio + duracion_cita(tipo), cita_id)
+        self._ubicacion[cita_id] = clave
+
+    def quitar(self, cita_id):
+        with self._lock:
+            clave = self._ubicacion.pop(cita_id, None)
+            if clave in self._dias:
+                self._dias[clave].eliminar(cita_id)
+
+    def actualizar(self, cita):
+        """Refleja en el índice el estado actual de una cita (llamado desde señales)."""
+        with self._lock:
+            self.quitar(cita.pk)
+            if cita.veterinario_id and cita.estado in ESTADOS_ACTIVOS:
+                fecha_hora = cita.fecha_hora
+                if isinstance(fecha_hora, str):
+                    fecha_hora = _como_aware(parse_datetime(fecha_hora))
+                self._agregar(cita.pk, cita.veterinario_id, fecha_hora, cita.tipo)
+
+    def conflicto(self, veterinario_id, fecha_hora, tipo=None, excluir=None):
+        """
+        Busca una cita del veterinario que se solape con una nueva cita.
+
+        Returns:
+            tuple | None: (inicio, fin, cita_id) de la cita en conflicto
+        """
+        inicio = timezone.localtime(fecha_hora)
+        intervalos = self.dia(veterinario_id, inicio.date())
+        with self._lock:
+            return intervalos.conflicto(inicio, inicio + duracion_cita(tipo), excluir)
+
+    def siguiente_libre(self, veterinario_id, desde, tipo=None, excluir=None):
+        """
+        Próximo horario libre del veterinario a partir de `desde`, dentro del
+        horario de atención y saltando domingos y feriados.
+
+        Returns:
+            datetime | None: Inicio (aware) del próximo horario libre
+        """
+        from .feriados import no_habiles
+
+        duracion = duracion_cita(tipo)
+        desde = timezone.localtime(desde)
+        fechas = [desde.date() + timedelta(days=dias) for dias in range(MAX_DIAS_BUSQUEDA + 1)]
+        cerrados = no_habiles(fechas)
+        por_dia = self.rango(veterinario_id, fechas[0], fechas[-1])
+        for dias, fecha in enumerate(fechas):
+            if fecha in cerrados:
+                continue
+            apertura = _como_aware(inicio_bloque(fecha, 0))
+            cierre = _como_aware(inicio_bloque(fecha, BLOQUES_POR_DIA))
+            inicio = apertura
+            if dias == 0 and desde > apertura:
+                # Alinear al siguiente bloque
+                minutos = (desde - apertura).total_seconds() / 60
+                inicio = apertura + timedelta(minutes=-(-minutos // MINUTOS_BLOQUE) * MINUTOS_BLOQUE)
+            with self._lock:
+                libre = por_dia[fecha].siguiente_libre(inicio, duracion, cierre, excluir)
+            if libre is not None:
+                return libre
+        return None
+
+
+def _como_aware(valor):
+    if valor is not None and timezone.is_naive(valor):
+        return timezone.make_aware(valor)
+    return valor
+
+
+# Índice compartido por el proceso
+indice_agenda = IndiceAgenda()
+
+
+def validar_conflicto(veterinario_id, fecha_hora, tipo=None, cita_id=None):
+    """
+    Valida si una cita nueva o reagendada choca con otra del mismo veterinario,
+    considerando la duración de cada tipo de cita.
+
+    El día se recarga desde la base de datos solo si su semana cambió de
+    versión desde que se cargó (por ejemplo, por un cambio en otro worker).
+
+    Returns:
+        tuple: (tiene_conflicto: bool, mensaje: str)
+    """
+    if not veterinario_id or not fecha_hora:
+        return False, ""
+
+    if isinstance(fecha_hora, str):
+        fecha_hora = parse_datetime(fecha_hora)
+    fecha_hora = _como_aware(fecha_hora)
+
+    choque = indice_agenda.conflicto(
+        veterinario_id, fecha_hora, tipo, excluir=cita_id and int(cita_id)
+    )
+    if choque is None:
+        return False, ""
+
+    mensaje = f"Conflicto: El veterinario ya tiene una cita a las {choque[0].strftime('%H:%M')}"
+    libre = indice_agenda.siguiente_libre(veterinario_id, fecha_hora, tipo, excluir=cita_id and int(cita_id))
+    if libre is not None:
+        mensaje += f". Próximo horario libre: {timezone.localtime(libre).strftime('%d/%m/%Y %H:%M')}"
+    return True, mensaje
+
+
+def validar_movimientos(movimientos, citas):
+    """
+    Valida en una sola pasada un lote de reagendamientos, entre sí y contra
+    la base de datos.
+
+    Args:
+        movimientos (list): [{'cita_id', 'veterinario_id', 'fecha_hora'}, ...]
+            con fecha_hora ya convertida a datetime aware (o None para mantenerla)
+        citas (dict): {cita_id: Cita} de las citas involucradas
+
+    Returns:
+        list: Un resultado por movimiento: {'cita_id', 'veterinario_id',
+        'fecha_hora', 'error'}, con error None si el movimiento es válido
+    """
+    from .feriados import no_habiles
+    from .models import Veterinario
+
+    # Veterinarios de destino que existen (una sola consulta)
+    vets_pedidos = {mov['veterinario_id'] for mov in movimientos if mov.get('veterinario_id')}
+    vets_existentes = set(
+        Veterinario.objects.filter(id__in=vets_pedidos).values_list('id', flat=True)
+    ) if vets_pedidos else set()
+
+    resultados = []
+    destinos = []
+    for mov in movimientos:
+        cita = citas.get(mov['cita_id'])
+        vet_id = mov.get('veterinario_id') or (cita.veterinario_id if cita else None)
+        fecha_hora = mov.get('fecha_hora') or (cita.fecha_hora if cita else None)
+        if not cita:
+            error = 'Cita no encontrada'
+        elif mov.get('veterinario_id') and mov['veterinario_id'] not in vets_existentes:
+            error = 'Veterinario no encontrado'
+        else:
+            error = None
+        resultados.append({
+            'cita_id': mov['cita_id'],
+            'veterinario_id': vet_id,
+            'fecha_hora': fecha_hora,
+            'error': error
+        })
+        if not error and vet_id and fecha_hora:
+            destinos.append((vet_id, timezone.localtime(fecha_hora).date()))
+
+    # Una sola consulta para todos los días y veterinarios de destino
+    indice = IndiceAgenda()
+    if destinos:
+        vet_ids = sorted({vet_id for vet_id, _ in destinos})
+        fechas = [fecha for _, fecha in destinos]
+        indice.cargar(vet_ids, min(fechas), max(fechas))
+    for mov in movimientos:
+        indice.quitar(mov['cita_id'])
+    cerrados = no_habiles(
+        timezone.localtime(r['fecha_hora']).date() for r in resultados if not r['error']
+    )
+
+    hoy = timezone.localdate()
+    ids_en_lote = set()
+    for resultado in resultados:
+        cita_id = resultado['cita_id']
+        if resultado['error']:
+            continue
+        cita = citas[cita_id]
+        vet_id, fecha_hora = resultado['veterinario_id'], resultado['fecha_hora']
+        dia = timezone.localtime(fecha_hora).date()
+
+        if cita_id in ids_en_lote:
+            resultado['error'] = 'La cita aparece más de una vez en el lote'
+        elif cita.estado not in ESTADOS_ACTIVOS:
+            resultado['error'] = f"La cita está {cita.get_estado_display().lower()}"
+        elif dia < hoy:
+            resultado['error'] = 'No se pueden reagendar citas a fechas pasadas.'
+        elif dia in cerrados and not cita.es_urgencia:
+            resultado['error'] = f"La fecha seleccionada {cerrados[dia]}. Solo se permiten urgencias."
+        elif vet_id:
+            choque = indice.conflicto(vet_id, fecha_hora, cita.tipo)
+            if choque is not None:
+                otra = 'otra cita del lote' if choque[2] in ids_en_lote else f'la cita #{choque[2]}'
+                resultado['error'] = f"Conflicto con {otra} a las {choque[0].strftime('%H:%M')}"
+        ids_en_lote.add(cita_id)
+
+        if resultado['error'] is None and vet_id:
+            with indice._lock:
+                indice._agregar(cita_id, vet_id, fecha_hora, cita.tipo)
+
+    return resultados
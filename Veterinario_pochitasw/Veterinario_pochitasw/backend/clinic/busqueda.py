@@ -0,0 +1,140 @@
+"""
+Búsqueda de clientes y mascotas para los campos typeahead de recepción.
+
+Todas las condiciones se resuelven con índices:
+
+- RUT y teléfono se comparan contra columnas normalizadas (solo dígitos),
+  por prefijo, de modo que "12.345.678-9", "12345678-9", "123456789" y
+  "012.345.678-9" encuentran al mismo cliente. El RUT usa la clave
+  canónica de clinic.rut (sin ceros a la izquierda).
+- Nombres y apellidos se comparan por prefijo contra índices sobre
+  LOWER(columna), usando un rango [texto, texto siguiente) que cualquier
+  índice B-tree puede recorrer (SQLite y PostgreSQL).
+- En PostgreSQL, los términos de 3 o más caracteres también buscan por
+  subcadena usando los índices trigram (pg_trgm) de la migración 0010.
+"""
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .rut import canonico as rut_canonico
+from .utils import normalizar_telefono
+
+
+BUSQUEDA_LIMITE_POR_DEFECTO = 20
+BUSQUEDA_LIMITE_MAXIMO = 50
+
+# Largo mínimo de un término para buscar por subcadena (trigramas)
+MIN_LARGO_TRIGRAMA = 3
+
+# Largo mínimo de una búsqueda numérica (RUT o teléfono)
+MIN_LARGO_NUMERICO = 3
+
+
+def usa_trigramas():
+    return connection.vendor == 'postgresql'
+
+
+def _rango_prefijo(prefijo):
+    """Rango [prefijo, siguiente) que contiene todos los textos que empiezan con prefijo."""
+    return prefijo, prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+
+
+def _prefijo(campo, prefijo):
+    desde, hasta = _rango_prefijo(prefijo)
+    return Q(**{f'{campo}__gte': desde, f'{campo}__lt': hasta})
+
+
+def _es_numerica(q):
+    return not any(c.isalpha() and c.upper() != 'K' for c in q) and any(c.isdigit() for c in q)
+
+
+def _condicion_texto(termino, campos):
+    """
+    Condición para un término de texto sobre varios campos (OR).
+
+    Args:
+        termino (str): Término en minúsculas
+        campos (dict): {alias anotado con Lower: nombre real del campo}
+    """
+    condicion = Q()
+    for alias, campo in campos.items():
+        condicion |= _prefijo(alias, termino)
+        if usa_trigramas() and len(termino) >= MIN_LARGO_TRIGRAMA:
+            condicion |= Q(**{f'{campo}__icontains': termino})
+    return condicion
+
+
+def _condicion_numerica(q, campo_rut, campo_telefono):
+    condicion = Q()
+    rut = rut_canonico(q)
+    if len(rut) >= MIN_LARGO_NUMERICO:
+        condicion |= _prefijo(campo_rut, rut)
+    telefono = normalizar_telefono(q)
+    if len(telefono) >= MIN_LARGO_NUMERICO:
+        condicion |= _prefijo(campo_telefono, telefono)
+    return condicion
+
+
+def buscar_clientes(q, limite=BUSQUEDA_LIMITE_POR_DEFECTO):
+    """
+    Busca clientes por RUT, teléfono, nombre o apellido.
+
+    Un texto con varias palabras exige que cada palabra coincida con el
+    nombre o el apellido ("juan pe" encuentra a Juan Pérez).
+
+    Returns:
+        QuerySet: Clientes ordenados por apellido y nombre, hasta `limite`
+    """
+    from .models import Cliente
+
+    q = (q or '').strip()
+    if not q:
+        return Cliente.objects.order_by('-id')[:limite]
+
+    if _es_numerica(q):
+        condicion = _condicion_numerica(q, 'rut_normalizado', 'telefono_normalizado')
+        if not condicion:
+            return Cliente.objects.none()
+        clientes = Cliente.objects.filter(condicion)
+    else:
+        clientes = Cliente.objects.annotate(nombre_l=Lower('nombre'), apellido_l=Lower('apellido'))
+        for termino in q.lower().split():
+            clientes = clientes.filter(_condicion_texto(termino, {'nombre_l': 'nombre', 'apellido_l': 'apellido'}))
+
+    return clientes.order_by('apellido', 'nombre', 'id')[:limite]
+
+
+def buscar_mascotas(q, limite=BUSQUEDA_LIMITE_POR_DEFECTO, cliente_id=None):
+    """
+    Busca mascotas por su nombre, o por el RUT/teléfono/nombre de su dueño.
+
+    Returns:
+        QuerySet: Mascotas (con su cliente) ordenadas por nombre, hasta `limite`
+    """
+    from .models import Mascota
+
+    q = (q or '').strip()
+    mascotas = Mascota.objects.select_related('cliente')
+    if cliente_id:
+        mascotas = mascotas.filter(cliente_id=cliente_id)
+
+    if q and _es_numerica(q):
+        condicion = _condicion_numerica(q, 'cliente__rut_normalizado', 'cliente__telefono_normalizado')
+        if not condicion:
+            return Mascota.objects.none()
+        mascotas = mascotas.filter(condicion)
+    elif q:
+        mascotas = mascotas.annotate(
+            nombre_l=Lower('nombre'), cliente_nombre_l=Lower('cliente__nombre'),
+            cliente_apellido_l=Lower('cliente__apellido')
+        )
+        campos = {
+            'nombre_l': 'nombre',
+            'cliente_nombre_l': 'cliente__nombre',
+            'cliente_apellido_l': 'cliente__apellido',
+        }
+        for termino in q.lower().split():
+            mascotas = mascotas.filter(_condicion_texto(termino, campos))
+
+    return mascotas.order_by('nombre', 'id')[:limite]
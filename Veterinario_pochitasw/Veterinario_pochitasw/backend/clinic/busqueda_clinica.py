@@ -0,0 +1,167 @@
+"""
+Búsqueda de texto completo en las atenciones (diagnóstico, tratamiento y
+medicamentos), para que los veterinarios encuentren casos anteriores.
+
+- PostgreSQL: un SearchVector por atención en clinic_atencion_busqueda
+  (modelo IndiceAtencion) con índice GIN. La configuración es_sin_acentos
+  (migración 0015) aplica unaccent y el stemmer español, así que
+  "fractúras" encuentra "fractura". El diagnóstico pesa más (A) que el
+  tratamiento y los medicamentos (B).
+- SQLite: una tabla FTS5 (clinic_atencion_fts) con remove_diacritics.
+  FTS5 no trae stemmer español; cada término se busca por prefijo.
+
+El índice se actualiza al guardar o eliminar una atención (señales) y
+se puede reconstruir con `manage.py indexar_atenciones`.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+
+BUSQUEDA_CLINICA_LIMITE_POR_DEFECTO = 20
+BUSQUEDA_CLINICA_LIMITE_MAXIMO = 100
+
+CONFIGURACION_TEXTO = 'es_sin_acentos'
+TABLA_FTS = 'clinic_atencion_fts'
+
+# Pesos de bm25 (SQLite) por columna: diagnóstico, tratamiento, medicamentos
+PESOS_FTS = (10.0, 5.0, 5.0)
+
+
+def usa_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def _vector():
+    return (
+        SearchVector('diagnostico', weight='A', config=CONFIGURACION_TEXTO)
+        + SearchVector('tratamiento', 'medicamentos', weight='B', config=CONFIGURACION_TEXTO)
+    )
+
+
+def indexar(ids):
+    """
+    Agrega o actualiza en el índice las atenciones indicadas.
+
+    Args:
+        ids (list): IDs de Atencion
+    """
+    from .models import Atencion
+
+    ids = list(ids)
+    if not ids:
+        return
+    atenciones = Atencion.objects.filter(id__in=ids)
+
+    with connection.cursor() as cursor:
+        if usa_postgres():
+            # Un solo INSERT ... SELECT: el vector se calcula en la base de datos
+            sql, params = atenciones.annotate(vector=_vector()).values('id', 'vector').query.sql_with_params()
+            cursor.execute(
+                f'INSERT INTO clinic_atencion_busqueda (atencion_id, vector) {sql} '
+                'ON CONFLICT (atencion_id) DO UPDATE SET vector = EXCLUDED.vector',
+                params
+            )
+        else:
+            filas = list(atenciones.values_list('id', 'diagnostico', 'tratamiento', 'medicamentos'))
+            cursor.execute(
+                f'DELETE FROM {TABLA_FTS} WHERE rowid IN ({", ".join(["%s"] * len(ids))})', ids
+            )
+            cursor.executemany(
+                f'INSERT INTO {TABLA_FTS} (rowid, diagnostico, tratamiento, medicamentos) VALUES (%s, %s, %s, %s)',
+                filas
+            )
+
+
+def quitar(ids):
+    """Quita atenciones eliminadas del índice (en PostgreSQL lo hace la FK)."""
+    ids = list(ids)
+    if not ids or usa_postgres():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLA_FTS} WHERE rowid IN ({", ".join(["%s"] * len(ids))})', ids)
+
+
+def sin_indexar():
+    """QuerySet de las atenciones que aún no están en el índice."""
+    from .models import Atencion
+
+    if usa_postgres():
+        return Atencion.objects.filter(indice_busqueda__isnull=True)
+    return Atencion.objects.exclude(id__in=RawSQL(f'SELECT rowid FROM {TABLA_FTS}', ()))
+
+
+def _consulta_fts(q):
+    """
+    Convierte el texto del usuario en una consulta FTS5: cada palabra se
+    busca por prefijo y todas deben aparecer. Se descartan los operadores
+    de FTS5 para que el texto no pueda romper la sintaxis.
+    """
+    terminos = re.findall(r'\w+', q)
+    return ' '.join(f'"{termino}"*' for termino in terminos)
+
+
+def buscar_atenciones(q, mascota_id=None, veterinario_id=None, desde=None, hasta=None,
+                      limite=BUSQUEDA_CLINICA_LIMITE_POR_DEFECTO):
+    """
+    Atenciones que coinciden con `q`, de la más a la menos relevante.
+
+    Args:
+        q (str): Texto a buscar
+        mascota_id (int): Solo atenciones de esta mascota (opcional)
+        veterinario_id (int): Solo atenciones de citas de este veterinario (opcional)
+        desde (datetime): Fecha mínima de la atención (opcional)
+        hasta (datetime): Fecha máxima, exclusiva (opcional)
+        limite (int): Máximo de resultados
+
+    Returns:
+        list: Atenciones con su cita, mascota y veterinario cargados, cada
+            una con el atributo `relevancia` (mayor es mejor)
+    """
+    from .models import Atencion
+
+    q = (q or '').strip()
+    atenciones = Atencion.objects.select_related('cita__mascota', 'cita__veterinario')
+    if mascota_id:
+        atenciones = atenciones.filter(cita__mascota_id=mascota_id)
+    if veterinario_id:
+        atenciones = atenciones.filter(cita__veterinario_id=veterinario_id)
+    if desde:
+        atenciones = atenciones.filter(fecha__gte=desde)
+    if hasta:
+        atenciones = atenciones.filter(fecha__lt=hasta)
+
+    if usa_postgres():
+        consulta = SearchQuery(q, config=CONFIGURACION_TEXTO, search_type='websearch')
+        return list(
+            atenciones.filter(indice_busqueda__vector=consulta)
+            .annotate(relevancia=SearchRank(F('indice_busqueda__vector'), consulta))
+            .order_by('-relevancia', '-fecha')[:limite]
+        )
+
+    consulta = _consulta_fts(q)
+    if not consulta:
+        return []
+    # Orden y límite en la misma consulta FTS, unida a las atenciones ya
+    # filtradas: solo vuelven a Python las `limite` más relevantes
+    filtradas, params = atenciones.values('id', 'fecha').query.sql_with_params()
+    pesos = ', '.join(['%s'] * len(PESOS_FTS))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT a.id, bm25({TABLA_FTS}, {pesos}) AS puntaje '
+            f'FROM {TABLA_FTS} JOIN ({filtradas}) a ON a.id = {TABLA_FTS}.rowid '
+            f'WHERE {TABLA_FTS} MATCH %s ORDER BY puntaje, a.fecha DESC LIMIT %s',
+            [*PESOS_FTS, *params, consulta, limite]
+        )
+        elegidos = cursor.fetchall()
+
+    por_id = atenciones.in_bulk([pk for pk, _ in elegidos])
+    resultado = []
+    for pk, puntaje in elegidos:
+        atencion = por_id[pk]
+        # bm25 es negativo: más negativo = más relevante
+        atencion.relevancia = -puntaje
+        resultado.append(atencion)
+    return resultado
@@ -0,0 +1,271 @@
+"""
+Caché en dos niveles, compartida entre los workers de gunicorn.
+
+- Nivel local: LRU en memoria del proceso, con un TTL corto. Evita ir al
+  nivel compartido para valores que se leen muchas veces seguidas (por
+  ejemplo, los eventos del calendario de una semana).
+- Nivel compartido: otra caché de CACHES (ver OPTIONS['COMPARTIDA']), que
+  ven todos los procesos. En settings se elige con CACHE_URL: archivos
+  (FileBasedCache, por defecto) o un servidor compatible con Redis.
+
+Las escrituras van a ambos niveles. Las claves que deben verse iguales en
+todos los procesos en cuanto cambian (contadores de django-ratelimit,
+sesiones, versiones del calendario) se configuran en
+OPTIONS['SOLO_COMPARTIDA'] y no se guardan en el nivel local.
+
+estadisticas() entrega los aciertos y fallos de cada nivel en este proceso.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+# Un nivel local por nombre de caché, compartido por los hilos del proceso
+_niveles_locales = {}
+_niveles_lock = threading.Lock()
+
+_AUSENTE = object()
+
+
+class NivelLocal:
+    """LRU en memoria con expiración, seguro entre hilos."""
+
+    def __init__(self, max_entradas, ttl):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return _AUSENTE
+            valor, expira = entrada
+            if expira <= time.monotonic():
+                del self._datos[clave]
+                return _AUSENTE
+            self._datos.move_to_end(clave)
+            return valor
+
+    def set(self, clave, valor, timeout=None):
+        ttl = self.ttl if timeout is None else min(self.ttl, timeout)
+        if ttl <= 0:
+            self.delete(clave)
+            return
+        with self._lock:
+            self._datos[clave] = (valor, time.monotonic() + ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def delete(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class Contadores:
+    """Contadores de aciertos y fallos, seguros entre hilos."""
+
+    CAMPOS = ('aciertos_local', 'aciertos_compartida', 'fallos')
+
+    def __init__(self):
+        self._valores = dict.fromkeys(self.CAMPOS, 0)
+        self._lock = threading.Lock()
+
+    def sumar(self, campo, cantidad=1):
+        if cantidad:
+            with self._lock:
+                self._valores[campo] += cantidad
+
+    def leer(self):
+        with self._lock:
+            return dict(self._valores)
+
+
+class TieredCache(BaseCache):
+    """
+    Backend de caché: nivel local LRU delante de un nivel compartido.
+
+    OPTIONS:
+        COMPARTIDA (str): Alias en CACHES del nivel compartido
+        MAX_ENTRADAS_LOCAL (int): Entradas del nivel local (default: 1000)
+        TTL_LOCAL (float): Segundos máximos en el nivel local (default: 5).
+            Acota cuánto tarda un proceso en ver un cambio hecho por otro
+        SOLO_COMPARTIDA (list): Prefijos de claves que no usan el nivel local
+    """
+
+    def __init__(self, location, params):
+        opciones = dict(params.get('OPTIONS', {}))
+        self._alias_compartida = opciones.pop('COMPARTIDA')
+        max_entradas = int(opciones.pop('MAX_ENTRADAS_LOCAL', 1000))
+        ttl = float(opciones.pop('TTL_LOCAL', 5))
+        self._solo_compartida = tuple(opciones.pop('SOLO_COMPARTIDA', ()))
+        super().__init__({**params, 'OPTIONS': opciones})
+
+        nombre = location or self._alias_compartida
+        with _niveles_lock:
+            if nombre not in _niveles_locales:
+                _niveles_locales[nombre] = (NivelLocal(max_entradas, ttl), Contadores())
+            self._local, self._contadores = _niveles_locales[nombre]
+
+    @property
+    def compartida(self):
+        return caches[self._alias_compartida]
+
+    def _usa_local(self, key, version=None):
+        # El nivel local no distingue versiones de clave: solo la por defecto
+        return version is None and not key.startswith(self._solo_compartida)
+
+    def _timeout_local(self, timeout):
+        """
+        Segundos de vida (relativos) del valor, o None si no expira.
+
+        Se calcula desde el timeout recibido y no con get_backend_timeout()
+        del nivel compartido, que según el backend es una fecha absoluta
+        (FileBasedCache, LocMemCache) o segundos relativos (RedisCache).
+        """
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.compartida.default_timeout
+        if timeout is None:
+            return None
+        return max(0, timeout)
+
+    @contextmanager
+    def _exclusivo(self):
+        """
+        Bloqueo entre procesos para add() e incr() sobre FileBasedCache, que
+        los implementa como leer y luego escribir (Redis ya es atómico).
+        """
+        compartida = self.compartida
+        if fcntl is None or not isinstance(compartida, FileBasedCache):
+            yield
+            return
+        os.makedirs(compartida._dir, exist_ok=True)
+        with open(os.path.join(compartida._dir, '.lock'), 'a') as archivo:
+            fcntl.flock(archivo, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(archivo, fcntl.LOCK_UN)
+
+    def get(self, key, default=None, version=None):
+        if self._usa_local(key, version):
+            valor = self._local.get(key)
+            if valor is not _AUSENTE:
+                self._contadores.sumar('aciertos_local')
+                return valor
+        valor = self.compartida.get(key, _AUSENTE, version=version)
+        if valor is _AUSENTE:
+            self._contadores.sumar('fallos')
+            return default
+        self._contadores.sumar('aciertos_compartida')
+        if self._usa_local(key, version):
+            self._local.set(key, valor)
+        return valor
+
+    def get_many(self, keys, version=None):
+        encontrados, pendientes = {}, []
+        for key in keys:
+            valor = self._local.get(key) if self._usa_local(key, version) else _AUSENTE
+            if valor is _AUSENTE:
+                pendientes.append(key)
+            else:
+                encontrados[key] = valor
+        self._contadores.sumar('aciertos_local', len(encontrados))
+        if pendientes:
+            compartidos = self.compartida.get_many(pendientes, version=version)
+            for key, valor in compartidos.items():
+                if self._usa_local(key, version):
+                    self._local.set(key, valor)
+            encontrados.update(compartidos)
+            self._contadores.sumar('aciertos_compartida', len(compartidos))
+            self._contadores.sumar('fallos', len(pendientes) - len(compartidos))
+        return encontrados
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.compartida.set(key, value, timeout, version=version)
+        if self._usa_local(key, version):
+            self._local.set(key, value, self._timeout_local(timeout))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        fallidas = self.compartida.set_many(data, timeout, version=version)
+        ttl = self._timeout_local(timeout)
+        for key, value in data.items():
+            if self._usa_local(key, version) and key not in fallidas:
+                self._local.set(key, value, ttl)
+        return fallidas
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._exclusivo():
+            agregado = self.compartida.add(key, value, timeout, version=version)
+        if agregado and self._usa_local(key, version):
+            self._local.set(key, value, self._timeout_local(timeout))
+        return agregado
+
+    def incr(self, key, delta=1, version=None):
+        self._local.delete(key)
+        with self._exclusivo():
+            return self.compartida.incr(key, delta, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local.delete(key)
+        return self.compartida.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local.delete(key)
+        return self.compartida.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._local.delete(key)
+        self.compartida.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        if self._usa_local(key, version) and self._local.get(key) is not _AUSENTE:
+            return True
+        return self.compartida.has_key(key, version=version)
+
+    def clear(self):
+        self._local.clear()
+        self.compartida.clear()
+
+    def close(self, **kwargs):
+        self.compartida.close(**kwargs)
+
+    def estadisticas(self):
+        """
+        Aciertos y fallos de este proceso desde que arrancó.
+
+        Returns:
+            dict: aciertos_local, aciertos_compartida, fallos, tasa_aciertos,
+                entradas_local, compartida (backend) y pid
+        """
+        datos = self._contadores.leer()
+        consultas = datos['aciertos_local'] + datos['aciertos_compartida'] + datos['fallos']
+        aciertos = datos['aciertos_local'] + datos['aciertos_compartida']
+        return {
+            **datos,
+            'tasa_aciertos': round(aciertos / consultas, 4) if consultas else None,
+            'entradas_local': len(self._local),
+            'compartida': type(self.compartida).__name__,
+            'pid': os.getpid(),
+        }
+
@@ -0,0 +1,178 @@
+"""
+Feed de citas para el calendario de recepción, con caché por semana.
+
+Cada semana (lunes a domingo, hora local) tiene una versión guardada en la
+caché, que corresponde al instante (ms) de su último cambio. Los eventos de
+una semana se guardan bajo una clave que incluye esa versión y el
+veterinario filtrado, de modo que al cambiar una cita basta con subir la
+versión de las semanas afectadas. Las mismas versiones sirven para calcular
+el ETag y el Last-Modified de la respuesta sin consultar la base de datos.
+"""
+import hashlib
+import time as reloj
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+
+# Segundos que se guardan los eventos de una semana
+CALENDARIO_CACHE_TTL = 60 * 60
+
+CALENDARIO_CAMPOS = (
+    'id', 'fecha_hora', 'tipo', 'estado', 'motivo', 'veterinario_id', 'veterinario__nombre',
+    'mascota__nombre', 'mascota__cliente__nombre', 'mascota__cliente__apellido',
+)
+
+CLAVE_GENERACION = 'calendario:generacion'
+
+
+def _ahora_ms():
+    return reloj.time_ns() // 1_000_000
+
+
+def lunes_de(fecha_hora):
+    """Retorna el lunes (date) de la semana local de una fecha/hora."""
+    fecha = timezone.localtime(fecha_hora).date() if isinstance(fecha_hora, datetime) else fecha_hora
+    return fecha - timedelta(days=fecha.weekday())
+
+
+def semanas_entre(inicio, fin):
+    """Lista de lunes de las semanas que cubre el rango [inicio, fin]."""
+    lunes, ultimo = lunes_de(inicio), lunes_de(fin)
+    semanas = []
+    while lunes <= ultimo:
+        semanas.append(lunes)
+        lunes += timedelta(days=7)
+    return semanas
+
+
+def _clave_version(lunes):
+    return f'calendario:semana:{lunes.isoformat()}:version'
+
+
+def _leer_version(clave):
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, _ahora_ms(), timeout=None)
+        version = cache.get(clave)
+    return version
+
+
+def versiones(semanas):
+    """
+    Retorna (generacion, {lunes: version}) de las semanas indicadas.
+
+    La generación cambia cuando se editan datos que aparecen en los eventos
+    (nombres de mascotas, clientes o veterinarios) y afecta a todas las semanas.
+    """
+    claves = {_clave_version(lunes): lunes for lunes in semanas}
+    encontradas = cache.get_many(list(claves))
+    resultado = {}
+    for clave, lunes in claves.items():
+        resultado[lunes] = encontradas.get(clave) or _leer_version(clave)
+    return _leer_version(CLAVE_GENERACION), resultado
+
+
+def invalidar_semanas(fechas):
+    """Marca como modificadas las semanas que contienen las fechas indicadas."""
+    ahora = _ahora_ms()
+    for lunes in {lunes_de(fecha) for fecha in fechas if fecha}:
+        clave = _clave_version(lunes)
+        cache.set(clave, max(ahora, (cache.get(clave) or 0) + 1), timeout=None)
+
+
+def invalidar_todo():
+    """Invalida los eventos de todas las semanas."""
+    cache.set(CLAVE_GENERACION, max(_ahora_ms(), (cache.get(CLAVE_GENERACION) or 0) + 1), timeout=None)
+
+
+def etag_y_modificacion(inicio, fin, veterinario_id=None):
+    """
+    Calcula el ETag y la fecha de última modificación (timestamp en segundos)
+    del feed para un rango, usando solo la caché.
+    """
+    generacion, por_semana = versiones(semanas_entre(inicio, fin))
+    firma = '|'.join([
+        inicio.isoformat(), fin.isoformat(), str(veterinario_id or ''), str(generacion),
+        *(f'{lunes}:{version}' for lunes, version in sorted(por_semana.items()))
+    ])
+    etag = '"%s"' % hashlib.md5(firma.encode()).hexdigest()
+    return etag, max([generacion, *por_semana.values()]) // 1000
+
+
+def evento_calendario(fila):
+    """Arma un evento del calendario a partir de una fila proyectada con values()."""
+    inicio = timezone.localtime(fila['fecha_hora']).isoformat()
+    return {
+        'id': fila['id'],
+        'title': f"{fila['mascota__nombre']} ({fila['tipo']})",
+        'start': inicio,
+        'end': inicio, # For point events
+        'veterinario': fila['veterinario__nombre'] or "Sin Asignar",
+        'veterinario_id': fila['veterinario_id'] or "",
+        'mascota': fila['mascota__nombre'],
+        'dueño': f"{fila['mascota__cliente__nombre']} {fila['mascota__cliente__apellido']}",
+        # Color coding based on status
+        'color': '#198754' if fila['estado'] == 'CONFIRMADA' else '#0d6efd',
+        'tipo': fila['tipo'],
+        'estado': fila['estado'],
+        'motivo': fila['motivo']
+    }
+
+
+def _rango_semana(lunes):
+    inicio = timezone.make_aware(datetime.combine(lunes, time.min))
+    return inicio, timezone.make_aware(datetime.combine(lunes + timedelta(days=7), time.min))
+
+
+def eventos_por_semana(inicio, fin, veterinario_id=None):
+    """
+    Genera, en orden, los eventos de cada semana del rango [inicio, fin].
+
+    Las semanas presentes en caché no consultan la base de datos. Las que
+    faltan se obtienen en una sola consulta proyectada, se recorren en orden
+    y se guardan en caché a medida que se completan.
+
+    Yields:
+        list: Eventos de cada semana, ya recortados al rango pedido
+    """
+    from .models import Cita
+
+    semanas = semanas_entre(inicio, fin)
+    generacion, por_semana = versiones(semanas)
+    vet = veterinario_id or 'todos'
+    claves = {
+        lunes: f'calendario:eventos:{generacion}:{lunes.isoformat()}:{vet}:{por_semana[lunes]}'
+        for lunes in semanas
+    }
+    en_cache = cache.get_many(list(claves.values()))
+    faltantes = [lunes for lunes in semanas if claves[lunes] not in en_cache]
+
+    filas = iter(())
+    if faltantes:
+        rangos = Q()
+        for lunes in faltantes:
+            desde, hasta = _rango_semana(lunes)
+            rangos |= Q(fecha_hora__gte=desde, fecha_hora__lt=hasta)
+        citas = Cita.objects.filter(rangos, estado__in=['AGENDADA', 'CONFIRMADA'])
+        if veterinario_id:
+            citas = citas.filter(veterinario_id=veterinario_id)
+        filas = citas.order_by('fecha_hora').values(*CALENDARIO_CAMPOS).iterator(chunk_size=500)
+
+    pendiente = next(filas, None)
+    inicio_ts, fin_ts = inicio.timestamp(), fin.timestamp()
+    for lunes in semanas:
+        clave = claves[lunes]
+        if clave in en_cache:
+            semana = en_cache[clave]
+        else:
+            # Consumir las filas de esta semana (vienen ordenadas por fecha)
+            limite = _rango_semana(lunes)[1]
+            semana = []
+            while pendiente is not None and pendiente['fecha_hora'] < limite:
+                semana.append((pendiente['fecha_hora'].timestamp(), evento_calendario(pendiente)))
+                pendiente = next(filas, None)
+            cache.set(clave, semana, CALENDARIO_CACHE_TTL)
+        yield [evento for ts, evento in semana if inicio_ts <= ts <= fin_ts]
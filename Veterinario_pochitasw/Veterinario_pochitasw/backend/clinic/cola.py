@@ -0,0 +1,314 @@
+"""
+Cola de pacientes walk-in (ListaEspera).
+
+Los clientes de la cola (dashboards de recepción y veterinario) se
+sincronizan con long-polling: envían la última versión que conocen
+(ContadorCambios.LISTA_ESPERA) y el servidor responde apenas hay una
+versión mayor, solo con las filas que cambiaron.
+
+Dentro de un mismo proceso, las señales despiertan a las peticiones en
+espera al confirmarse un cambio. Los cambios hechos por otros workers se
+detectan consultando la versión cada INTERVALO_CONSULTA_SEGUNDOS.
+
+El orden de atención lo decide MotorCola: un heap por día ordenado por la
+hora de llegada, donde los URGENTE cuentan como si hubieran llegado
+BONO_URGENTE_MINUTOS antes. Así un urgente pasa adelante, pero un paciente
+normal que ya esperó más que ese bono no queda postergado indefinidamente.
+"""
+import heapq
+import math
+import threading
+import time as reloj
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+
+# Tiempo máximo que una petición espera cambios antes de responder vacía
+ESPERA_MAXIMA_SEGUNDOS = 25
+
+# Cada cuánto se consulta la versión en la base de datos mientras se espera
+INTERVALO_CONSULTA_SEGUNDOS = 1.0
+
+ESTADOS_EN_COLA = ['ESPERANDO', 'EN_ATENCION']
+
+# Ventaja (en minutos de llegada) de un paciente URGENTE.
+# Se puede sobrescribir con settings.CLINIC_BONO_URGENTE_MINUTOS
+BONO_URGENTE_MINUTOS = 30
+
+# Atención estimada por veterinario cuando aún no hay llamados en el día.
+# Se puede sobrescribir con settings.CLINIC_MINUTOS_POR_WALKIN
+MINUTOS_POR_WALKIN = 20
+
+# Cantidad de llamados recientes usados para los promedios
+VENTANA_PROMEDIO = 20
+
+# Peticiones de long-polling que pueden esperar a la vez en un proceso.
+# Cada una ocupa un hilo del worker (ver gunicorn.conf.py): con 8 hilos,
+# quedan al menos 4 para el resto de las peticiones.
+# Se puede sobrescribir con settings.CLINIC_ESPERAS_SIMULTANEAS
+ESPERAS_SIMULTANEAS = 4
+
+_hay_cambios = threading.Condition()
+
+_esperas_lock = threading.Lock()
+_esperas_activas = 0
+
+
+def notificar_cambio():
+    """Despierta a las peticiones que esperan cambios en este proceso."""
+    with _hay_cambios:
+        _hay_cambios.notify_all()
+
+
+def version_actual():
+    from .models import ContadorCambios
+
+    return ContadorCambios.valor_actual(ContadorCambios.LISTA_ESPERA)
+
+
+@contextmanager
+def cupo_de_espera():
+    """
+    Reserva uno de los ESPERAS_SIMULTANEAS lugares para esperar cambios.
+
+    Yields:
+        bool: True si hay lugar; False si ya esperan demasiadas peticiones
+            en este proceso (se debe responder sin esperar)
+    """
+    global _esperas_activas
+
+    maximo = getattr(settings, 'CLINIC_ESPERAS_SIMULTANEAS', ESPERAS_SIMULTANEAS)
+    with _esperas_lock:
+        reservado = _esperas_activas < maximo
+        if reservado:
+            _esperas_activas += 1
+    try:
+        yield reservado
+    finally:
+        if reservado:
+            with _esperas_lock:
+                _esperas_activas -= 1
+
+
+def esperar_cambios(version, espera=ESPERA_MAXIMA_SEGUNDOS):
+    """
+    Espera hasta que la versión de la cola sea distinta de `version`.
+
+    Args:
+        version (int): Última versión conocida por el cliente
+        espera (float): Segundos máximos de espera
+
+    Returns:
+        int: La versión actual (igual a `version` si no hubo cambios)
+    """
+    limite = reloj.monotonic() + espera
+    while True:
+        actual = version_actual()
+        restante = limite - reloj.monotonic()
+        if actual != version or restante <= 0:
+            return actual
+        with _hay_cambios:
+            _hay_cambios.wait(min(INTERVALO_CONSULTA_SEGUNDOS, restante))
+
+
+def transicion(pk, desde, **campos):
+    """
+    Cambia un registro de la lista de espera en un único UPDATE, solo si
+    su estado actual es uno de `desde`.
+
+    La condición se evalúa en la base de datos al escribir, así que entre
+    dos transiciones simultáneas sobre el mismo registro solo una tiene
+    efecto. Solo se escriben las columnas indicadas (y la versión).
+
+    Args:
+        pk (int): ID del registro
+        desde (list): Estados desde los que se permite la transición
+        **campos: Columnas a actualizar (por ejemplo, estado=...)
+
+    Returns:
+        bool: True si se aplicó, False si el registro no estaba en `desde`
+    """
+    from .models import ContadorCambios, ListaEspera
+
+    with transaction.atomic():
+        campos['version'] = ContadorCambios.incrementar(ContadorCambios.LISTA_ESPERA)
+        if ListaEspera.objects.filter(pk=pk, estado__in=desde).update(**campos):
+            transaction.on_commit(notificar_cambio)
+            return True
+        # No aplicó: no consumir la versión
+        transaction.set_rollback(True)
+        return False
+
+
+def _minutos(delta):
+    return delta.total_seconds() / 60
+
+
+def clave_prioridad(prioridad, fecha_solicitud):
+    """Clave de orden (menor = antes): la llegada, adelantada si es urgente."""
+    bono = getattr(settings, 'CLINIC_BONO_URGENTE_MINUTOS', BONO_URGENTE_MINUTOS)
+    if prioridad == 'URGENTE':
+        fecha_solicitud -= timedelta(minutes=bono)
+    return fecha_solicitud.timestamp()
+
+
+class SinVeterinarioDisponible(Exception):
+    """Todos los veterinarios están atendiendo a un walk-in."""
+
+
+def veterinario_disponible():
+    """
+    Veterinario al que asignar el siguiente walk-in: entre los que no están
+    atendiendo a otro walk-in, el que lleva menos walk-ins llamados hoy.
+
+    Returns:
+        Veterinario | None
+    """
+    from .models import Veterinario
+    from .utils import rango_del_dia
+
+    inicio, fin = rango_del_dia()
+    return Veterinario.objects.annotate(
+        en_atencion=Count('pacientes_espera', filter=Q(pacientes_espera__estado='EN_ATENCION')),
+        llamados_hoy=Count('pacientes_espera', filter=Q(
+            pacientes_espera__fecha_atencion__gte=inicio, pacientes_espera__fecha_atencion__lt=fin
+        )),
+    ).filter(en_atencion=0).order_by('llamados_hoy', 'id').first()
+
+
+class MotorCola:
+    """
+    Orden de atención y tiempos estimados de la cola walk-in del día.
+
+    Mantiene en memoria el orden de los pacientes ESPERANDO (obtenido de un
+    heap por clave de prioridad). Se reconstruye cuando cambia la versión de
+    la cola (en cualquier worker) o el día, de modo que cada cambio cuesta
+    unas pocas consultas por proceso.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clave = None
+        self._orden = []
+        self._intervalo = None
+        self._ultimo_llamado = None
+        self._espera_promedio = None
+
+    def _sincronizar(self):
+        from . import plantel
+        from .models import ListaEspera
+        from .utils import rango_del_dia
+
+        clave = (timezone.localdate(), version_actual())
+        if clave == self._clave:
+            return
+        inicio, fin = rango_del_dia(clave[0])
+        hoy = ListaEspera.objects.filter(fecha_solicitud__gte=inicio, fecha_solicitud__lt=fin)
+
+        heap = [
+            (clave_prioridad(prioridad, fecha_solicitud), numero_turno or 0, pk)
+            for pk, prioridad, fecha_solicitud, numero_turno in hoy.filter(
+                estado=ListaEspera.Estado.ESPERANDO
+            ).values_list('id', 'prioridad', 'fecha_solicitud', 'numero_turno')
+        ]
+        heapq.heapify(heap)
+        orden = [heapq.heappop(heap)[2] for _ in range(len(heap))]
+
+        # Últimos llamados: ritmo de atención y espera real promedio
+        llamados = list(hoy.filter(fecha_atencion__isnull=False).order_by('-fecha_atencion').values_list(
+            'fecha_solicitud', 'fecha_atencion'
+        )[:VENTANA_PROMEDIO + 1])
+        horas = sorted(atencion for _, atencion in llamados)
+        if len(horas) >= 2:
+            intervalo = _minutos(horas[-1] - horas[0]) / (len(horas) - 1)
+        else:
+            minutos = getattr(settings, 'CLINIC_MINUTOS_POR_WALKIN', MINUTOS_POR_WALKIN)
+            intervalo = minutos / max(1, len(plantel.veterinarios()))
+        esperas = [_minutos(atencion - solicitud) for solicitud, atencion in llamados[:VENTANA_PROMEDIO]]
+
+        self._orden = orden
+        self._intervalo = intervalo
+        self._ultimo_llamado = horas[-1] if horas else None
+        self._espera_promedio = sum(esperas) / len(esperas) if esperas else None
+        self._clave = clave
+
+    def orden(self):
+        """IDs de los pacientes en espera, en el orden en que serán llamados."""
+        with self._lock:
+            self._sincronizar()
+            return list(self._orden)
+
+    def predicciones(self):
+        """
+        Posición y minutos estimados de espera de cada paciente ESPERANDO.
+
+        La espera se estima con el intervalo promedio entre los últimos
+        llamados del día (que ya refleja cuántos veterinarios atienden),
+        descontando lo transcurrido desde el último llamado.
+
+        Returns:
+            tuple: ({id: {'posicion', 'espera_estimada'}}, espera_promedio)
+                donde espera_promedio son los minutos promedio entre llegada
+                y llamado de los últimos pacientes (None si no hay datos)
+        """
+        with self._lock:
+            self._sincronizar()
+            orden = self._orden
+            intervalo = self._intervalo
+            desde_ultimo = _minutos(timezone.now() - self._ultimo_llamado) if self._ultimo_llamado else 0
+            espera_promedio = self._espera_promedio
+
+        primera = max(0.0, intervalo - desde_ultimo)
+        return {
+            pk: {'posicion': posicion + 1, 'espera_estimada': math.ceil(primera + posicion * intervalo)}
+            for posicion, pk in enumerate(orden)
+        }, espera_promedio
+
+    def siguiente(self, veterinario=None):
+        """
+        Pasa a EN_ATENCION al primer paciente en espera y lo asigna al
+        veterinario (o, si no se indica, al que entregue veterinario_disponible).
+
+        Cada intento es un UPDATE condicionado a que el paciente siga
+        ESPERANDO: si dos llamados compiten por el mismo paciente, solo uno
+        lo obtiene y el otro sigue con el próximo de la cola. El veterinario
+        libre se elige después de bloquear el contador de la cola, así que
+        dos llamados simultáneos no eligen al mismo.
+
+        Returns:
+            ListaEspera | None: El paciente llamado, o None si la cola está vacía
+
+        Raises:
+            SinVeterinarioDisponible: Si no se indicó veterinario y no hay ninguno libre
+        """
+        from .models import ContadorCambios, ListaEspera
+
+        for pk in self.orden():
+            with transaction.atomic():
+                version = ContadorCambios.incrementar(ContadorCambios.LISTA_ESPERA)
+                asignado = veterinario or veterinario_disponible()
+                if asignado is None:
+                    transaction.set_rollback(True)
+                    raise SinVeterinarioDisponible()
+                tomado = ListaEspera.objects.filter(pk=pk, estado=ListaEspera.Estado.ESPERANDO).update(
+                    estado=ListaEspera.Estado.EN_ATENCION,
+                    fecha_atencion=timezone.now(),
+                    veterinario_asignado=asignado,
+                    version=version,
+                )
+                if tomado:
+                    transaction.on_commit(notificar_cambio)
+                    return ListaEspera.objects.select_related(
+                        'cliente', 'mascota', 'veterinario_asignado'
+                    ).get(pk=pk)
+                # Otro llamado se lo llevó: no consumir la versión
+                transaction.set_rollback(True)
+        return None
+
+
+motor_cola = MotorCola()
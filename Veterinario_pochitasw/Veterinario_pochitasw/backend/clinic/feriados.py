@@ -0,0 +1,226 @@
+"""
+Calendario de feriados de Chile.
+
+Los feriados de cada año se calculan según la ley vigente, sin una lista
+fija por año:
+
+- Fijos: 1 de enero, 1 y 21 de mayo, 16 de julio, 15 de agosto, 18 y 19
+  de septiembre, 1 de noviembre, 8 y 25 de diciembre.
+- Viernes y Sábado Santo, a partir de la fecha de Pascua.
+- San Pedro y San Pablo (29 de junio) y Encuentro de Dos Mundos (12 de
+  octubre) se trasladan al lunes según la Ley 19.668: al lunes de la misma
+  semana si caen martes, miércoles o jueves, y al lunes siguiente si caen
+  viernes.
+- Iglesias Evangélicas (31 de octubre): si cae martes pasa al viernes
+  anterior y si cae miércoles al viernes siguiente.
+- Pueblos Indígenas: el día del solsticio de invierno (desde 2021).
+- 2 de enero y 17 de septiembre si son lunes; 20 de septiembre si es viernes.
+
+Los feriados que no se pueden calcular (elecciones, feriados decretados)
+se agregan en el admin con FeriadoManual, que también permite dejar como
+hábil un feriado calculado.
+
+Cada proceso guarda el calendario de un año como un frozenset de fechas,
+junto con la versión de los ajustes manuales con que se armó. La versión
+vive en la caché compartida y las señales la cambian al editar un
+FeriadoManual.
+"""
+import math
+import threading
+import time as reloj
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+from django.core.cache import cache
+
+
+CLAVE_VERSION = 'feriados:version'
+
+ZONA_CHILE = ZoneInfo('America/Santiago')
+
+FERIADOS_FIJOS = {
+    (1, 1): 'Año Nuevo',
+    (5, 1): 'Día del Trabajo',
+    (5, 21): 'Día de las Glorias Navales',
+    (7, 16): 'Día de la Virgen del Carmen',
+    (8, 15): 'Asunción de la Virgen',
+    (9, 18): 'Independencia Nacional',
+    (9, 19): 'Día de las Glorias del Ejército',
+    (11, 1): 'Día de Todos los Santos',
+    (12, 8): 'Inmaculada Concepción',
+    (12, 25): 'Navidad',
+}
+
+# Términos periódicos (A, B, C) del solsticio, de Meeus, Astronomical Algorithms, cap. 27
+_TERMINOS_SOLSTICIO = (
+    (485, 324.96, 1934.136), (203, 337.23, 32964.467), (199, 342.08, 20.186),
+    (182, 27.85, 445267.112), (156, 73.14, 45036.886), (136, 171.52, 22518.443),
+    (77, 222.54, 65928.934), (74, 296.72, 3034.906), (70, 243.58, 9037.513),
+    (58, 119.81, 33718.147), (52, 297.17, 150.678), (50, 21.02, 2281.226),
+    (45, 247.54, 29929.562), (44, 325.15, 31555.956), (29, 60.93, 4443.417),
+    (18, 155.12, 67555.328), (17, 288.79, 4562.452), (16, 198.04, 62894.029),
+    (14, 199.76, 31436.921), (12, 95.39, 14577.848), (12, 287.11, 31931.756),
+    (12, 320.81, 34777.259), (9, 227.73, 1222.114), (8, 15.45, 16859.074),
+)
+
+_lock = threading.Lock()
+# {año: (versión, {fecha: nombre}, frozenset de fechas)}
+_por_anio = {}
+
+
+def pascua(anio):
+    """Domingo de Pascua (algoritmo anónimo para el calendario gregoriano)."""
+    a, b, c = anio % 19, anio // 100, anio % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(anio, mes, dia + 1)
+
+
+def solsticio_invierno(anio):
+    """Fecha (hora de Chile) del solsticio de junio, con precisión de minutos."""
+    y = (anio - 2000) / 1000
+    jde = 2451716.56767 + 365241.62603 * y + 0.00325 * y ** 2 + 0.00888 * y ** 3 - 0.00030 * y ** 4
+    t = (jde - 2451545.0) / 36525
+    w = math.radians(35999.373 * t - 2.47)
+    delta = 1 + 0.0334 * math.cos(w) + 0.0007 * math.cos(2 * w)
+    s = sum(a * math.cos(math.radians(b + c * t)) for a, b, c in _TERMINOS_SOLSTICIO)
+    jde += 0.00001 * s / delta
+    instante = datetime(2000, 1, 1, 12, tzinfo=dt_timezone.utc) + timedelta(days=jde - 2451545.0)
+    return instante.astimezone(ZONA_CHILE).date()
+
+
+def _trasladar_a_lunes(fecha):
+    """Ley 19.668: martes a jueves al lunes anterior, viernes al lunes siguiente."""
+    dia = fecha.weekday()
+    if 1 <= dia <= 3:
+        return fecha - timedelta(days=dia)
+    if dia == 4:
+        return fecha + timedelta(days=3)
+    return fecha
+
+
+def feriados_calculados(anio):
+    """
+    Feriados legales de un año, sin los ajustes manuales.
+
+    Returns:
+        dict: {fecha: nombre}
+    """
+    feriados = {date(anio, mes, dia): nombre for (mes, dia), nombre in FERIADOS_FIJOS.items()}
+
+    domingo_pascua = pascua(anio)
+    feriados[domingo_pascua - timedelta(days=2)] = 'Viernes Santo'
+    feriados[domingo_pascua - timedelta(days=1)] = 'Sábado Santo'
+
+    feriados[_trasladar_a_lunes(date(anio, 6, 29))] = 'San Pedro y San Pablo'
+    feriados[_trasladar_a_lunes(date(anio, 10, 12))] = 'Encuentro de Dos Mundos'
+
+    evangelicas = date(anio, 10, 31)
+    if evangelicas.weekday() == 1:
+        evangelicas -= timedelta(days=4)
+    elif evangelicas.weekday() == 2:
+        evangelicas += timedelta(days=2)
+    feriados[evangelicas] = 'Día de las Iglesias Evangélicas y Protestantes'
+
+    if anio == 2021:
+        # La Ley 21.357 fijó el primero el 21 de junio
+        feriados[date(2021, 6, 21)] = 'Día Nacional de los Pueblos Indígenas'
+    elif anio > 2021:
+        feriados[solsticio_invierno(anio)] = 'Día Nacional de los Pueblos Indígenas'
+
+    if date(anio, 1, 2).weekday() == 0:
+        feriados[date(anio, 1, 2)] = 'Feriado adicional de Año Nuevo'
+    if date(anio, 9, 17).weekday() == 0:
+        feriados[date(anio, 9, 17)] = 'Feriado adicional de Fiestas Patrias'
+    if date(anio, 9, 20).weekday() == 4:
+        feriados[date(anio, 9, 20)] = 'Feriado adicional de Fiestas Patrias'
+    return feriados
+
+
+def _ahora_ms():
+    return reloj.time_ns() // 1_000_000
+
+
+def version_actual():
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        cache.add(CLAVE_VERSION, _ahora_ms(), timeout=None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+def invalidar():
+    """Marca los ajustes manuales como modificados (llamar después del commit)."""
+    cache.set(CLAVE_VERSION, max(_ahora_ms(), (cache.get(CLAVE_VERSION) or 0) + 1), timeout=None)
+
+
+def _calendario(anio, version):
+    leido = _por_anio.get(anio)
+    if leido is not None and leido[0] == version:
+        return leido
+
+    from .models import FeriadoManual
+
+    feriados = feriados_calculados(anio)
+    for fecha, nombre, es_feriado in FeriadoManual.objects.filter(fecha__year=anio).values_list(
+        'fecha', 'nombre', 'es_feriado'
+    ):
+        if es_feriado:
+            feriados[fecha] = nombre
+        else:
+            feriados.pop(fecha, None)
+    leido = (version, feriados, frozenset(feriados))
+    with _lock:
+        _por_anio[anio] = leido
+    return leido
+
+
+def feriados_del_anio(anio):
+    """
+    Feriados de un año, con los ajustes manuales.
+
+    Returns:
+        dict: {fecha: nombre}. Se comparte entre peticiones: no modificar
+    """
+    return _calendario(anio, version_actual())[1]
+
+
+def _como_fecha(fecha):
+    return fecha.date() if isinstance(fecha, datetime) else fecha
+
+
+def nombre_feriado(fecha):
+    """Nombre del feriado de esa fecha, o None si no es feriado."""
+    fecha = _como_fecha(fecha)
+    return feriados_del_anio(fecha.year).get(fecha)
+
+
+def no_habiles(fechas):
+    """
+    Cuáles de las fechas indicadas son domingo o feriado.
+
+    Lee la versión de los ajustes una sola vez y resuelve cada fecha con
+    una búsqueda en el frozenset de su año.
+
+    Args:
+        fechas (iterable): date o datetime
+
+    Returns:
+        dict: {fecha: razón} solo de las fechas no hábiles, con la razón
+            en el formato de utils.es_feriado_o_domingo
+    """
+    version = version_actual()
+    resultado = {}
+    for fecha in map(_como_fecha, fechas):
+        if fecha.weekday() == 6:
+            resultado[fecha] = "Es Domingo"
+            continue
+        _, nombres, dias = _calendario(fecha.year, version)
+        if fecha in dias:
+            resultado[fecha] = f"Es Feriado ({nombres[fecha]})"
+    return resultado
@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth import get_user_model
 from .models import Cliente, Mascota
+from .rut import validar_cliente
 
 Usuario = get_user_model()
 
@@ -37,6 +38,16 @@ class RegistroClienteForm(forms.ModelForm):
             'direccion': 'Dirección'
         }
 
+    def clean_rut(self):
+        """
+        Valida el dígito verificador y que el RUT no exista con otro
+        formato (12345678-5 y 12.345.678-5 son el mismo cliente).
+        """
+        rut, error = validar_cliente(self.cleaned_data.get('rut'), excluir_id=self.instance.pk)
+        if error:
+            raise forms.ValidationError(error)
+        return rut
+
 class RegistroMascotaForm(forms.ModelForm):
     class Meta:
         model = Mascota
@@ -52,3 +63,33 @@ class RegistroMascotaForm(forms.ModelForm):
             'fecha_registro': 'Fecha de Ingreso a Clínica'
         }
 
+
+class ImportarClientesForm(forms.Form):
+    archivo = forms.FileField(
+        label="Archivo",
+        help_text="CSV, JSON o JSON Lines (.jsonl) con clientes y mascotas. Ver clinic/importacion.py"
+    )
+    simular = forms.BooleanField(
+        required=False, label="Solo validar (no guardar nada)"
+    )
+    descargar_reporte = forms.BooleanField(
+        required=False, label="Descargar el reporte de errores como CSV"
+    )
+    contrasenas_temporales = forms.BooleanField(
+        required=False, label="Generar contraseñas temporales",
+        help_text="Cada usuario nuevo recibe una contraseña aleatoria y se descarga un CSV con ellas. "
+                  "Si no se marca, los usuarios quedan sin contraseña utilizable. Cada contraseña se "
+                  "hashea por separado (unos 0,2 s por usuario): para archivos grandes use "
+                  "manage.py import_clientes --contrasenas."
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('contrasenas_temporales'):
+            if cleaned_data.get('simular'):
+                raise forms.ValidationError("Las contraseñas temporales no se generan al solo validar.")
+            if cleaned_data.get('descargar_reporte'):
+                raise forms.ValidationError(
+                    "Se descarga un solo archivo: el reporte de errores o las contraseñas temporales."
+                )
+        return cleaned_data
@@ -0,0 +1,360 @@
+"""
+Importación masiva de clientes y sus mascotas (CSV, JSON o JSON Lines).
+
+Pensada para cargar la base de pacientes de una clínica de una vez, en
+lugar de usar el registro rápido cliente por cliente:
+
+- El archivo se lee fila a fila y se procesa en lotes de IMPORTACION_LOTE
+  filas. Cada lote se valida completo (RUT con clinic.rut.validar_lote,
+  teléfono con los helpers de clinic.utils) y se inserta con bulk_create
+  en una transacción.
+- Cada cliente recibe un usuario (username = RUT formateado) sin
+  contraseña utilizable: el RUT es fácil de averiguar, así que una
+  contraseña conocida dejaría las cuentas abiertas. Con
+  contrasenas_temporales=True cada usuario recibe una contraseña
+  aleatoria distinta, hasheada por separado (en paralelo, ver
+  _hashear), que se entrega en ResultadoImportacion.credenciales.
+- bulk_create no llama a save() ni envía señales: las claves
+  rut_normalizado y telefono_normalizado se calculan aquí.
+- Los clientes que ya existen (mismo RUT en cualquier formato) no se
+  modifican; solo se les agregan las mascotas que no tengan ya con el
+  mismo nombre. Así el mismo archivo se puede importar dos veces.
+
+Columnas (CSV, o claves de cada objeto JSON):
+    rut, nombre, apellido, telefono, email, direccion,
+    mascota, especie, genero, raza, fecha_nacimiento
+
+En JSON cada cliente puede traer sus mascotas en una lista "mascotas"
+(con nombre, especie, genero, raza y fecha_nacimiento). Las filas CSV
+con el mismo RUT se agrupan en un solo cliente.
+"""
+import csv
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.utils.crypto import get_random_string
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils.dateparse import parse_date
+
+from . import rut as rut_chileno
+from .utils import formatear_telefono, normalizar_telefono
+
+
+# Filas validadas e insertadas por transacción
+IMPORTACION_LOTE = 1000
+
+# Largo de las contraseñas temporales aleatorias
+LARGO_CONTRASENA_TEMPORAL = 12
+
+FORMATOS = ('csv', 'json', 'jsonl')
+
+CAMPOS_MASCOTA = ('nombre', 'especie', 'genero', 'raza', 'fecha_nacimiento')
+
+# Archivo mal codificado o con CSV/JSON mal formado (json.JSONDecodeError es ValueError)
+ERRORES_LECTURA = (UnicodeDecodeError, ValueError, csv.Error)
+
+
+class ResultadoImportacion:
+    """Conteos y errores de una importación."""
+
+    def __init__(self):
+        self.filas = 0
+        self.clientes_creados = 0
+        self.clientes_existentes = 0
+        self.mascotas_creadas = 0
+        self.mascotas_existentes = 0
+        # (línea, rut, mensaje)
+        self.errores = []
+        # (usuario, contraseña temporal), solo con contrasenas_temporales
+        self.credenciales = []
+
+    def error(self, fila, mensaje):
+        self.errores.append((fila['linea'], fila.get('rut') or '', mensaje))
+
+    def escribir_reporte(self, salida):
+        """Escribe los errores como CSV (linea, rut, error)."""
+        escritor = csv.writer(salida)
+        escritor.writerow(['linea', 'rut', 'error'])
+        escritor.writerows(self.errores)
+
+    def escribir_credenciales(self, salida):
+        """Escribe las contraseñas temporales como CSV (usuario, contrasena)."""
+        escritor = csv.writer(salida)
+        escritor.writerow(['usuario', 'contrasena'])
+        escritor.writerows(self.credenciales)
+
+
+def formato_de(nombre_archivo):
+    """Formato según la extensión del archivo (csv por defecto)."""
+    extension = nombre_archivo.rsplit('.', 1)[-1].lower() if '.' in nombre_archivo else ''
+    return extension if extension in FORMATOS else 'csv'
+
+
+def _texto(valor):
+    return str(valor).strip() if valor is not None else ''
+
+
+def _fila(linea, datos):
+    """Normaliza un registro leído (CSV o JSON) a un cliente con sus mascotas."""
+    if not isinstance(datos, dict):
+        raise ValueError(f'línea {linea}: se esperaba un objeto JSON')
+    datos = {_texto(clave).lower(): valor for clave, valor in datos.items() if clave is not None}
+    fila = {'linea': linea}
+    for campo in ('rut', 'nombre', 'apellido', 'telefono', 'email', 'direccion'):
+        fila[campo] = _texto(datos.get(campo))
+
+    mascotas = datos.get('mascotas')
+    if isinstance(mascotas, list):
+        fila['mascotas'] = [
+            {campo: _texto(m.get(campo)) for campo in CAMPOS_MASCOTA}
+            for m in mascotas if isinstance(m, dict)
+        ]
+    elif _texto(datos.get('mascota')):
+        fila['mascotas'] = [{
+            'nombre': _texto(datos.get('mascota')),
+            **{campo: _texto(datos.get(campo)) for campo in CAMPOS_MASCOTA[1:]},
+        }]
+    else:
+        fila['mascotas'] = []
+    return fila
+
+
+def leer_filas(archivo, formato='csv'):
+    """
+    Lee un archivo de texto fila a fila.
+
+    CSV y JSON Lines se leen en streaming. Un JSON (lista de objetos) se
+    carga completo, porque la biblioteca estándar no lo lee por partes.
+
+    Args:
+        archivo: Archivo de texto abierto
+        formato (str): 'csv', 'json' o 'jsonl'
+
+    Yields:
+        dict: Cliente con 'linea', sus campos y la lista 'mascotas'
+    """
+    if formato == 'csv':
+        lector = csv.DictReader(archivo)
+        for datos in lector:
+            yield _fila(lector.line_num, datos)
+    elif formato == 'jsonl':
+        for linea, texto in enumerate(archivo, start=1):
+            if texto.strip():
+                yield _fila(linea, json.loads(texto))
+    else:
+        for indice, datos in enumerate(json.load(archivo), start=1):
+            yield _fila(indice, datos)
+
+
+def _fecha(valor):
+    """Fecha ISO (AAAA-MM-DD) o chilena (DD-MM-AAAA / DD/MM/AAAA)."""
+    if not valor:
+        return None
+    try:
+        fecha = parse_date(valor)
+    except ValueError:
+        fecha = None
+    if fecha is None:
+        for formato in ('%d-%m-%Y', '%d/%m/%Y'):
+            try:
+                return datetime.strptime(valor, formato).date()
+            except ValueError:
+                continue
+        raise ValueError(valor)
+    return fecha
+
+
+def _opcion(valor, choices, por_defecto):
+    """Valor de un TextChoices sin distinguir mayúsculas ('perro' -> 'Perro')."""
+    if not valor:
+        return por_defecto
+    for opcion in choices.values:
+        if opcion.lower() == valor.lower():
+            return opcion
+    raise ValueError(valor)
+
+
+def _validar_mascotas(fila, resultado):
+    from .models import Mascota
+
+    validas = []
+    for mascota in fila['mascotas']:
+        if not mascota['nombre']:
+            resultado.error(fila, 'Mascota sin nombre')
+            continue
+        try:
+            especie = _opcion(mascota['especie'], Mascota.Especie, Mascota.Especie.PERRO)
+            genero = _opcion(mascota['genero'], Mascota.Genero, Mascota.Genero.MACHO)
+        except ValueError as e:
+            resultado.error(fila, f"Mascota {mascota['nombre']}: valor inválido '{e}'")
+            continue
+        try:
+            nacimiento = _fecha(mascota['fecha_nacimiento'])
+        except ValueError:
+            resultado.error(fila, f"Mascota {mascota['nombre']}: fecha_nacimiento inválida")
+            continue
+        validas.append({
+            'nombre': mascota['nombre'][:100], 'especie': especie, 'genero': genero,
+            'raza': mascota['raza'][:100], 'fecha_nacimiento': nacimiento,
+        })
+    return validas
+
+
+def _validar_lote(filas, resultado, importados):
+    """
+    Valida un lote. Retorna {clave: (fila, mascotas)}: un cliente por RUT,
+    con las mascotas de todas sus filas.
+    """
+    claves = rut_chileno.validar_lote([fila['rut'] for fila in filas])
+    clientes = {}
+    for fila, clave in zip(filas, claves):
+        if clave is None:
+            resultado.error(fila, 'RUT inválido')
+            continue
+        mascotas = _validar_mascotas(fila, resultado)
+        if clave in clientes or clave in importados:
+            # Otra fila del mismo cliente: solo aporta mascotas
+            clientes.setdefault(clave, (None, []))[1].extend(mascotas)
+            continue
+
+        errores = []
+        if not fila['nombre'] or not fila['apellido']:
+            errores.append('Nombre y apellido son requeridos')
+        telefono = formatear_telefono(fila['telefono'])
+        if not normalizar_telefono(telefono) or len(telefono) > 15:
+            errores.append('Teléfono inválido')
+        if fila['email']:
+            try:
+                validate_email(fila['email'])
+            except ValidationError:
+                errores.append('Email inválido')
+        if errores:
+            resultado.error(fila, '; '.join(errores))
+            continue
+        fila['telefono'] = telefono
+        clientes[clave] = (fila, mascotas)
+    return clientes
+
+
+def _hashear(contrasenas):
+    """
+    Hashea (PBKDF2, con sal propia) cada contraseña.
+
+    hashlib libera el GIL mientras calcula, así que los hashes de un lote
+    se reparten entre hilos, uno por CPU.
+    """
+    if len(contrasenas) < 2:
+        return [make_password(c) for c in contrasenas]
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as ejecutor:
+        return list(ejecutor.map(make_password, contrasenas))
+
+
+def _importar_lote(filas, resultado, importados, contrasenas_temporales, simular):
+    from .models import Cliente, Mascota, Usuario
+
+    clientes = _validar_lote(filas, resultado, importados)
+    if not clientes:
+        return
+
+    # Clientes que ya están en la base de datos (una consulta por lote)
+    pendientes = [clave for clave in clientes if clave not in importados]
+    importados.update(Cliente.objects.filter(rut_normalizado__in=pendientes).values_list('rut_normalizado', 'id'))
+    existentes = {clave for clave in pendientes if clave in importados}
+    resultado.clientes_existentes += len(existentes)
+
+    nuevos = {
+        clave: fila for clave, (fila, _) in clientes.items()
+        if clave not in importados and fila is not None
+    }
+    usernames = {clave: rut_chileno.formatear(clave) for clave in nuevos}
+    ocupados = set(Usuario.objects.filter(username__in=usernames.values()).values_list('username', flat=True))
+    for clave in [clave for clave, username in usernames.items() if username in ocupados]:
+        resultado.error(nuevos.pop(clave), 'Ya existe un usuario con este RUT y no tiene perfil de cliente')
+
+    if contrasenas_temporales and not simular:
+        contrasenas = [get_random_string(LARGO_CONTRASENA_TEMPORAL) for _ in nuevos]
+        hashes = _hashear(contrasenas)
+    else:
+        # make_password(None): contraseña inutilizable (no se puede iniciar sesión)
+        contrasenas = None
+        hashes = [make_password(None) for _ in nuevos]
+
+    with transaction.atomic():
+        usuarios = Usuario.objects.bulk_create([
+            Usuario(
+                username=usernames[clave], password=hash_, rol=Usuario.Roles.CLIENTE,
+                first_name=fila['nombre'][:150], last_name=fila['apellido'][:150], email=fila['email'],
+            ) for (clave, fila), hash_ in zip(nuevos.items(), hashes)
+        ])
+        creados = Cliente.objects.bulk_create([
+            Cliente(
+                usuario=usuario, rut=usernames[clave], rut_normalizado=clave,
+                nombre=fila['nombre'][:100], apellido=fila['apellido'][:100],
+                telefono=fila['telefono'], telefono_normalizado=normalizar_telefono(fila['telefono']),
+                email=fila['email'] or None, direccion=fila['direccion'],
+            ) for (clave, fila), usuario in zip(nuevos.items(), usuarios)
+        ])
+        importados.update((cliente.rut_normalizado, cliente.id) for cliente in creados)
+        resultado.clientes_creados += len(creados)
+
+        # Mascotas: se omiten las que el cliente ya tiene con el mismo nombre
+        ids = {importados[clave] for clave in clientes if clave in importados}
+        ya_tienen = set(
+            Mascota.objects.filter(cliente_id__in=ids).values_list('cliente_id', Lower('nombre'))
+        )
+        mascotas = []
+        for clave, (_, datos) in clientes.items():
+            if clave not in importados:
+                continue
+            for mascota in datos:
+                llave = (importados[clave], mascota['nombre'].lower())
+                if llave in ya_tienen:
+                    resultado.mascotas_existentes += 1
+                    continue
+                ya_tienen.add(llave)
+                mascotas.append(Mascota(cliente_id=importados[clave], **mascota))
+        Mascota.objects.bulk_create(mascotas)
+        resultado.mascotas_creadas += len(mascotas)
+
+        if simular:
+            # Los ids quedan en `importados`: las filas siguientes del mismo
+            # cliente cuentan como en una importación real
+            transaction.set_rollback(True)
+        elif contrasenas:
+            resultado.credenciales.extend(zip((usernames[clave] for clave in nuevos), contrasenas))
+
+
+def importar(filas, lote=IMPORTACION_LOTE, contrasenas_temporales=False, simular=False):
+    """
+    Importa clientes y mascotas.
+
+    Args:
+        filas (iterable): Filas de leer_filas()
+        lote (int): Filas por transacción
+        contrasenas_temporales (bool): Dar a cada usuario creado una
+            contraseña aleatoria (en resultado.credenciales). Si es False,
+            los usuarios quedan sin contraseña utilizable
+        simular (bool): Validar e insertar, pero deshacer cada lote
+
+    Returns:
+        ResultadoImportacion
+    """
+    resultado = ResultadoImportacion()
+    # {clave de RUT: id de cliente} de los clientes ya vistos
+    importados = {}
+
+    filas = iter(filas)
+    while True:
+        bloque = list(islice(filas, lote))
+        if not bloque:
+            break
+        resultado.filas += len(bloque)
+        _importar_lote(bloque, resultado, importados, contrasenas_temporales, simular)
+    return resultado
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from clinic.busqueda import buscar_clientes, buscar_mascotas, BUSQUEDA_LIMITE_POR_DEFECTO
+from clinic.models import Cliente
+import time
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia de la búsqueda typeahead de clientes y mascotas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=50,
+                            help='Veces que se ejecuta cada búsqueda (default: 50)')
+        parser.add_argument('--objetivo-ms', type=float, default=50.0,
+                            help='Latencia p95 máxima aceptable en milisegundos (default: 50)')
+        parser.add_argument('--explain', action='store_true',
+                            help='Mostrar el plan de ejecución de cada búsqueda')
+        parser.add_argument('consultas', nargs='*',
+                            help='Textos a buscar (por defecto se toman de los datos existentes)')
+
+    def _consultas_por_defecto(self):
+        cliente = Cliente.objects.order_by('?').first()
+        if not cliente:
+            return ['ju', 'pe', '123', '9123']
+        return [
+            cliente.nombre[:3],
+            f"{cliente.nombre[:2]} {cliente.apellido[:2]}",
+            cliente.rut[:6],
+            cliente.rut_normalizado[:5],
+            cliente.telefono_normalizado[:5],
+        ]
+
+    def handle(self, *args, **options):
+        repeticiones = options['repeticiones']
+        objetivo = options['objetivo_ms']
+        consultas = options['consultas'] or self._consultas_por_defecto()
+
+        self.stdout.write(f'Motor: {connection.vendor} | clientes: {Cliente.objects.count()} | '
+                          f'repeticiones: {repeticiones} | objetivo p95: {objetivo:.1f} ms')
+
+        fallidas = 0
+        for nombre, buscar in (('clientes', buscar_clientes), ('mascotas', buscar_mascotas)):
+            for q in consultas:
+                tiempos = []
+                for _ in range(repeticiones):
+                    inicio = time.perf_counter()
+                    resultados = list(buscar(q, BUSQUEDA_LIMITE_POR_DEFECTO))
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                tiempos.sort()
+                p50 = tiempos[len(tiempos) // 2]
+                p95 = tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))]
+
+                estilo = self.style.SUCCESS if p95 <= objetivo else self.style.ERROR
+                fallidas += p95 > objetivo
+                self.stdout.write(estilo(
+                    f'{nombre:9} {q!r:24} {len(resultados):3} resultados | p50 {p50:7.2f} ms | p95 {p95:7.2f} ms'
+                ))
+
+                if options['explain']:
+                    self.stdout.write(buscar(q, BUSQUEDA_LIMITE_POR_DEFECTO).explain())
+
+        if fallidas:
+            self.stdout.write(self.style.ERROR(f'{fallidas} búsquedas sobre el objetivo de {objetivo:.1f} ms'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Todas las búsquedas dentro del objetivo'))
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from clinic.views import (
+    ClienteViewSet, VeterinarioViewSet, MascotaViewSet, CitaViewSet,
+    AtencionViewSet, ListaEsperaViewSet, ProductoViewSet,
+)
+
+VIEWSETS = [
+    ('clientes', ClienteViewSet), ('veterinarios', VeterinarioViewSet), ('mascotas', MascotaViewSet),
+    ('citas', CitaViewSet), ('atenciones', AtencionViewSet), ('lista-espera', ListaEsperaViewSet),
+    ('productos', ProductoViewSet),
+]
+
+
+class Command(BaseCommand):
+    help = ('Cuenta las consultas que cuesta serializar listados de cada endpoint de la API con '
+            'distinta cantidad de filas. Falla si el número de consultas crece con las filas')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', type=int, nargs='+', default=[1, 10, 50],
+                            help='Cantidades de filas a serializar (default: 1 10 50)')
+        parser.add_argument('--comparar', action='store_true',
+                            help='Medir también sin la precarga de relaciones')
+
+    def _contar(self, queryset, serializer_class, filas):
+        with CaptureQueriesContext(connection) as consultas:
+            datos = serializer_class(queryset[:filas], many=True).data
+        return len(consultas.captured_queries), len(datos)
+
+    def handle(self, *args, **options):
+        tamanos = sorted(options['tamanos'])
+        fallidos = []
+
+        for nombre, viewset_class in VIEWSETS:
+            vista = viewset_class()
+            vista.request = Request(APIRequestFactory().get(f'/api/{nombre}/'))
+            vista.format_kwarg = None
+            vista.action = 'list'
+            serializer_class = vista.get_serializer_class()
+
+            variantes = [('con precarga', vista.get_queryset())]
+            if options['comparar']:
+                variantes.append(('sin precarga', viewset_class.queryset.all()))
+
+            for variante, queryset in variantes:
+                mediciones = [self._contar(queryset, serializer_class, filas) for filas in tamanos]
+                detalle = ', '.join(f'{filas} filas: {n} consultas' for n, filas in mediciones)
+                constante = len({n for n, _ in mediciones}) == 1
+                linea = f'/api/{nombre}/ ({variante}): {detalle}'
+                if variante == 'con precarga' and not constante:
+                    fallidos.append(nombre)
+                    self.stdout.write(self.style.ERROR(linea))
+                else:
+                    self.stdout.write(self.style.SUCCESS(linea) if constante else linea)
+
+        if fallidos:
+            raise CommandError(f'Consultas que crecen con las filas en: {", ".join(fallidos)}')
@@ -0,0 +1,96 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from clinic.agenda import ESTADOS_ACTIVOS
+from clinic.models import Cita, Atencion, ListaEspera, Mascota, Veterinario
+from clinic.utils import rango_del_dia
+from datetime import timedelta
+import time
+
+# Índices agregados por la migración 0011
+INDICES = [
+    'cita_vet_fecha_estado_idx', 'cita_fecha_activa_idx', 'cita_mascota_fecha_idx',
+    'espera_fecha_turno_idx', 'espera_estado_prioridad_idx', 'atencion_fecha_idx',
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Muestra planes de ejecución y latencia de las consultas frecuentes, con y sin los índices de la migración 0011'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=50,
+                            help='Veces que se ejecuta cada consulta (default: 50)')
+        parser.add_argument('--comparar', action='store_true',
+                            help='Medir también sin los índices (se eliminan dentro de una '
+                                 'transacción que se revierte; bloquea las tablas mientras dura)')
+
+    def _consultas(self):
+        vet = Veterinario.objects.values_list('id', flat=True).first()
+        mascota = Mascota.objects.values_list('id', flat=True).first()
+        inicio_dia, fin_dia = rango_del_dia()
+        lunes = inicio_dia - timedelta(days=timezone.localdate().weekday())
+
+        return [
+            ('Conflictos / disponibilidad', Cita.objects.filter(
+                veterinario_id=vet, fecha_hora__gte=inicio_dia, fecha_hora__lt=fin_dia,
+                estado__in=ESTADOS_ACTIVOS
+            ).values('id', 'fecha_hora', 'tipo')),
+            ('Calendario semanal', Cita.objects.filter(
+                fecha_hora__gte=lunes, fecha_hora__lt=lunes + timedelta(days=7),
+                estado__in=ESTADOS_ACTIVOS
+            ).order_by('fecha_hora').values('id')),
+            ('Historial de citas', Cita.objects.filter(mascota_id=mascota).order_by('-fecha_hora')[:5]),
+            ('Historial de atenciones', Atencion.objects.filter(cita__mascota_id=mascota).order_by('-fecha')),
+            ('Cola del día', ListaEspera.objects.filter(
+                fecha_solicitud__gte=inicio_dia, fecha_solicitud__lt=fin_dia,
+                estado__in=[ListaEspera.Estado.ESPERANDO, ListaEspera.Estado.EN_ATENCION]
+            ).order_by('numero_turno')),
+            ('Pacientes esperando', ListaEspera.objects.filter(
+                estado=ListaEspera.Estado.ESPERANDO
+            ).order_by('-prioridad', 'numero_turno')),
+        ]
+
+    def _medir(self, titulo, repeticiones):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== {titulo} ==='))
+        with connection.cursor() as cursor:
+            for nombre, consulta in self._consultas():
+                # El comentario distingue cada medición en la caché de sentencias
+                # preparadas, para que el plan refleje los índices actuales
+                sql, params = consulta.query.sql_with_params()
+                sql = f'{sql} /* {titulo} */'
+
+                tiempos = []
+                for _ in range(repeticiones):
+                    inicio = time.perf_counter()
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                tiempos.sort()
+                p50 = tiempos[len(tiempos) // 2]
+                self.stdout.write(self.style.SUCCESS(f'{nombre}: p50 {p50:.2f} ms'))
+
+                cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+                for fila in cursor.fetchall():
+                    self.stdout.write('  ' + ' '.join(str(columna) for columna in fila))
+
+    def handle(self, *args, **options):
+        repeticiones = options['repeticiones']
+        self.stdout.write(f'Motor: {connection.vendor} | citas: {Cita.objects.count()} | '
+                          f'lista de espera: {ListaEspera.objects.count()}')
+
+        self._medir('Con índices', repeticiones)
+
+        if options['comparar']:
+            try:
+                with transaction.atomic():
+                    with connection.cursor() as cursor:
+                        for nombre in INDICES:
+                            cursor.execute(f'DROP INDEX IF EXISTS {connection.ops.quote_name(nombre)}')
+                    self._medir('Sin índices', repeticiones)
+                    raise Rollback
+            except Rollback:
+                pass
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from clinic import renderers
+from datetime import timedelta
+from decimal import Decimal
+import json
+import time
+
+
+class Command(BaseCommand):
+    help = 'Compara el tiempo de codificación JSON de respuestas típicas: json estándar vs clinic.renderers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=1000,
+                            help='Filas de cada respuesta de prueba (default: 1000)')
+        parser.add_argument('--repeticiones', type=int, default=50,
+                            help='Veces que se codifica cada respuesta (default: 50)')
+
+    def _respuestas(self, filas):
+        ahora = timezone.now()
+        # Como la entrega un serializer de DRF: fechas y decimales ya como texto
+        api = [{
+            'id': i, 'mascota_nombre': f'Mascota {i}', 'cliente_nombre': 'José Muñoz',
+            'veterinario_nombre': 'Dr. Pérez', 'fecha_hora': (ahora + timedelta(minutes=30 * i)).isoformat(),
+            'tipo': 'CONSULTA', 'estado': 'AGENDADA', 'motivo': 'Control anual y vacunas',
+            'es_urgencia': False, 'mascota': i, 'veterinario': 1,
+        } for i in range(filas)]
+        # Como en las vistas con JsonResponse: valores de Python sin convertir
+        nativa = {'desde': ahora.date(), 'filas': [{
+            'id': i, 'fecha': ahora + timedelta(minutes=i), 'dia': ahora.date(),
+            'costo': Decimal('15990.50'), 'disponible': i % 2 == 0, 'vet': {i % 7: 'libre'},
+        } for i in range(filas)]}
+        return [('Listado API (DRF)', api), ('Valores nativos (JsonResponse)', nativa)]
+
+    def _medir(self, codificar, datos, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            salida = codificar(datos)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        tiempos.sort()
+        return tiempos[len(tiempos) // 2], salida
+
+    def handle(self, *args, **options):
+        repeticiones = options['repeticiones']
+        motor = 'orjson' if renderers.orjson is not None else 'json estándar (orjson no instalado)'
+        self.stdout.write(f'clinic.renderers usa: {motor} | filas: {options["filas"]} | '
+                          f'repeticiones: {repeticiones}')
+
+        codificadores = {
+            'Listado API (DRF)': [
+                ('JSONRenderer', lambda datos: JSONRenderer().render(datos)),
+                ('JSONRapidoRenderer', lambda datos: renderers.JSONRapidoRenderer().render(datos)),
+            ],
+            'Valores nativos (JsonResponse)': [
+                ('json + DjangoJSONEncoder', lambda datos: json.dumps(datos, cls=DjangoJSONEncoder).encode()),
+                ('renderers.dumps', renderers.dumps),
+            ],
+        }
+
+        for nombre, datos in self._respuestas(options['filas']):
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== {nombre} ==='))
+            base = None
+            for etiqueta, codificar in codificadores[nombre]:
+                p50, salida = self._medir(codificar, datos, repeticiones)
+                comparacion = f' ({base / p50:.1f}x)' if base else ''
+                base = base or p50
+                self.stdout.write(self.style.SUCCESS(
+                    f'{etiqueta}: p50 {p50:.2f} ms | {len(salida) / 1024:.1f} KB{comparacion}'
+                ))
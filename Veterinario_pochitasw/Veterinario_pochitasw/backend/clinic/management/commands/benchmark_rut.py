@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand
+from clinic import rut
+import random
+import time
+
+
+def _validar_por_digito(valor):
+    """Validación directa (un ciclo por dígito), como referencia."""
+    limpio = valor.replace('.', '').replace('-', '').replace(' ', '').upper()
+    cuerpo, dv = limpio[:-1], limpio[-1:]
+    if not cuerpo.isdigit():
+        return None
+    suma, peso = 0, 2
+    for digito in reversed(cuerpo):
+        suma += int(digito) * peso
+        peso = 2 if peso == 7 else peso + 1
+    resto = 11 - suma % 11
+    esperado = '0' if resto == 11 else 'K' if resto == 10 else str(resto)
+    return f'{int(cuerpo)}{dv}' if dv == esperado else None
+
+
+class Command(BaseCommand):
+    help = 'Mide la validación de RUT: por dígito, clinic.rut.validar y clinic.rut.validar_lote'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cantidad', type=int, default=1_000_000,
+                            help='RUT a validar (default: 1000000)')
+        parser.add_argument('--invalidos', type=float, default=0.1,
+                            help='Fracción de RUT con DV incorrecto (default: 0.1)')
+
+    def _generar(self, cantidad, invalidos):
+        aleatorio = random.Random(42)
+        ruts = []
+        for _ in range(cantidad):
+            cuerpo = aleatorio.randint(1_000_000, 29_999_999)
+            dv = rut.digito_verificador(cuerpo)
+            if aleatorio.random() < invalidos:
+                dv = '0' if dv != '0' else '1'
+            # Mezcla de formatos: con puntos, solo guion y sin separadores
+            formato = aleatorio.randrange(3)
+            if formato == 0:
+                ruts.append(rut.formatear(f'{cuerpo}{dv}'))
+            elif formato == 1:
+                ruts.append(f'{cuerpo}-{dv.lower()}')
+            else:
+                ruts.append(f'{cuerpo}{dv}')
+        return ruts
+
+    def handle(self, *args, **options):
+        cantidad = options['cantidad']
+        self.stdout.write(f'Generando {cantidad} RUT...')
+        ruts = self._generar(cantidad, options['invalidos'])
+        rut.validar_lote(ruts[:1])  # construir las tablas fuera de la medición
+
+        metodos = [
+            ('Ciclo por dígito', lambda: [_validar_por_digito(r) for r in ruts]),
+            ('rut.validar (uno a uno)', lambda: [rut.validar(r) for r in ruts]),
+            ('rut.validar_lote', lambda: rut.validar_lote(ruts)),
+        ]
+        base = referencia = None
+        for etiqueta, ejecutar in metodos:
+            inicio = time.perf_counter()
+            resultado = ejecutar()
+            segundos = time.perf_counter() - inicio
+            if referencia is None:
+                referencia = resultado
+            elif resultado != referencia:
+                self.stdout.write(self.style.ERROR(f'{etiqueta}: resultados distintos a la referencia'))
+                continue
+            comparacion = f' ({base / segundos:.1f}x)' if base else ''
+            base = base or segundos
+            self.stdout.write(self.style.SUCCESS(
+                f'{etiqueta}: {segundos:.2f} s | {cantidad / segundos / 1e6:.2f} M RUT/s{comparacion}'
+            ))
+
+        validos = sum(clave is not None for clave in referencia)
+        self.stdout.write(f'Válidos: {validos} | inválidos: {cantidad - validos}')
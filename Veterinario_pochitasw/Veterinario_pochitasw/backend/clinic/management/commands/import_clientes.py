@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+from clinic import importacion
+import os
+import sys
+import time
+
+
+class Command(BaseCommand):
+    help = 'Importa clientes y mascotas desde un archivo CSV, JSON o JSON Lines (ver clinic/importacion.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo, o - para leer de la entrada estándar')
+        parser.add_argument('--formato', choices=importacion.FORMATOS,
+                            help='Formato del archivo (default: según la extensión, o csv)')
+        parser.add_argument('--lote', type=int, default=importacion.IMPORTACION_LOTE,
+                            help=f'Filas por transacción (default: {importacion.IMPORTACION_LOTE})')
+        parser.add_argument('--contrasenas',
+                            help='Dar a cada usuario creado una contraseña temporal aleatoria y guardarlas '
+                                 'en este archivo CSV (por defecto quedan sin contraseña utilizable). '
+                                 'Cada contraseña se hashea por separado: unos 0,2 s por usuario y CPU')
+        parser.add_argument('--reporte', help='Guardar los errores en este archivo CSV')
+        parser.add_argument('--simular', action='store_true',
+                            help='Validar e insertar, pero deshacer los cambios')
+
+    def handle(self, *args, **options):
+        if options['contrasenas'] and options['simular']:
+            raise CommandError('--contrasenas no se puede usar con --simular')
+        formato = options['formato'] or importacion.formato_de(options['archivo'])
+        try:
+            archivo = sys.stdin if options['archivo'] == '-' else open(
+                options['archivo'], encoding='utf-8-sig', newline=''
+            )
+        except OSError as e:
+            raise CommandError(f'No se pudo abrir el archivo: {e}')
+
+        inicio = time.perf_counter()
+        with archivo:
+            try:
+                resultado = importacion.importar(
+                    importacion.leer_filas(archivo, formato),
+                    lote=options['lote'],
+                    contrasenas_temporales=bool(options['contrasenas']),
+                    simular=options['simular'],
+                )
+            except importacion.ERRORES_LECTURA as e:
+                # Los lotes anteriores al error ya quedaron guardados
+                raise CommandError(f'No se pudo leer el archivo: {e}')
+        segundos = time.perf_counter() - inicio
+
+        if options['contrasenas']:
+            # Solo legible por el dueño: contiene contraseñas en texto plano
+            descriptor = os.open(options['contrasenas'], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(descriptor, 'w', encoding='utf-8', newline='') as salida:
+                resultado.escribir_credenciales(salida)
+
+        if options['reporte']:
+            with open(options['reporte'], 'w', encoding='utf-8', newline='') as salida:
+                resultado.escribir_reporte(salida)
+        else:
+            for linea, rut, mensaje in resultado.errores[:50]:
+                self.stdout.write(self.style.WARNING(f'  Línea {linea} ({rut or "sin RUT"}): {mensaje}'))
+            if len(resultado.errores) > 50:
+                self.stdout.write(f'  ... y {len(resultado.errores) - 50} errores más (use --reporte)')
+
+        simulado = ' [SIMULACIÓN: no se guardó nada]' if options['simular'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.filas} filas en {segundos:.1f} s ({resultado.filas / max(segundos, 1e-9) * 60:,.0f} filas/min) | '
+            f'clientes: {resultado.clientes_creados} creados, {resultado.clientes_existentes} ya existían | '
+            f'mascotas: {resultado.mascotas_creadas} creadas, {resultado.mascotas_existentes} ya existían | '
+            f'errores: {len(resultado.errores)}{simulado}'
+        ))
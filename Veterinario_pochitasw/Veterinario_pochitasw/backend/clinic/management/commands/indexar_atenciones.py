@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from clinic import busqueda_clinica
+from clinic.models import Atencion
+import time
+
+
+class Command(BaseCommand):
+    help = 'Indexa las atenciones para la búsqueda de texto completo (diagnóstico, tratamiento, medicamentos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500,
+                            help='Atenciones indexadas por transacción (default: 500)')
+        parser.add_argument('--faltantes', action='store_true',
+                            help='Indexar solo las atenciones que aún no están en el índice')
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        atenciones = busqueda_clinica.sin_indexar() if options['faltantes'] else Atencion.objects.all()
+        total = atenciones.count()
+        self.stdout.write(f'Motor: {connection.vendor} | atenciones a indexar: {total} | lote: {lote}')
+
+        inicio = time.perf_counter()
+        indexadas = 0
+        ultimo_id = 0
+        while True:
+            # Recorrido por id (keyset): cada lote es un rango del índice primario
+            ids = list(atenciones.filter(id__gt=ultimo_id).order_by('id').values_list('id', flat=True)[:lote])
+            if not ids:
+                break
+            with transaction.atomic():
+                busqueda_clinica.indexar(ids)
+            indexadas += len(ids)
+            ultimo_id = ids[-1]
+            self.stdout.write(f'  {indexadas}/{total}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{indexadas} atenciones indexadas en {time.perf_counter() - inicio:.1f} s'
+        ))
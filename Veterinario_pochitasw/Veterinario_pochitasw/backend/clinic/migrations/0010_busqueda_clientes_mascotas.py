@@ -0,0 +1,75 @@
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+# Índices trigram (solo PostgreSQL) para búsquedas por subcadena con icontains.
+# Django genera UPPER("columna"::text) LIKE UPPER(%s), así que el índice
+# se construye sobre esa misma expresión.
+INDICES_TRIGRAM = [
+    ('cliente_nombre_trgm_idx', 'clinic_cliente', 'nombre'),
+    ('cliente_apellido_trgm_idx', 'clinic_cliente', 'apellido'),
+    ('mascota_nombre_trgm_idx', 'clinic_mascota', 'nombre'),
+]
+
+
+def normalizar_existentes(apps, schema_editor):
+    from clinic.utils import normalizar_rut, normalizar_telefono
+
+    Cliente = apps.get_model('clinic', 'Cliente')
+    clientes = list(Cliente.objects.only('id', 'rut', 'telefono'))
+    for cliente in clientes:
+        cliente.rut_normalizado = normalizar_rut(cliente.rut)
+        cliente.telefono_normalizado = normalizar_telefono(cliente.telefono)
+    Cliente.objects.bulk_update(clientes, ['rut_normalizado', 'telefono_normalizado'], batch_size=500)
+
+
+def crear_indices_trigram(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for nombre, tabla, columna in INDICES_TRIGRAM:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} '
+            f'USING gin (UPPER({columna}::text) gin_trgm_ops)'
+        )
+
+
+def eliminar_indices_trigram(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nombre, tabla, columna in INDICES_TRIGRAM:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nombre}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0009_cita_fecha_reagendamiento_cita_motivo_reagendamiento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='rut_normalizado',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='telefono_normalizado',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=15),
+        ),
+        migrations.RunPython(normalizar_existentes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(django.db.models.functions.text.Lower('nombre'), name='cliente_nombre_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(django.db.models.functions.text.Lower('apellido'), name='cliente_apellido_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mascota',
+            index=models.Index(django.db.models.functions.text.Lower('nombre'), name='mascota_nombre_lower_idx'),
+        ),
+        migrations.RunPython(crear_indices_trigram, eliminar_indices_trigram),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations, models
+
+
+class AddIndexSinBloqueo(migrations.AddIndex):
+    """
+    AddIndex que en PostgreSQL usa CREATE INDEX CONCURRENTLY, para no
+    bloquear escrituras sobre tablas con datos mientras se construye el
+    índice. En otros motores se comporta como AddIndex.
+
+    Requiere una migración con atomic = False.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('clinic', '0010_busqueda_clientes_mascotas'),
+    ]
+
+    operations = [
+        AddIndexSinBloqueo(
+            model_name='atencion',
+            index=models.Index(fields=['-fecha'], name='atencion_fecha_idx'),
+        ),
+        AddIndexSinBloqueo(
+            model_name='cita',
+            index=models.Index(fields=['veterinario', 'fecha_hora', 'estado'], name='cita_vet_fecha_estado_idx'),
+        ),
+        AddIndexSinBloqueo(
+            model_name='cita',
+            index=models.Index(condition=models.Q(('estado__in', ['AGENDADA', 'CONFIRMADA'])), fields=['fecha_hora'], name='cita_fecha_activa_idx'),
+        ),
+        AddIndexSinBloqueo(
+            model_name='cita',
+            index=models.Index(fields=['mascota', '-fecha_hora'], name='cita_mascota_fecha_idx'),
+        ),
+        AddIndexSinBloqueo(
+            model_name='listaespera',
+            index=models.Index(fields=['fecha_solicitud', 'numero_turno'], name='espera_fecha_turno_idx'),
+        ),
+        AddIndexSinBloqueo(
+            model_name='listaespera',
+            index=models.Index(fields=['estado', 'prioridad'], name='espera_estado_prioridad_idx'),
+        ),
+    ]
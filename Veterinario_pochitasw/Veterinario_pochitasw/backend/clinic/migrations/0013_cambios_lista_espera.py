@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0012_secuencia_turno'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorCambios',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('valor', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contador de Cambios',
+                'verbose_name_plural': 'Contadores de Cambios',
+            },
+        ),
+        migrations.AddField(
+            model_name='listaespera',
+            name='version',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0013_cambios_lista_espera'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenClinico',
+            fields=[
+                ('mascota', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen_clinico', serialize=False, to='clinic.mascota')),
+                ('ultima_visita', models.DateTimeField(blank=True, null=True)),
+                ('total_visitas', models.PositiveIntegerField(default=0)),
+                ('visitas_por_tipo', models.JSONField(blank=True, default=dict, help_text='{tipo de cita: cantidad}')),
+                ('ultima_atencion_fecha', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_diagnostico', models.TextField(blank=True)),
+                ('ultimo_tratamiento', models.TextField(blank=True)),
+                ('ultimos_medicamentos', models.TextField(blank=True)),
+                ('ultima_requiere_operacion', models.BooleanField(default=False)),
+                ('operaciones_pendientes', models.PositiveIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('ultima_atencion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='clinic.atencion')),
+            ],
+            options={
+                'verbose_name': 'Resumen Clínico',
+                'verbose_name_plural': 'Resúmenes Clínicos',
+            },
+        ),
+    ]
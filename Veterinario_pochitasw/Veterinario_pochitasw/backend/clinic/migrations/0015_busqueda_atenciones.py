@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:44
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# PostgreSQL: configuración de texto en español que además quita acentos,
+# tabla de vectores (modelo IndiceAtencion, managed = False) e índice GIN.
+SQL_POSTGRES = [
+    'CREATE EXTENSION IF NOT EXISTS unaccent',
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_sin_acentos') THEN
+            CREATE TEXT SEARCH CONFIGURATION es_sin_acentos (COPY = spanish);
+            ALTER TEXT SEARCH CONFIGURATION es_sin_acentos
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+        END IF;
+    END $$
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS clinic_atencion_busqueda (
+        atencion_id bigint PRIMARY KEY REFERENCES clinic_atencion (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+        vector tsvector NOT NULL
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS atencion_busqueda_vector_idx ON clinic_atencion_busqueda USING gin (vector)',
+]
+
+# SQLite: tabla FTS5; rowid = id de la atención
+SQL_SQLITE = [
+    'CREATE VIRTUAL TABLE IF NOT EXISTS clinic_atencion_fts USING fts5('
+    'diagnostico, tratamiento, medicamentos, tokenize="unicode61 remove_diacritics 2")',
+]
+
+
+def crear_indice_texto(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for sql in {'postgresql': SQL_POSTGRES, 'sqlite': SQL_SQLITE}.get(vendor, []):
+        schema_editor.execute(sql)
+
+
+def eliminar_indice_texto(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE IF EXISTS clinic_atencion_busqueda')
+        schema_editor.execute('DROP TEXT SEARCH CONFIGURATION IF EXISTS es_sin_acentos')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS clinic_atencion_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0014_resumen_clinico'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndiceAtencion',
+            fields=[
+                ('atencion', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='indice_busqueda', serialize=False, to='clinic.atencion')),
+                ('vector', django.contrib.postgres.search.SearchVectorField()),
+            ],
+            options={
+                'db_table': 'clinic_atencion_busqueda',
+                'managed': False,
+            },
+        ),
+        # Las atenciones existentes se indexan con `manage.py indexar_atenciones`
+        migrations.RunPython(crear_indice_texto, eliminar_indice_texto),
+    ]
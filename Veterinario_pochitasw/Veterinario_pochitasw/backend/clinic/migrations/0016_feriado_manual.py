@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:40
+
+from datetime import date
+
+from django.db import migrations, models
+
+
+# Feriados de elecciones: no se pueden calcular. Los de 2024 estaban en la
+# lista fija que reemplaza clinic.feriados
+FERIADOS_ELECCIONES = [
+    (date(2024, 6, 9), 'Elecciones primarias'),
+    (date(2024, 10, 27), 'Elecciones municipales y regionales'),
+    (date(2025, 11, 16), 'Elecciones presidenciales y parlamentarias'),
+    (date(2025, 12, 14), 'Segunda vuelta presidencial'),
+]
+
+
+def cargar_elecciones(apps, schema_editor):
+    FeriadoManual = apps.get_model('clinic', 'FeriadoManual')
+    for fecha, nombre in FERIADOS_ELECCIONES:
+        FeriadoManual.objects.get_or_create(fecha=fecha, defaults={'nombre': nombre})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0015_busqueda_atenciones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeriadoManual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('nombre', models.CharField(max_length=100)),
+                ('es_feriado', models.BooleanField(default=True, help_text='Desmarcar para que la fecha sea hábil aunque sea un feriado calculado')),
+            ],
+            options={
+                'verbose_name': 'Feriado Manual',
+                'verbose_name_plural': 'Feriados Manuales',
+                'ordering': ['fecha'],
+            },
+        ),
+        migrations.RunPython(cargar_elecciones, migrations.RunPython.noop),
+    ]
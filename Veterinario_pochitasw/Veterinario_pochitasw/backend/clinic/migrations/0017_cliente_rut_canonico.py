@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:15
+
+from django.db import migrations, models
+
+
+def recalcular_claves(apps, schema_editor):
+    from clinic.rut import canonico
+
+    Cliente = apps.get_model('clinic', 'Cliente')
+    clientes = list(Cliente.objects.only('id', 'rut'))
+    por_clave = {}
+    for cliente in clientes:
+        cliente.rut_normalizado = canonico(cliente.rut)
+        if cliente.rut_normalizado:
+            por_clave.setdefault(cliente.rut_normalizado, []).append(cliente)
+
+    duplicados = {clave: grupo for clave, grupo in por_clave.items() if len(grupo) > 1}
+    if duplicados:
+        detalle = '; '.join(
+            ', '.join(f'#{c.id} {c.rut}' for c in grupo) for grupo in duplicados.values()
+        )
+        raise RuntimeError(
+            'Hay clientes con el mismo RUT escrito con distinto formato. '
+            f'Deben unificarse antes de migrar: {detalle}'
+        )
+    Cliente.objects.bulk_update(clientes, ['rut_normalizado'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0016_feriado_manual'),
+    ]
+
+    operations = [
+        migrations.RunPython(recalcular_claves, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cliente',
+            constraint=models.UniqueConstraint(condition=models.Q(('rut_normalizado', ''), _negated=True), fields=('rut_normalizado',), name='cliente_rut_normalizado_unico'),
+        ),
+    ]
@@ -1,8 +1,12 @@
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
+from django.db.models.functions import Lower
+from .rut import canonico as rut_canonico
+from .utils import normalizar_telefono, rango_del_dia
 
 # Validadores (permisivos para testing)
 phone_validator = RegexValidator(
@@ -39,9 +43,34 @@ class Cliente(models.Model):
     telefono = models.CharField(max_length=15, validators=[phone_validator])
     email = models.EmailField(blank=True, null=True)
     direccion = models.TextField(blank=True)
+    
+    # Claves de búsqueda (se recalculan en save). rut_normalizado es la
+    # clave canónica de clinic.rut: un RUT no se repite aunque cambie el formato
+    rut_normalizado = models.CharField(max_length=12, db_index=True, editable=False, default='')
+    telefono_normalizado = models.CharField(max_length=15, db_index=True, editable=False, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(Lower('nombre'), name='cliente_nombre_lower_idx'),
+            models.Index(Lower('apellido'), name='cliente_apellido_lower_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['rut_normalizado'], condition=~models.Q(rut_normalizado=''),
+                name='cliente_rut_normalizado_unico'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.nombre} {self.apellido} - {self.rut}"
+    
+    def save(self, *args, **kwargs):
+        self.rut_normalizado = rut_canonico(self.rut)
+        self.telefono_normalizado = normalizar_telefono(self.telefono)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'rut_normalizado', 'telefono_normalizado'}
+        super().save(*args, **kwargs)
 
 class Veterinario(models.Model):
     usuario = models.OneToOneField(Usuario, on_delete=models.CASCADE, related_name='perfil_veterinario', null=True, blank=True)
@@ -71,6 +100,11 @@ class Mascota(models.Model):
     fecha_registro = models.DateField(default=timezone.now)
     observaciones = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(Lower('nombre'), name='mascota_nombre_lower_idx'),
+        ]
+
     def __str__(self):
         return f"{self.nombre} ({self.especie}) - Dueño: {self.cliente.nombre}"
 
@@ -121,6 +155,19 @@ class Cita(models.Model):
     
     # Campo helper para saber si ya se procesó en atención
     
+    class Meta:
+        indexes = [
+            # Conflictos de horario, disponibilidad y agenda del veterinario
+            models.Index(fields=['veterinario', 'fecha_hora', 'estado'], name='cita_vet_fecha_estado_idx'),
+            # Calendario de recepción: solo citas activas (índice parcial)
+            models.Index(
+                fields=['fecha_hora'], name='cita_fecha_activa_idx',
+                condition=models.Q(estado__in=['AGENDADA', 'CONFIRMADA'])
+            ),
+            # Historial de la mascota (más recientes primero)
+            models.Index(fields=['mascota', '-fecha_hora'], name='cita_mascota_fecha_idx'),
+        ]
+    
     def __str__(self):
         return f"Cita: {self.mascota.nombre} con Dr. {self.veterinario.nombre if self.veterinario else 'Sin asignar'} - {self.fecha_hora}"
 
@@ -153,11 +200,19 @@ class ListaEspera(models.Model):
     numero_turno = models.IntegerField(null=True, blank=True, help_text="Número en la cola del día")
     veterinario_asignado = models.ForeignKey('Veterinario', on_delete=models.SET_NULL, null=True, blank=True, related_name='pacientes_espera')
     fecha_atencion = models.DateTimeField(null=True, blank=True, help_text="Fecha y hora de inicio de atención")
+    # Versión del último cambio (ver ContadorCambios), usada como cursor por /api/lista-espera/cambios/
+    version = models.BigIntegerField(default=0, db_index=True, editable=False)
 
     class Meta:
         ordering = ['numero_turno', 'fecha_solicitud']
         verbose_name = 'Lista de Espera'
         verbose_name_plural = 'Listas de Espera'
+        indexes = [
+            # Cola del día y asignación de turnos
+            models.Index(fields=['fecha_solicitud', 'numero_turno'], name='espera_fecha_turno_idx'),
+            # Pacientes esperando, por prioridad
+            models.Index(fields=['estado', 'prioridad'], name='espera_estado_prioridad_idx'),
+        ]
 
     def __str__(self):
         if self.mascota:
@@ -165,15 +220,121 @@ class ListaEspera(models.Model):
         return f"Espera: {self.cliente.nombre} - {self.fecha_solicitud}"
     
     def save(self, *args, **kwargs):
-        # Auto-asignar número de turno si es walk-in nuevo
-        if not self.pk and not self.numero_turno and self.estado == self.Estado.ESPERANDO:
-            # Obtener el último turno del día
-            today = timezone.now().date()
-            ultimo_turno = ListaEspera.objects.filter(
-                fecha_solicitud__date=today
-            ).aggregate(models.Max('numero_turno'))['numero_turno__max']
-            self.numero_turno = (ultimo_turno or 0) + 1
-        super().save(*args, **kwargs)
+        # El turno, la versión y el registro se guardan en la misma
+        # transacción: si el insert falla, no se consume ningún número
+        with transaction.atomic():
+            # Auto-asignar número de turno si es walk-in nuevo
+            if not self.pk and not self.numero_turno and self.estado == self.Estado.ESPERANDO:
+                self.numero_turno = SecuenciaTurno.siguiente()
+            self.version = ContadorCambios.incrementar(ContadorCambios.LISTA_ESPERA)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'version'}
+            super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            ContadorCambios.incrementar(ContadorCambios.LISTA_ESPERA)
+            return super().delete(*args, **kwargs)
+
+
+class ContadorCambios(models.Model):
+    """
+    Contadores de versión compartidos entre procesos.
+    
+    incrementar() bloquea la fila del contador hasta el fin de la transacción,
+    así que las versiones quedan en el mismo orden en que se confirman los
+    cambios: quien lee la versión N ya puede ver todos los cambios <= N.
+    """
+    LISTA_ESPERA = 'lista_espera'
+
+    nombre = models.CharField(max_length=50, unique=True)
+    valor = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Contador de Cambios'
+        verbose_name_plural = 'Contadores de Cambios'
+
+    def __str__(self):
+        return f"{self.nombre}: {self.valor}"
+
+    @classmethod
+    def incrementar(cls, nombre):
+        """Incrementa el contador y retorna su nuevo valor (dentro de una transacción)."""
+        if not cls.objects.filter(nombre=nombre).update(valor=models.F('valor') + 1):
+            _, creado = cls.objects.get_or_create(nombre=nombre, defaults={'valor': 1})
+            if not creado:
+                cls.objects.filter(nombre=nombre).update(valor=models.F('valor') + 1)
+        return cls.valor_actual(nombre)
+
+    @classmethod
+    def valor_actual(cls, nombre):
+        return cls.objects.filter(nombre=nombre).values_list('valor', flat=True).first() or 0
+
+
+class SecuenciaTurno(models.Model):
+    """
+    Contador de turnos walk-in por día.
+    
+    Cada asignación incrementa una sola fila con UPDATE ... SET ultimo_numero
+    = ultimo_numero + 1, que bloquea la fila hasta el fin de la transacción:
+    dos recepcionistas (o dos workers) nunca reciben el mismo número y no
+    se recorre la lista de espera.
+    """
+    fecha = models.DateField(unique=True)
+    ultimo_numero = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Secuencia de Turnos'
+        verbose_name_plural = 'Secuencias de Turnos'
+
+    def __str__(self):
+        return f"{self.fecha}: {self.ultimo_numero}"
+
+    @classmethod
+    def siguiente(cls, fecha=None):
+        """
+        Reserva y retorna el siguiente número de turno del día (hora local).
+        
+        Debe llamarse dentro de la transacción que guarda el registro.
+        """
+        fecha = fecha or timezone.localdate()
+        if not cls.objects.filter(fecha=fecha).update(ultimo_numero=models.F('ultimo_numero') + 1):
+            # Primer turno del día: continuar desde los turnos ya registrados
+            # (solo ocurre una vez por día)
+            inicio, fin = rango_del_dia(fecha)
+            ultimo = ListaEspera.objects.filter(
+                fecha_solicitud__gte=inicio, fecha_solicitud__lt=fin
+            ).aggregate(models.Max('numero_turno'))['numero_turno__max'] or 0
+            _, creada = cls.objects.get_or_create(fecha=fecha, defaults={'ultimo_numero': ultimo + 1})
+            if not creada:
+                # Otro proceso creó la fila entre medio
+                cls.objects.filter(fecha=fecha).update(ultimo_numero=models.F('ultimo_numero') + 1)
+        return cls.objects.filter(fecha=fecha).values_list('ultimo_numero', flat=True).get()
+
+
+class FeriadoManual(models.Model):
+    """
+    Ajuste manual del calendario de feriados (clinic.feriados).
+    
+    Agrega los feriados que no se pueden calcular (elecciones, feriados
+    decretados) o, con es_feriado desmarcado, deja como hábil una fecha que
+    el calendario calculado marca como feriado.
+    """
+    fecha = models.DateField(unique=True)
+    nombre = models.CharField(max_length=100)
+    es_feriado = models.BooleanField(
+        default=True,
+        help_text='Desmarcar para que la fecha sea hábil aunque sea un feriado calculado'
+    )
+
+    class Meta:
+        ordering = ['fecha']
+        verbose_name = 'Feriado Manual'
+        verbose_name_plural = 'Feriados Manuales'
+
+    def __str__(self):
+        return f"{self.fecha}: {self.nombre}"
 
 class Atencion(models.Model):
     cita = models.OneToOneField(Cita, on_delete=models.CASCADE, related_name='atencion')
@@ -186,9 +347,111 @@ class Atencion(models.Model):
     
     # Si requiere operación, se planifican revisiones (logica en vista)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-fecha'], name='atencion_fecha_idx'),
+        ]
+
     def __str__(self):
         return f"Atención {self.id} - {self.cita.mascota.nombre}"
 
+class IndiceAtencion(models.Model):
+    """
+    Vector de búsqueda de texto completo de una Atencion (PostgreSQL).
+
+    La tabla, su índice GIN y la configuración de texto en español sin
+    acentos se crean solo en PostgreSQL (migración 0015); en SQLite la
+    búsqueda usa una tabla FTS5. Ver clinic/busqueda_clinica.py.
+    """
+    atencion = models.OneToOneField(
+        Atencion, on_delete=models.DO_NOTHING, primary_key=True, db_constraint=False,
+        related_name='indice_busqueda'
+    )
+    vector = SearchVectorField()
+
+    class Meta:
+        managed = False
+        db_table = 'clinic_atencion_busqueda'
+
+
+class ResumenClinico(models.Model):
+    """
+    Resumen clínico desnormalizado de una mascota.
+
+    Se recalcula (solo para la mascota afectada) cada vez que se guarda o
+    elimina una Cita realizada o una Atencion, vía señales. Así los
+    antecedentes se leen con una sola consulta por clave primaria en lugar
+    de agregar todo el historial en cada petición.
+
+    Una visita es una cita REALIZADA. Las operaciones pendientes son las
+    atenciones marcadas con requiere_operacion posteriores a la última
+    cirugía realizada.
+    """
+    mascota = models.OneToOneField(Mascota, on_delete=models.CASCADE, primary_key=True, related_name='resumen_clinico')
+    ultima_visita = models.DateTimeField(null=True, blank=True)
+    total_visitas = models.PositiveIntegerField(default=0)
+    visitas_por_tipo = models.JSONField(default=dict, blank=True, help_text="{tipo de cita: cantidad}")
+    ultima_atencion = models.ForeignKey(Atencion, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    ultima_atencion_fecha = models.DateTimeField(null=True, blank=True)
+    ultimo_diagnostico = models.TextField(blank=True)
+    ultimo_tratamiento = models.TextField(blank=True)
+    ultimos_medicamentos = models.TextField(blank=True)
+    ultima_requiere_operacion = models.BooleanField(default=False)
+    operaciones_pendientes = models.PositiveIntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Resumen Clínico"
+        verbose_name_plural = "Resúmenes Clínicos"
+
+    def __str__(self):
+        return f"Resumen {self.mascota_id}: {self.total_visitas} visitas"
+
+    @classmethod
+    def actualizar(cls, mascota_id):
+        """
+        Recalcula el resumen de una mascota desde sus citas y atenciones.
+
+        Returns:
+            ResumenClinico | None: None si la mascota ya no existe
+        """
+        if not Mascota.objects.filter(pk=mascota_id).exists():
+            return None
+
+        visitas = Cita.objects.filter(mascota_id=mascota_id, estado=Cita.Estado.REALIZADA).values('tipo').annotate(
+            cantidad=models.Count('id'), ultima=models.Max('fecha_hora')
+        )
+        por_tipo = {fila['tipo']: fila['cantidad'] for fila in visitas}
+        ultimas = {fila['tipo']: fila['ultima'] for fila in visitas}
+
+        atenciones = Atencion.objects.filter(cita__mascota_id=mascota_id)
+        ultima = atenciones.order_by('-fecha', '-id').first()
+        pendientes = atenciones.filter(requiere_operacion=True)
+        if Cita.Tipo.CIRUGIA in ultimas:
+            pendientes = pendientes.filter(fecha__gt=ultimas[Cita.Tipo.CIRUGIA])
+
+        resumen, _ = cls.objects.update_or_create(mascota_id=mascota_id, defaults={
+            'ultima_visita': max(ultimas.values(), default=None),
+            'total_visitas': sum(por_tipo.values()),
+            'visitas_por_tipo': por_tipo,
+            'ultima_atencion': ultima,
+            'ultima_atencion_fecha': ultima.fecha if ultima else None,
+            'ultimo_diagnostico': ultima.diagnostico if ultima else '',
+            'ultimo_tratamiento': ultima.tratamiento if ultima else '',
+            'ultimos_medicamentos': ultima.medicamentos if ultima else '',
+            'ultima_requiere_operacion': ultima.requiere_operacion if ultima else False,
+            'operaciones_pendientes': pendientes.count(),
+        })
+        return resumen
+
+    @classmethod
+    def de(cls, mascota_id):
+        """Resumen de la mascota; se calcula la primera vez que se pide."""
+        try:
+            return cls.objects.get(pk=mascota_id)
+        except cls.DoesNotExist:
+            return cls.actualizar(mascota_id)
+
 class Producto(models.Model):
     nombre = models.CharField(max_length=100)
     descripcion = models.TextField(blank=True)
@@ -0,0 +1,28 @@
+"""
+Paginación por cursor para los listados grandes de la API.
+
+PageNumberPagination ejecuta un COUNT(*) por página y un OFFSET que crece
+con el número de página. Con CursorPagination cada página es un rango
+sobre el índice de la columna de orden (WHERE fecha > cursor LIMIT n),
+así que su costo no depende de cuán profunda sea la página.
+
+El cursor es opaco: el cliente sigue los enlaces `next` y `previous` de
+la respuesta en lugar de pedir ?page=N.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class CursorFechaPagination(CursorPagination):
+    """Base: tamaño de página por defecto de settings, ajustable con ?page_size=."""
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class CitaCursorPagination(CursorFechaPagination):
+    # El id desempata citas a la misma hora, para que el cursor sea estable
+    ordering = ('fecha_hora', 'id')
+
+
+class AtencionCursorPagination(CursorFechaPagination):
+    # Las más recientes primero, como en el historial clínico
+    ordering = ('-fecha', '-id')
@@ -0,0 +1,84 @@
+"""
+Plantel de veterinarios (id, nombre y especialidad) en memoria.
+
+El plantel cambia muy pocas veces, pero los selectores de veterinario de
+los dashboards de recepción y cliente lo muestran en cada carga. Cada
+proceso guarda la lista junto con la versión con que la leyó. La versión
+vive en la caché compartida (ver CACHES en settings), y las señales la
+cambian al guardar o eliminar un Veterinario: todos los workers recargan
+la lista en su siguiente lectura.
+
+La versión también es el ETag de /api/veterinarios/plantel/, para que el
+frontend pueda guardar la lista y revalidarla con If-None-Match.
+"""
+import threading
+import time as reloj
+
+from django.core.cache import cache
+
+
+CLAVE_VERSION = 'plantel:version'
+
+CAMPOS_PLANTEL = ('id', 'nombre', 'especialidad')
+
+_lock = threading.Lock()
+# (versión, veterinarios) leídos por este proceso
+_plantel = (None, ())
+
+
+def _ahora_ms():
+    return reloj.time_ns() // 1_000_000
+
+
+def version_actual():
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        cache.add(CLAVE_VERSION, _ahora_ms(), timeout=None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+def invalidar():
+    """Marca el plantel como modificado (llamar después del commit)."""
+    cache.set(CLAVE_VERSION, max(_ahora_ms(), (cache.get(CLAVE_VERSION) or 0) + 1), timeout=None)
+
+
+def plantel():
+    """
+    Versión y lista de veterinarios vigentes.
+
+    Returns:
+        tuple: (versión, tupla de dicts con CAMPOS_PLANTEL, por id). Los
+            dicts se comparten entre peticiones y no deben modificarse
+    """
+    global _plantel
+
+    version = version_actual()
+    leida, veterinarios = _plantel
+    if leida == version:
+        return version, veterinarios
+
+    from .models import Veterinario
+
+    veterinarios = tuple(Veterinario.objects.order_by('id').values(*CAMPOS_PLANTEL))
+    with _lock:
+        _plantel = (version, veterinarios)
+    return version, veterinarios
+
+
+def veterinarios():
+    """Lista de veterinarios vigentes (ver plantel())."""
+    return plantel()[1]
+
+
+def existe(veterinario_id):
+    """Indica si hay un veterinario con ese id, sin consultar la base de datos."""
+    try:
+        veterinario_id = int(veterinario_id)
+    except (TypeError, ValueError):
+        return False
+    return any(veterinario['id'] == veterinario_id for veterinario in veterinarios())
+
+
+def etag(version):
+    return f'"plantel-{version}"'
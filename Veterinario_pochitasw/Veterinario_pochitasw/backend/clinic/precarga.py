@@ -0,0 +1,108 @@
+"""
+Carga anticipada de relaciones según los campos de un serializer.
+
+Los serializers exponen datos de modelos relacionados con campos como
+ReadOnlyField(source='mascota.cliente.nombre') o serializers anidados.
+Sin select_related, cada uno cuesta una consulta por fila serializada.
+
+rutas_precarga() recorre los `source` declarados en el serializer y los
+traduce a rutas de select_related (FK y uno-a-uno) y prefetch_related
+(relaciones a muchos). PrecargaMixin las aplica al queryset de un ViewSet,
+de modo que el número de consultas de un listado no depende del número
+de filas.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+from .serializers import campos_solicitados
+
+
+def _usa_objeto_relacionado(campo):
+    """
+    Indica si el campo necesita el objeto relacionado completo, y no solo
+    su clave (PrimaryKeyRelatedField lee la columna <campo>_id).
+    """
+    if isinstance(campo, serializers.ManyRelatedField):
+        return True
+    if isinstance(campo, serializers.RelatedField):
+        return not campo.use_pk_only_optimization()
+    return True
+
+
+def _recorrer(serializer, modelo, prefijo, a_muchos, seleccion, precarga, campos=None):
+    for nombre, campo in serializer.fields.items():
+        if campos is not None and nombre not in campos:
+            continue
+        anidado = campo.child if isinstance(campo, serializers.ListSerializer) else campo
+
+        if campo.source == '*':
+            if isinstance(anidado, serializers.BaseSerializer):
+                _recorrer(anidado, modelo, prefijo, a_muchos, seleccion, precarga)
+            continue
+
+        partes = campo.source.split('.')
+        actual, ruta, muchos = modelo, list(prefijo), a_muchos
+        for indice, parte in enumerate(partes):
+            try:
+                field = actual._meta.get_field(parte)
+            except FieldDoesNotExist:
+                # Propiedad o método del modelo: no se puede precargar
+                break
+            if not field.is_relation or field.related_model is None:
+                break
+            ultima = indice == len(partes) - 1
+            if ultima and not _usa_objeto_relacionado(campo):
+                break
+
+            ruta.append(parte)
+            muchos = muchos or field.many_to_many or field.one_to_many
+            (precarga if muchos else seleccion).add('__'.join(ruta))
+            actual = field.related_model
+
+            if ultima and isinstance(anidado, serializers.BaseSerializer):
+                _recorrer(anidado, actual, ruta, muchos, seleccion, precarga)
+
+
+@lru_cache(maxsize=256)
+def rutas_precarga(serializer_class, campos=None):
+    """
+    Rutas de select_related y prefetch_related que necesita un serializer.
+
+    Args:
+        serializer_class: ModelSerializer a analizar
+        campos (frozenset): Solo considerar estos campos (sparse fieldsets)
+
+    Returns:
+        tuple: (rutas select_related, rutas prefetch_related), ordenadas
+    """
+    seleccion, precarga = set(), set()
+    _recorrer(serializer_class(), serializer_class.Meta.model, [], False, seleccion, precarga, campos)
+    # Una ruta contenida en otra más larga ya queda cubierta por esta
+    seleccion = {r for r in seleccion if not any(o.startswith(r + '__') for o in seleccion)}
+    return tuple(sorted(seleccion)), tuple(sorted(precarga))
+
+
+def precargar(queryset, serializer_class, campos=None):
+    """Aplica a `queryset` las relaciones que usa `serializer_class`."""
+    seleccion, precarga = rutas_precarga(serializer_class, campos)
+    if seleccion:
+        queryset = queryset.select_related(*seleccion)
+    if precarga:
+        queryset = queryset.prefetch_related(*precarga)
+    return queryset
+
+
+class PrecargaMixin:
+    """
+    Mixin de ViewSet: precarga en get_queryset() las relaciones que usa el
+    serializer de la vista (solo las de los campos pedidos con ?fields=).
+    Las acciones propias deben partir de self.get_queryset() para
+    aprovecharlo.
+    """
+
+    def get_queryset(self):
+        return precargar(
+            super().get_queryset(), self.get_serializer_class(), campos_solicitados(self.request)
+        )
@@ -0,0 +1,84 @@
+"""
+Serialización JSON rápida para las respuestas de la API.
+
+Usa orjson si está instalado: codifica en C, entrega bytes UTF-8
+directamente y maneja datetime, date, time y UUID de forma nativa. Si no
+está instalado, se usa json de la biblioteca estándar con el mismo
+formato (compacto, sin escapar caracteres no ASCII).
+
+Los valores que orjson no conoce (Decimal, timedelta, textos traducibles)
+se convierten con DjangoJSONEncoder, igual que en JsonResponse.
+
+- JSONRapidoRenderer: renderer de DRF (ver REST_FRAMEWORK en settings).
+- JSONRapidoResponse: reemplazo de JsonResponse para las vistas propias.
+"""
+import json
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+_codificador_django = DjangoJSONEncoder()
+
+
+def _por_defecto(valor):
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return _codificador_django.default(valor)
+
+
+def dumps(datos, default=_por_defecto):
+    """
+    Codifica `datos` a JSON compacto.
+
+    Args:
+        datos: Estructura a codificar
+        default: Conversión para los tipos no soportados
+
+    Returns:
+        bytes: JSON en UTF-8
+    """
+    if orjson is not None:
+        # OPT_UTC_Z: '...Z' para UTC, como DjangoJSONEncoder.
+        # OPT_NON_STR_KEYS: claves enteras ({id: ...}) como en json.dumps
+        return orjson.dumps(datos, default=default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+    class Codificador(DjangoJSONEncoder):
+        def default(self, valor):
+            return default(valor)
+
+    return json.dumps(datos, cls=Codificador, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    """JSONRenderer de DRF que codifica con dumps() (orjson si está disponible)."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # Salida indentada (?indent= o navegador de la API): la hace DRF
+        if orjson is None or self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data, default=self.encoder_class().default)
+
+
+class JSONRapidoResponse(HttpResponse):
+    """
+    Equivalente a JsonResponse, codificado con dumps().
+
+    Args:
+        data: Datos a codificar. Debe ser un dict salvo que safe=False
+        safe (bool): Rechazar datos que no sean dict
+    """
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError('In order to allow non-dict objects to be serialized set the safe parameter to False.')
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
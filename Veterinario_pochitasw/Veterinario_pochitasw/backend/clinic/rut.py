@@ -0,0 +1,167 @@
+"""
+RUT chileno: clave canónica y validación del dígito verificador.
+
+La clave canónica son los dígitos del cuerpo sin ceros a la izquierda
+seguidos del DV en mayúscula ("12.345.678-k" -> "12345678K"). Todas las
+formas de escribir un mismo RUT producen la misma clave, que se guarda en
+Cliente.rut_normalizado (única) para búsquedas y para detectar duplicados.
+
+El DV se calcula con el módulo 11 (pesos 2 a 7 desde la derecha). Para
+validar lotes grandes (importaciones), validar_lote() usa dos tablas con
+la suma ponderada de los 4 dígitos bajos y de los 4 altos del cuerpo, así
+que cada RUT cuesta dos lecturas de tabla en lugar de un ciclo por dígito.
+"""
+from functools import lru_cache
+
+
+# Cuerpo máximo: 8 dígitos, para que el RUT formateado quepa en 12 caracteres
+CUERPO_MAXIMO = 99_999_999
+
+_SEPARADORES = str.maketrans('', '', '. -\t')
+
+_CARACTERES_CLAVE = frozenset('0123456789K')
+
+_PESOS = (2, 3, 4, 5, 6, 7)
+
+# DV según 11 - (suma % 11): 11 -> '0', 10 -> 'K'
+_DV_POR_RESTO = ('0', 'K', '9', '8', '7', '6', '5', '4', '3', '2', '1')
+
+
+def _suma_ponderada(numero, posicion_inicial, digitos):
+    suma = 0
+    for posicion in range(posicion_inicial, posicion_inicial + digitos):
+        numero, digito = divmod(numero, 10)
+        suma += digito * _PESOS[posicion % 6]
+    return suma
+
+
+@lru_cache(maxsize=1)
+def _tablas():
+    """Sumas ponderadas de los 4 dígitos bajos (posiciones 0-3) y altos (4-7)."""
+    bajos = [_suma_ponderada(n, 0, 4) for n in range(10_000)]
+    altos = [_suma_ponderada(n, 4, 4) for n in range(10_000)]
+    return bajos, altos
+
+
+def digito_verificador(cuerpo):
+    """
+    DV del cuerpo de un RUT.
+
+    Args:
+        cuerpo (int): Cuerpo numérico, sin DV
+
+    Returns:
+        str: '0' a '9' o 'K'
+    """
+    if 0 <= cuerpo <= CUERPO_MAXIMO:
+        bajos, altos = _tablas()
+        alto, bajo = divmod(cuerpo, 10_000)
+        return _DV_POR_RESTO[(bajos[bajo] + altos[alto]) % 11]
+    return _DV_POR_RESTO[_suma_ponderada(cuerpo, 0, len(str(cuerpo))) % 11]
+
+
+def canonico(rut):
+    """
+    Clave canónica de un RUT, sin validar el DV.
+
+    Examples:
+        >>> canonico("12.345.678-k")
+        "12345678K"
+        >>> canonico("012345678-K")
+        "12345678K"
+    """
+    if not rut:
+        return ''
+    limpio = rut.strip().translate(_SEPARADORES).upper()
+    if not (limpio.isascii() and limpio[:-1].isdigit()):
+        # Texto con otros caracteres: quedarse con los dígitos y la K
+        limpio = ''.join(c for c in limpio if c in _CARACTERES_CLAVE)
+    return limpio.lstrip('0')
+
+
+def validar(rut):
+    """
+    Valida el formato y el DV de un RUT.
+
+    Returns:
+        str | None: La clave canónica, o None si el RUT no es válido
+    """
+    return validar_lote([rut])[0]
+
+
+def es_valido(rut):
+    return validar(rut) is not None
+
+
+def validar_lote(ruts):
+    """
+    Valida muchos RUT de una vez (importaciones masivas).
+
+    Args:
+        ruts (iterable): RUT en cualquier formato (con o sin puntos y guion)
+
+    Returns:
+        list: Por cada RUT, su clave canónica o None si no es válido
+    """
+    bajos, altos = _tablas()
+    dv_por_resto = _DV_POR_RESTO
+    resultado = []
+    agregar = resultado.append
+    for rut in ruts:
+        # replace encadenado es varias veces más rápido que translate
+        limpio = rut.strip().replace('.', '').replace('-', '').replace(' ', '') if rut else ''
+        cuerpo = limpio[:-1]
+        if not (0 < len(cuerpo) <= 9 and cuerpo.isdigit() and cuerpo.isascii()):
+            agregar(None)
+            continue
+        numero = int(cuerpo)
+        if numero > CUERPO_MAXIMO or numero == 0:
+            agregar(None)
+            continue
+        alto, bajo = divmod(numero, 10_000)
+        esperado = dv_por_resto[(bajos[bajo] + altos[alto]) % 11]
+        dv = limpio[-1]
+        if dv == esperado or (dv == 'k' and esperado == 'K'):
+            agregar(cuerpo.lstrip('0') + esperado)
+        else:
+            agregar(None)
+    return resultado
+
+
+def formatear(clave):
+    """
+    Formato de presentación XX.XXX.XXX-Y de una clave canónica.
+
+    Examples:
+        >>> formatear("12345678K")
+        "12.345.678-K"
+    """
+    cuerpo, dv = clave[:-1], clave[-1]
+    return f'{int(cuerpo):,}'.replace(',', '.') + f'-{dv}'
+
+
+def validar_cliente(rut, excluir_id=None):
+    """
+    Valida el RUT de un cliente nuevo o editado: el DV y que no exista otro
+    cliente con la misma clave (12345678-5 y 12.345.678-5 son el mismo).
+
+    Lo usan el formulario de registro y la API de clientes.
+
+    Args:
+        rut (str): RUT en cualquier formato
+        excluir_id (int): ID del cliente que se está editando (opcional)
+
+    Returns:
+        tuple: (rut formateado o None, mensaje de error o "")
+    """
+    from .models import Cliente
+
+    clave = validar(rut)
+    if clave is None:
+        return None, "El RUT no es válido. Revisa el dígito verificador."
+    existentes = Cliente.objects.filter(rut_normalizado=clave)
+    if excluir_id:
+        existentes = existentes.exclude(pk=excluir_id)
+    if existentes.exists():
+        return None, "Ya existe un cliente registrado con este RUT."
+    return formatear(clave), ""
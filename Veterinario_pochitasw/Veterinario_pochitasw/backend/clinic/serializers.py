@@ -1,33 +1,71 @@
 from rest_framework import serializers
 from .models import Usuario, Cliente, Veterinario, Mascota, Cita, Atencion, ListaEspera, Producto, Venta, DetalleVenta
+from .rut import validar_cliente
+
+
+def campos_solicitados(request):
+    """
+    Campos pedidos con ?fields=id,fecha_hora,... en una lectura (GET).
+
+    Returns:
+        frozenset | None: None si no se restringen los campos
+    """
+    if request is None or request.method != 'GET':
+        return None
+    valor = request.query_params.get('fields')
+    if not valor:
+        return None
+    return frozenset(campo.strip() for campo in valor.split(',') if campo.strip())
+
+
+class CamposDinamicosMixin:
+    """
+    Sparse fieldsets: con ?fields=a,b el serializer solo entrega esos campos,
+    para que clientes móviles o vistas como el calendario no descarguen
+    columnas que no muestran. Los nombres desconocidos se ignoran.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        campos = campos_solicitados(self.context.get('request'))
+        if campos:
+            for nombre in set(self.fields) - campos:
+                self.fields.pop(nombre)
 
 class UsuarioSerializer(serializers.ModelSerializer):
     class Meta:
         model = Usuario
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'rol']
 
-class ClienteSerializer(serializers.ModelSerializer):
+class ClienteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     usuario = UsuarioSerializer(read_only=True)
     
     class Meta:
         model = Cliente
         fields = '__all__'
 
-class VeterinarioSerializer(serializers.ModelSerializer):
+    def validate_rut(self, value):
+        """Mismas reglas que el formulario de registro (ver clinic.rut.validar_cliente)."""
+        rut, error = validar_cliente(value, excluir_id=self.instance.pk if self.instance else None)
+        if error:
+            raise serializers.ValidationError(error)
+        return rut
+
+class VeterinarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     usuario = UsuarioSerializer(read_only=True)
 
     class Meta:
         model = Veterinario
         fields = '__all__'
 
-class MascotaSerializer(serializers.ModelSerializer):
+class MascotaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     edad_aprox = serializers.ReadOnlyField()
 
     class Meta:
         model = Mascota
         fields = '__all__'
 
-class CitaSerializer(serializers.ModelSerializer):
+class CitaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     mascota_nombre = serializers.ReadOnlyField(source='mascota.nombre')
     cliente_nombre = serializers.ReadOnlyField(source='mascota.cliente.nombre')
     veterinario_nombre = serializers.ReadOnlyField(source='veterinario.nombre', allow_null=True)
@@ -36,13 +74,14 @@ class CitaSerializer(serializers.ModelSerializer):
         model = Cita
         fields = '__all__'
 
-class AtencionSerializer(serializers.ModelSerializer):
+class AtencionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Atencion
         fields = '__all__'
 
-class ListaEsperaSerializer(serializers.ModelSerializer):
+class ListaEsperaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     cliente_nombre = serializers.ReadOnlyField(source='cliente.nombre')
+    cliente_apellido = serializers.ReadOnlyField(source='cliente.apellido')
     mascota_nombre = serializers.ReadOnlyField(source='mascota.nombre')
     veterinario_nombre = serializers.ReadOnlyField(source='veterinario_asignado.nombre')
     tiempo_espera = serializers.SerializerMethodField()
@@ -59,7 +98,7 @@ class ListaEsperaSerializer(serializers.ModelSerializer):
             return int(delta.total_seconds() / 60)
         return None
 
-class ProductoSerializer(serializers.ModelSerializer):
+class ProductoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Producto
         fields = '__all__'
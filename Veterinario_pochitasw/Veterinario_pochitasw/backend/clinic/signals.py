@@ -0,0 +1,118 @@
+"""
+Señales de la aplicación clínica.
+
+Mantienen sincronizadas con los cambios de los modelos las estructuras en
+memoria (índice de agenda, plantel de veterinarios, calendario de
+feriados), las cachés del calendario, los resúmenes clínicos y el índice
+de texto de las atenciones, y avisan de los cambios de la cola walk-in a
+quienes los esperan.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import busqueda_clinica, calendario, cola, feriados, plantel
+from .agenda import indice_agenda
+from .models import (
+    Atencion, Cita, Cliente, FeriadoManual, ListaEspera, Mascota, ResumenClinico, Veterinario
+)
+
+
+@receiver(pre_save, sender=Cita)
+def recordar_valores_anteriores(sender, instance, **kwargs):
+    # Al reagendar, la semana anterior también debe invalidarse; y si la
+    # cita deja de estar REALIZADA, el resumen clínico debe recalcularse
+    if instance.pk and not instance._state.adding:
+        anterior = Cita.objects.filter(pk=instance.pk).values_list('fecha_hora', 'estado').first()
+        if anterior:
+            instance._fecha_hora_anterior, instance._estado_anterior = anterior
+
+
+@receiver(post_save, sender=Cita)
+def actualizar_indice_agenda(sender, instance, **kwargs):
+    indice_agenda.actualizar(instance)
+
+
+@receiver(post_delete, sender=Cita)
+def quitar_de_indice_agenda(sender, instance, **kwargs):
+    indice_agenda.quitar(instance.pk)
+
+
+@receiver(post_save, sender=Cita)
+@receiver(post_delete, sender=Cita)
+def invalidar_calendario_cita(sender, instance, **kwargs):
+    # Después del commit: si la versión sube antes, una lectura concurrente
+    # guardaría las filas anteriores bajo la versión nueva
+    fechas = [getattr(instance, '_fecha_hora_anterior', None), _como_datetime(instance.fecha_hora)]
+    transaction.on_commit(lambda: calendario.invalidar_semanas(fechas))
+
+
+@receiver(post_save, sender=Mascota)
+@receiver(post_save, sender=Cliente)
+@receiver(post_save, sender=Veterinario)
+def invalidar_calendario_nombres(sender, instance, created, **kwargs):
+    # Los eventos muestran nombres de mascota, dueño y veterinario
+    if not created:
+        transaction.on_commit(calendario.invalidar_todo)
+
+
+@receiver(post_save, sender=Veterinario)
+@receiver(post_delete, sender=Veterinario)
+def invalidar_plantel(sender, instance, **kwargs):
+    transaction.on_commit(plantel.invalidar)
+
+
+@receiver(post_save, sender=FeriadoManual)
+@receiver(post_delete, sender=FeriadoManual)
+def invalidar_feriados(sender, instance, **kwargs):
+    transaction.on_commit(feriados.invalidar)
+
+
+@receiver(post_save, sender=Cita)
+@receiver(post_delete, sender=Cita)
+def actualizar_resumen_cita(sender, instance, **kwargs):
+    # Solo las citas realizadas cuentan como visitas
+    realizada = Cita.Estado.REALIZADA
+    if realizada in (instance.estado, getattr(instance, '_estado_anterior', None)):
+        _actualizar_resumen(instance.mascota_id)
+
+
+@receiver(post_save, sender=Atencion)
+@receiver(post_delete, sender=Atencion)
+def actualizar_resumen_atencion(sender, instance, **kwargs):
+    mascota_id = Cita.objects.filter(pk=instance.cita_id).values_list('mascota_id', flat=True).first()
+    if mascota_id:
+        _actualizar_resumen(mascota_id)
+
+
+@receiver(post_save, sender=Atencion)
+def indexar_atencion(sender, instance, **kwargs):
+    transaction.on_commit(lambda: busqueda_clinica.indexar([instance.pk]))
+
+
+@receiver(post_delete, sender=Atencion)
+def quitar_atencion_del_indice(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: busqueda_clinica.quitar([pk]))
+
+
+def _actualizar_resumen(mascota_id):
+    # Al confirmar: la cita y su atención suelen guardarse en la misma transacción
+    transaction.on_commit(lambda: ResumenClinico.actualizar(mascota_id))
+
+
+@receiver(post_save, sender=ListaEspera)
+@receiver(post_delete, sender=ListaEspera)
+def avisar_cambio_cola(sender, instance, **kwargs):
+    transaction.on_commit(cola.notificar_cambio)
+
+
+def _como_datetime(valor):
+    from django.utils import timezone
+    from django.utils.dateparse import parse_datetime
+
+    if isinstance(valor, str):
+        valor = parse_datetime(valor)
+        if valor is not None and timezone.is_naive(valor):
+            valor = timezone.make_aware(valor)
+    return valor
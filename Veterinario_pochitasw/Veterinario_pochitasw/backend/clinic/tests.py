@@ -1,3 +1,956 @@
-from django.test import TestCase
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import connection, transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import calendario
+from .models import Usuario, Cliente, Veterinario, Mascota, Cita, Atencion, ListaEspera
+
+
+# Nivel compartido en memoria: las pruebas no leen ni dejan versiones o
+# contadores de ratelimit en la caché de archivos del equipo
+CACHES_PRUEBAS = {
+    'default': settings.CACHES['default'],
+    'compartida': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pruebas'},
+}
+
+
+def crear_usuario(username, rol):
+    # Sin contraseña (force_login no la necesita): evita el hash en cada prueba
+    return Usuario.objects.create_user(username=username, rol=rol)
+
+
+def crear_veterinario(nombre, rut):
+    usuario = crear_usuario(f'vet_{rut}', Usuario.Roles.VETERINARIO)
+    return Veterinario.objects.create(usuario=usuario, rut=rut, nombre=nombre, telefono='912345678')
+
+
+def crear_mascota(rut='11.111.111-1', nombre='Firulais'):
+    cliente = Cliente.objects.filter(rut=rut).first() or Cliente.objects.create(
+        rut=rut, nombre='Ana', apellido='Pérez', telefono='912345678'
+    )
+    return Mascota.objects.create(cliente=cliente, nombre=nombre, raza='Mestizo')
+
+
+def en_paralelo(funcion, argumentos, hilos=8):
+    """
+    Ejecuta funcion(argumento) desde varios hilos a la vez.
+
+    Cada hilo usa su propia conexión a la base de datos y la cierra al
+    terminar. Una barrera hace que todos partan al mismo tiempo.
+    """
+    argumentos = list(argumentos)
+    barrera = threading.Barrier(min(hilos, len(argumentos)))
+
+    def ejecutar(argumento):
+        try:
+            try:
+                barrera.wait(timeout=10)
+            except threading.BrokenBarrierError:
+                pass
+            return funcion(argumento)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+        return list(ejecutor.map(ejecutar, argumentos))
+
+
+def proximo_dia_habil(dias=1):
+    """Fecha local dentro de `dias` días o la siguiente que no sea domingo ni feriado."""
+    from .feriados import no_habiles
+
+    fecha = timezone.localdate() + timedelta(days=dias)
+    while no_habiles([fecha]):
+        fecha += timedelta(days=1)
+    return fecha
+
+
+def a_las(fecha, hora, minuto=0):
+    return timezone.make_aware(datetime.combine(fecha, time(hora, minuto)))
+
+
+@override_settings(CACHES=CACHES_PRUEBAS)
+class ReagendarLoteTests(TestCase):
+    """POST /api/citas/reagendar_lote/"""
+
+    url = '/api/citas/reagendar_lote/'
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(crear_usuario('recepcion', Usuario.Roles.RECEPCIONISTA))
+        self.vet = crear_veterinario('Soto', '22.222.222-2')
+        self.otro_vet = crear_veterinario('Rojas', '33.333.333-3')
+        self.dia = proximo_dia_habil()
+        self.cita = Cita.objects.create(
+            veterinario=self.vet, mascota=crear_mascota(), fecha_hora=a_las(self.dia, 10)
+        )
+
+    def reagendar(self, *movimientos):
+        return self.client.post(self.url, {'movimientos': list(movimientos)}, content_type='application/json')
+
+    def test_veterinario_inexistente_es_error_del_movimiento(self):
+        response = self.reagendar({'cita_id': self.cita.id, 'veterinario_id': 99999})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(response.json()['aplicado'])
+        self.assertEqual(response.json()['resultados'][0]['error'], 'Veterinario no encontrado')
+        self.cita.refresh_from_db()
+        self.assertEqual(self.cita.veterinario_id, self.vet.id)
+
+    def test_reasigna_a_otro_veterinario(self):
+        response = self.reagendar({'cita_id': self.cita.id, 'veterinario_id': self.otro_vet.id})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['aplicado'])
+        self.cita.refresh_from_db()
+        self.assertEqual(self.cita.veterinario_id, self.otro_vet.id)
+
+    def test_revalida_dentro_de_la_transaccion(self):
+        """Una reserva confirmada después de la primera validación bloquea el lote."""
+        from . import agenda
+
+        validar = agenda.validar_movimientos
+        llamadas = []
+
+        def validar_con_reserva_intermedia(movimientos, citas):
+            resultados = validar(movimientos, citas)
+            if not llamadas:
+                # Otra recepcionista agenda el mismo horario después de la
+                # primera validación
+                Cita.objects.create(
+                    veterinario=self.otro_vet, mascota=crear_mascota(nombre='Michi'),
+                    fecha_hora=a_las(self.dia, 10)
+                )
+            llamadas.append(resultados)
+            return resultados
+
+        with mock.patch.object(agenda, 'validar_movimientos', validar_con_reserva_intermedia):
+            response = self.reagendar({'cita_id': self.cita.id, 'veterinario_id': self.otro_vet.id})
+
+        self.assertEqual(len(llamadas), 2)
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('Conflicto', response.json()['resultados'][0]['error'])
+        self.cita.refresh_from_db()
+        self.assertEqual(self.cita.veterinario_id, self.vet.id)
+
+
+@override_settings(CACHES=CACHES_PRUEBAS)
+class IndiceAgendaTests(TestCase):
+    """Frescura del índice de agenda (clinic.agenda.IndiceAgenda)."""
+
+    def setUp(self):
+        from .agenda import IndiceAgenda
+        from .feriados import no_habiles
+
+        cache.clear()
+        self.indice = IndiceAgenda()
+        self.vet = crear_veterinario('Soto', '22.222.222-2')
+        self.dia = proximo_dia_habil()
+        Cita.objects.create(veterinario=self.vet, mascota=crear_mascota(), fecha_hora=a_las(self.dia, 9))
+        # Calendario de feriados ya cargado: las consultas contadas son solo las del índice
+        no_habiles([self.dia])
+
+    def test_siguiente_libre_carga_el_rango_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            libre = self.indice.siguiente_libre(self.vet.id, a_las(self.dia, 9))
+        self.assertEqual(libre, a_las(self.dia, 9, 30))
+
+        with self.assertNumQueries(0):
+            self.indice.siguiente_libre(self.vet.id, a_las(self.dia, 9))
+
+    def test_conflicto_no_recarga_si_la_semana_no_cambio(self):
+        self.indice.conflicto(self.vet.id, a_las(self.dia, 12))
+
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(self.indice.conflicto(self.vet.id, a_las(self.dia, 9)))
+
+    def test_recarga_cuando_sube_la_version_de_la_semana(self):
+        self.assertIsNone(self.indice.conflicto(self.vet.id, a_las(self.dia, 15)))
+
+        # Otro worker agenda a las 15:00: este índice no recibe la señal,
+        # solo ve la versión nueva de la semana
+        with mock.patch('clinic.signals.indice_agenda'):
+            with self.captureOnCommitCallbacks(execute=True):
+                Cita.objects.create(
+                    veterinario=self.vet, mascota=crear_mascota(nombre='Michi'), fecha_hora=a_las(self.dia, 15)
+                )
+
+        with self.assertNumQueries(1):
+            self.assertIsNotNone(self.indice.conflicto(self.vet.id, a_las(self.dia, 15)))
+
+
+@override_settings(CACHES=CACHES_PRUEBAS)
+class CalendarioSemanalTests(TestCase):
+    """Caché por semana del feed del calendario (clinic.calendario)."""
+
+    def setUp(self):
+        cache.clear()
+        self.vet = crear_veterinario('Soto', '22.222.222-2')
+        self.mascota = crear_mascota()
+        self.lunes = calendario.lunes_de(timezone.localdate() + timedelta(days=7))
+
+    def test_version_sube_despues_del_commit(self):
+        _, antes = calendario.versiones([self.lunes])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Cita.objects.create(
+                    veterinario=self.vet, mascota=self.mascota, fecha_hora=a_las(self.lunes, 10)
+                )
+                # Dentro de la transacción una lectura concurrente aún ve la versión anterior
+                self.assertEqual(calendario.versiones([self.lunes])[1], antes)
+
+        self.assertGreater(calendario.versiones([self.lunes])[1][self.lunes], antes[self.lunes])
+
+    def test_cita_a_medianoche_del_lunes_solo_en_su_semana(self):
+        siguiente = self.lunes + timedelta(days=7)
+        Cita.objects.create(veterinario=self.vet, mascota=self.mascota, fecha_hora=a_las(siguiente, 0))
+        inicio = a_las(self.lunes, 0)
+        fin = a_las(siguiente + timedelta(days=6), 23, 59)
+
+        # Primero solo la semana anterior, para que quede en caché por separado
+        primera = list(calendario.eventos_por_semana(inicio, a_las(siguiente - timedelta(days=1), 23, 59)))
+        semanas = list(calendario.eventos_por_semana(inicio, fin))
+
+        self.assertEqual(primera, [[]])
+        self.assertEqual([len(eventos) for eventos in semanas], [0, 1])
+
+
+@override_settings(CACHES=CACHES_PRUEBAS)
+class TurnosConcurrentesTests(TransactionTestCase):
+    """Números de turno walk-in (SecuenciaTurno) con registros simultáneos."""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = crear_usuario('recepcion', Usuario.Roles.RECEPCIONISTA)
+        self.mascota = crear_mascota()
+
+    def registrar(self, indice):
+        cliente = Client()
+        cliente.force_login(self.usuario)
+        return cliente.post('/api/lista-espera/', {
+            'cliente': self.mascota.cliente_id, 'mascota': self.mascota.id, 'motivo': f'Consulta {indice}',
+        }, content_type='application/json')
+
+    def test_turnos_distintos_y_consecutivos(self):
+        cantidad = 24
+
+        respuestas = en_paralelo(self.registrar, range(cantidad))
+
+        self.assertEqual([r.status_code for r in respuestas], [201] * cantidad)
+        turnos = sorted(r.json()['numero_turno'] for r in respuestas)
+        self.assertEqual(turnos, list(range(1, cantidad + 1)))
+        self.assertEqual(
+            sorted(ListaEspera.objects.values_list('numero_turno', flat=True)), list(range(1, cantidad + 1))
+        )
+
+
+@override_settings(CACHES=CACHES_PRUEBAS)
+class CambiosColaTests(TestCase):
+    """GET /api/lista-espera/cambios/ (long-polling)."""
+
+    url = '/api/lista-espera/cambios/'
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(crear_usuario('recepcion', Usuario.Roles.RECEPCIONISTA))
+
+    def test_sin_version_responde_sin_esperar(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['completo'])
+
+    def test_espera_con_version(self):
+        version = self.client.get(self.url).json()['version']
+
+        response = self.client.get(self.url, {'version': version, 'espera': 0})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['cambios'], [])
+
+    @override_settings(CLINIC_ESPERAS_SIMULTANEAS=0)
+    def test_sin_cupo_de_espera_responde_503(self):
+        version = self.client.get(self.url).json()['version']
+
+        response = self.client.get(self.url, {'version': version})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+
+
+@override_settings(CACHES=CACHES_PRUEBAS)
+class TransicionesConcurrentesColaTests(TransactionTestCase):
+    """
+    Llamados y cierres simultáneos sobre el mismo walk-in (clinic.cola):
+    solo uno tiene efecto y los demás reciben 409 (o 404 si la cola quedó vacía).
+    """
+
+    hilos = 8
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = crear_usuario('recepcion', Usuario.Roles.RECEPCIONISTA)
+        self.vets = [crear_veterinario(f'Vet {i}', f'{10 + i}.111.111-1') for i in range(self.hilos)]
+        mascota = crear_mascota()
+        self.turno = ListaEspera.objects.create(cliente=mascota.cliente, mascota=mascota, motivo='Control')
+
+    def post(self, url, datos=None):
+        cliente = Client()
+        cliente.force_login(self.usuario)
+        return cliente.post(url, datos or {}, content_type='application/json')
+
+    def poner_en_atencion(self):
+        ListaEspera.objects.filter(pk=self.turno.pk).update(
+            estado=ListaEspera.Estado.EN_ATENCION, veterinario_asignado=self.vets[0], fecha_atencion=timezone.now()
+        )
+
+    def assertUnGanador(self, respuestas, exito, perdedor=409):
+        codigos = [r.status_code for r in respuestas]
+        self.assertEqual(codigos.count(exito), 1, codigos)
+        self.assertEqual(codigos.count(perdedor), len(codigos) - 1, codigos)
+        return respuestas[codigos.index(exito)]
+
+    def test_siguiente_no_entrega_el_mismo_paciente_dos_veces(self):
+        respuestas = en_paralelo(
+            lambda vet: self.post('/api/lista-espera/siguiente/', {'veterinario_id': vet.id}), self.vets
+        )
+
+        ganador = self.assertUnGanador(respuestas, 200, perdedor=404)
+        self.turno.refresh_from_db()
+        self.assertEqual(self.turno.estado, ListaEspera.Estado.EN_ATENCION)
+        self.assertEqual(self.turno.veterinario_asignado_id, ganador.json()['veterinario_asignado'])
+
+    def test_llamar_mismo_paciente_asigna_un_solo_veterinario(self):
+        respuestas = en_paralelo(
+            lambda vet: self.post(f'/api/lista-espera/{self.turno.pk}/llamar_siguiente/', {'veterinario_id': vet.id}),
+            self.vets,
+        )
+
+        ganador = self.assertUnGanador(respuestas, 200)
+        self.turno.refresh_from_db()
+        self.assertEqual(self.turno.veterinario_asignado_id, ganador.json()['veterinario_asignado'])
+
+    def test_cierres_simultaneos_crean_una_sola_atencion(self):
+        self.poner_en_atencion()
+        urls = [
+            f'/api/lista-espera/{self.turno.pk}/marcar_atendido/',
+            f'/api/lista-espera/{self.turno.pk}/cancelar_turno/',
+            f'/api/api/lista-espera/{self.turno.pk}/registrar_atencion/',
+            f'/api/api/lista-espera/{self.turno.pk}/registrar_atencion/',
+        ] * (self.hilos // 4)
+
+        respuestas = en_paralelo(
+            lambda url: self.post(url, {'diagnostico': 'Sano', 'tratamiento': 'Ninguno'}), urls
+        )
+
+        codigos = [r.status_code for r in respuestas]
+        exitos = [url for url, codigo in zip(urls, codigos) if codigo in (200, 201)]
+        self.assertEqual(len(exitos), 1, codigos)
+        self.assertEqual(codigos.count(409), len(codigos) - 1, codigos)
+        registrada = 'registrar_atencion' in exitos[0]
+        self.assertEqual(Atencion.objects.count(), int(registrada))
+        self.assertEqual(Cita.objects.count(), int(registrada))
+        self.turno.refresh_from_db()
+        self.assertEqual(self.turno.veterinario_asignado_id, self.vets[0].id)
+
+    def test_registrar_atencion_simultaneo_sin_duplicados(self):
+        self.poner_en_atencion()
+
+        respuestas = en_paralelo(
+            lambda _: self.post(
+                f'/api/api/lista-espera/{self.turno.pk}/registrar_atencion/',
+                {'diagnostico': 'Sano', 'tratamiento': 'Ninguno'},
+            ),
+            range(self.hilos),
+        )
+
+        self.assertUnGanador(respuestas, 201)
+        self.assertEqual(Atencion.objects.count(), 1)
+        self.assertEqual(Cita.objects.filter(mascota=self.turno.mascota).count(), 1)
+        self.turno.refresh_from_db()
+        self.assertEqual(self.turno.estado, ListaEspera.Estado.ATENDIDO)
+
+
+@override_settings(CACHES=CACHES_PRUEBAS)
+class DashboardVeterinarioTests(TestCase):
+    """Ventana de citas y cantidad de consultas de dashboard_veterinario."""
+
+    url = '/api/dashboard/veterinario/'
+
+    def setUp(self):
+        cache.clear()
+        self.vet = crear_veterinario('Soto', '22.222.222-2')
+        self.client.force_login(self.vet.usuario)
+        self.mascota = crear_mascota()
+        self.hoy = timezone.localdate()
+
+    def agendar(self, dias, cantidad=1):
+        for i in range(cantidad):
+            mascota = crear_mascota(nombre=f'Mascota {dias}-{i}')
+            Cita.objects.create(
+                veterinario=self.vet, mascota=mascota,
+                fecha_hora=a_las(self.hoy + timedelta(days=dias), 9 + i % 10, 30 * (i // 10 % 2)),
+            )
+
+    def citas_mostradas(self, **parametros):
+        response = self.client.get(self.url, parametros)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['debug_error'])
+        return sorted((c.fecha_hora.date() - self.hoy).days for c in response.context['citas'])
+
+    def contar_consultas(self, **parametros):
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(self.url, parametros)
+        return len(consultas)
+
+    def test_ventana_por_defecto(self):
+        for dias in (1, 5, 20, 40):
+            self.agendar(dias)
+
+        self.assertEqual(self.citas_mostradas(), [1, 5])
+        self.assertEqual(self.citas_mostradas(dias=30), [1, 5, 20])
+
+    def test_dias_tiene_un_maximo(self):
+        for dias in (1, 30, 32, 40):
+            self.agendar(dias)
+
+        self.assertEqual(self.citas_mostradas(dias=1000), [1, 30])
+        self.assertEqual(self.citas_mostradas(dias=-5), [])
+
+    def test_consultas_no_crecen_con_las_citas_ni_los_walkins(self):
+        self.agendar(1)
+        ListaEspera.objects.create(cliente=self.mascota.cliente, mascota=self.mascota)
+        self.client.get(self.url)  # calentar el motor de la cola y el plantel
+        con_una = self.contar_consultas()
+
+        self.agendar(2, cantidad=20)
+        self.agendar(50, cantidad=5)  # fuera de la ventana
+        for i in range(10):
+            mascota = crear_mascota(nombre=f'Walkin {i}')
+            ListaEspera.objects.create(cliente=mascota.cliente, mascota=mascota)
+        self.client.get(self.url)  # la cola cambió: el motor se vuelve a sincronizar
+
+        with self.assertNumQueries(con_una):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context['citas']), 21)
+        self.assertEqual(len(response.context['walkins_espera']), 11)
+
+    def test_consultas_con_dias_maximo(self):
+        self.agendar(1)
+        self.client.get(self.url, {'dias': 1000})
+        con_una = self.contar_consultas(dias=1000)
+
+        for dias in range(2, 40, 3):
+            self.agendar(dias, cantidad=3)
+
+        with self.assertNumQueries(con_una):
+            self.client.get(self.url, {'dias': 1000})
+
+
+@override_settings(CACHES=CACHES_PRUEBAS)
+class ConsultasListadosApiTests(TestCase):
+    """
+    Los listados de la API cuestan las mismas consultas con 1 fila que con
+    muchas (precarga de relaciones de clinic.precarga).
+    """
+
+    # Filas del caso grande: una página completa de cada listado
+    filas = 10
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(crear_usuario('recepcion', Usuario.Roles.RECEPCIONISTA))
+        self.vet = crear_veterinario('Soto', '22.222.222-2')
+        self.dia = proximo_dia_habil()
+        self.creadas = 0
+
+    def crear_filas(self, cantidad):
+        """Citas y walk-ins de clientes, mascotas y veterinarios distintos."""
+        from . import rut
+
+        for _ in range(cantidad):
+            self.creadas += 1
+            cuerpo = 5_000_000 + self.creadas
+            mascota = crear_mascota(rut=rut.formatear(f'{cuerpo}{rut.digito_verificador(cuerpo)}'))
+            vet = crear_veterinario(f'Vet {self.creadas}', f'{cuerpo + 1_000_000}-0')
+            Cita.objects.create(
+                veterinario=vet if self.creadas > 1 else self.vet, mascota=mascota,
+                fecha_hora=a_las(self.dia, 9) + timedelta(minutes=self.creadas),
+            )
+            Cita.objects.create(
+                veterinario=self.vet, mascota=mascota, fecha_hora=a_las(self.dia, 12) + timedelta(minutes=self.creadas)
+            )
+            ListaEspera.objects.create(cliente=mascota.cliente, mascota=mascota, veterinario_asignado=vet)
+
+    def assertConsultasConstantes(self, url, parametros=None):
+        self.crear_filas(1)
+        self.client.get(url, parametros)
+        with CaptureQueriesContext(connection) as una_fila:
+            respuesta = self.client.get(url, parametros)
+        self.assertEqual(respuesta.status_code, 200)
+
+        self.crear_filas(self.filas - 1)
+        with self.assertNumQueries(len(una_fila)):
+            respuesta = self.client.get(url, parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_citas(self):
+        datos = self.assertConsultasConstantes('/api/citas/')
+        self.assertEqual(len(datos['results']), self.filas)
+
+    def test_lista_espera(self):
+        datos = self.assertConsultasConstantes('/api/lista-espera/')
+        self.assertEqual(len(datos['results']), self.filas)
+
+    def test_citas_por_veterinario(self):
+        datos = self.assertConsultasConstantes('/api/citas/por_veterinario/', {'veterinario_id': self.vet.id})
+        self.assertEqual(len(datos), self.filas + 1)
+
+
+@override_settings(CACHES=CACHES_PRUEBAS)
+class ResumenClinicoTests(TestCase):
+    """Resumen clínico por mascota mantenido por señales (ResumenClinico)."""
+
+    def setUp(self):
+        cache.clear()
+        self.vet = crear_veterinario('Soto', '22.222.222-2')
+        self.mascota = crear_mascota()
+        self.hace_un_mes = timezone.now() - timedelta(days=30)
+
+    def registrar(self, dias, tipo=Cita.Tipo.CONSULTA, requiere_operacion=False):
+        """Cita realizada `dias` días después de hace un mes, con su atención."""
+        fecha = self.hace_un_mes + timedelta(days=dias)
+        with self.captureOnCommitCallbacks(execute=True):
+            cita = Cita.objects.create(
+                veterinario=self.vet, mascota=self.mascota, fecha_hora=fecha, tipo=tipo,
+                estado=Cita.Estado.REALIZADA
+            )
+            Atencion.objects.create(
+                cita=cita, fecha=fecha, diagnostico=f'Diagnóstico {dias}', tratamiento='Reposo',
+                requiere_operacion=requiere_operacion
+            )
+        return cita
+
+    def resumen(self):
+        from .models import ResumenClinico
+
+        return ResumenClinico.objects.get(pk=self.mascota.pk)
+
+    def test_nueva_visita(self):
+        self.registrar(1)
+        self.registrar(2, Cita.Tipo.VACUNA)
+
+        resumen = self.resumen()
+        self.assertEqual(resumen.total_visitas, 2)
+        self.assertEqual(resumen.visitas_por_tipo, {'CONSULTA': 1, 'VACUNA': 1})
+        self.assertEqual(resumen.ultimo_diagnostico, 'Diagnóstico 2')
+
+    def test_cirugia_reinicia_operaciones_pendientes(self):
+        self.registrar(1, requiere_operacion=True)
+        self.registrar(2, requiere_operacion=True)
+        self.assertEqual(self.resumen().operaciones_pendientes, 2)
+
+        self.registrar(3, Cita.Tipo.CIRUGIA)
+        self.assertEqual(self.resumen().operaciones_pendientes, 0)
+
+        self.registrar(4, requiere_operacion=True)
+        self.assertEqual(self.resumen().operaciones_pendientes, 1)
+
+    def test_cancelar_cita_realizada(self):
+        self.registrar(1)
+        cita = self.registrar(2, Cita.Tipo.CONTROL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cita.estado = Cita.Estado.CANCELADA
+            cita.save()
+
+        resumen = self.resumen()
+        self.assertEqual(resumen.total_visitas, 1)
+        self.assertEqual(resumen.visitas_por_tipo, {'CONSULTA': 1})
+        self.assertEqual(resumen.ultima_visita, self.hace_un_mes + timedelta(days=1))
+
+    def test_eliminar_atencion(self):
+        self.registrar(1)
+        cita = self.registrar(2, requiere_operacion=True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cita.atencion.delete()
+
+        resumen = self.resumen()
+        self.assertEqual(resumen.ultimo_diagnostico, 'Diagnóstico 1')
+        self.assertEqual(resumen.operaciones_pendientes, 0)
+        # La cita sigue realizada: la visita se mantiene
+        self.assertEqual(resumen.total_visitas, 2)
+
+    def test_primera_lectura_lo_calcula(self):
+        from .models import ResumenClinico
+
+        # Datos anteriores a las señales: el resumen no existe todavía
+        with mock.patch('clinic.signals._actualizar_resumen'):
+            self.registrar(1, requiere_operacion=True)
+        self.assertFalse(ResumenClinico.objects.filter(pk=self.mascota.pk).exists())
+
+        resumen = ResumenClinico.de(self.mascota.pk)
+        self.assertEqual((resumen.total_visitas, resumen.operaciones_pendientes), (1, 1))
+        with self.assertNumQueries(1):
+            ResumenClinico.de(self.mascota.pk)
+
+    def test_eliminar_mascota(self):
+        from .models import ResumenClinico
+
+        self.registrar(1)
+        mascota_id = self.mascota.pk
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mascota.delete()
+
+        self.assertFalse(ResumenClinico.objects.exists())
+        self.assertIsNone(ResumenClinico.actualizar(mascota_id))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Prueba la tabla FTS5 de SQLite')
+@override_settings(CACHES=CACHES_PRUEBAS)
+class BusquedaAtencionesTests(TestCase):
+    """Búsqueda de texto completo en atenciones con FTS5 (clinic.busqueda_clinica)."""
+
+    def setUp(self):
+        cache.clear()
+        self.vet = crear_veterinario('Soto', '22.222.222-2')
+        self.otro_vet = crear_veterinario('Rojas', '33.333.333-3')
+        self.mascota = crear_mascota()
+        self.hace_un_mes = timezone.now() - timedelta(days=30)
+
+    def atender(self, dias, diagnostico, tratamiento='Reposo', veterinario=None):
+        fecha = self.hace_un_mes + timedelta(days=dias)
+        with self.captureOnCommitCallbacks(execute=True):
+            cita = Cita.objects.create(
+                veterinario=veterinario or self.vet, mascota=self.mascota, fecha_hora=fecha,
+                estado=Cita.Estado.REALIZADA
+            )
+            return Atencion.objects.create(cita=cita, fecha=fecha, diagnostico=diagnostico, tratamiento=tratamiento)
+
+    def buscar(self, q, **filtros):
+        from .busqueda_clinica import buscar_atenciones
+
+        return [a.id for a in buscar_atenciones(q, **filtros)]
+
+    def test_no_distingue_acentos(self):
+        atencion = self.atender(1, 'Fractura de fémur')
+
+        for consulta in ('femur', 'FÉMUR', 'fractúra', 'fract'):
+            with self.subTest(consulta=consulta):
+                self.assertEqual(self.buscar(consulta), [atencion.id])
+
+    def test_filtra_por_veterinario_y_fecha(self):
+        primera = self.atender(1, 'Otitis')
+        segunda = self.atender(10, 'Otitis', veterinario=self.otro_vet)
+
+        self.assertEqual(self.buscar('otitis', veterinario_id=self.otro_vet.id), [segunda.id])
+        self.assertEqual(self.buscar('otitis', hasta=self.hace_un_mes + timedelta(days=5)), [primera.id])
+        self.assertEqual(self.buscar('otitis', desde=self.hace_un_mes + timedelta(days=5)), [segunda.id])
+
+    def test_orden_por_relevancia_y_limite(self):
+        en_tratamiento = self.atender(1, 'Control', tratamiento='Dieta por gastritis')
+        en_diagnostico = self.atender(2, 'Gastritis aguda')
+        self.atender(3, 'Vacuna anual')
+
+        self.assertEqual(self.buscar('gastritis'), [en_diagnostico.id, en_tratamiento.id])
+        self.assertEqual(self.buscar('gastritis', limite=1), [en_diagnostico.id])
+
+    def test_reindexa_al_editar(self):
+        atencion = self.atender(1, 'Dermatitis')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            atencion.diagnostico = 'Conjuntivitis'
+            atencion.save()
+
+        self.assertEqual(self.buscar('dermatitis'), [])
+        self.assertEqual(self.buscar('conjuntivitis'), [atencion.id])
+
+    def test_quita_al_eliminar(self):
+        from . import busqueda_clinica
+
+        atencion = self.atender(1, 'Parvovirus')
+        atencion_id = atencion.pk
+
+        with self.captureOnCommitCallbacks(execute=True):
+            atencion.delete()
+
+        self.assertEqual(self.buscar('parvovirus'), [])
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {busqueda_clinica.TABLA_FTS} WHERE rowid = %s', [atencion_id])
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+
+@override_settings(CACHES=CACHES_PRUEBAS)
+class TieredCacheTests(TestCase):
+    """Caché en dos niveles (clinic.cache)."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_valores_quedan_en_el_nivel_local(self):
+        cache.set('prueba:clave', 1)
+        cache.set('prueba:sin-expiracion', 2, timeout=None)
+        cache.set_many({'prueba:a': 3, 'prueba:b': 4}, timeout=60)
+        cache.add('prueba:nueva', 5)
+
+        for clave, valor in [('prueba:clave', 1), ('prueba:sin-expiracion', 2), ('prueba:a', 3), ('prueba:nueva', 5)]:
+            self.assertEqual(cache._local.get(clave), valor)
+
+    def test_ttl_local_con_timeout_relativo_del_nivel_compartido(self):
+        """RedisCache entrega segundos relativos en get_backend_timeout, no una fecha."""
+        compartida = cache.compartida
+        with mock.patch.object(compartida, 'get_backend_timeout', lambda timeout=None: 300):
+            cache.set('prueba:redis', 'valor', timeout=300)
+
+        self.assertEqual(cache._local.get('prueba:redis'), 'valor')
+        self.assertEqual(cache._timeout_local(300), 300)
+        self.assertIsNone(cache._timeout_local(None))
+        self.assertEqual(cache._timeout_local(DEFAULT_TIMEOUT), compartida.default_timeout)
+        self.assertEqual(cache._timeout_local(0), 0)
+
+    def test_timeout_cero_no_queda_en_el_nivel_local(self):
+        cache.set('prueba:expirada', 'valor', timeout=0)
+
+        self.assertIsNone(cache.get('prueba:expirada'))
+
+    def test_claves_solo_compartidas(self):
+        cache.set('rl:contador', 1)
+
+        self.assertIsNot(cache._local.get('rl:contador'), 1)
+        self.assertEqual(cache.get('rl:contador'), 1)
+
+
+@override_settings(CACHES=CACHES_PRUEBAS)
+class FeriadosTests(TestCase):
+    """Calendario de feriados de Chile (clinic.feriados)."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pascua(self):
+        from .feriados import feriados_calculados, pascua
+
+        for anio, domingo in [(2019, date(2019, 4, 21)), (2024, date(2024, 3, 31)), (2025, date(2025, 4, 20))]:
+            with self.subTest(anio=anio):
+                self.assertEqual(pascua(anio), domingo)
+                feriados = feriados_calculados(anio)
+                self.assertEqual(feriados[domingo - timedelta(days=2)], 'Viernes Santo')
+                self.assertEqual(feriados[domingo - timedelta(days=1)], 'Sábado Santo')
+
+    def test_traslados_ley_19668(self):
+        from .feriados import feriados_calculados
+
+        casos = [
+            # San Pedro y San Pablo
+            (date(2021, 6, 29), date(2021, 6, 28)),  # martes
+            (date(2023, 6, 29), date(2023, 6, 26)),  # jueves
+            (date(2024, 6, 29), date(2024, 6, 29)),  # sábado: no se traslada
+            # Encuentro de Dos Mundos
+            (date(2018, 10, 12), date(2018, 10, 15)),  # viernes: lunes siguiente
+            (date(2023, 10, 12), date(2023, 10, 9)),  # jueves
+            (date(2024, 10, 12), date(2024, 10, 12)),  # sábado
+        ]
+        for original, observado in casos:
+            with self.subTest(fecha=original):
+                feriados = feriados_calculados(original.year)
+                self.assertIn(observado, feriados)
+                if observado != original:
+                    self.assertNotIn(original, feriados)
+
+    def test_iglesias_evangelicas(self):
+        from .feriados import feriados_calculados
+
+        nombre = 'Día de las Iglesias Evangélicas y Protestantes'
+        casos = [
+            (2023, date(2023, 10, 27)),  # martes: viernes anterior
+            (2018, date(2018, 11, 2)),  # miércoles: viernes siguiente
+            (2024, date(2024, 10, 31)),  # jueves: no se traslada
+        ]
+        for anio, observado in casos:
+            with self.subTest(anio=anio):
+                self.assertEqual(feriados_calculados(anio).get(observado), nombre)
+
+    def test_pueblos_indigenas(self):
+        from .feriados import feriados_calculados
+
+        nombre = 'Día Nacional de los Pueblos Indígenas'
+        for observado in (date(2021, 6, 21), date(2022, 6, 21), date(2023, 6, 21),
+                          date(2024, 6, 20), date(2025, 6, 20)):
+            with self.subTest(anio=observado.year):
+                self.assertEqual(feriados_calculados(observado.year).get(observado), nombre)
+        self.assertNotIn(nombre, feriados_calculados(2020).values())
+
+    def test_feriados_adicionales(self):
+        from .feriados import feriados_calculados
+
+        self.assertIn(date(2023, 1, 2), feriados_calculados(2023))  # lunes
+        self.assertNotIn(date(2024, 1, 2), feriados_calculados(2024))  # martes
+        self.assertIn(date(2018, 9, 17), feriados_calculados(2018))  # lunes
+        self.assertNotIn(date(2019, 9, 17), feriados_calculados(2019))  # martes
+        self.assertIn(date(2019, 9, 20), feriados_calculados(2019))  # viernes
+        self.assertIn(date(2024, 9, 20), feriados_calculados(2024))  # viernes
+        self.assertNotIn(date(2023, 9, 20), feriados_calculados(2023))  # miércoles
+
+    def test_ajustes_manuales(self):
+        from . import feriados
+        from .models import FeriadoManual
+
+        eleccion, navidad = date(2024, 10, 28), date(2024, 12, 25)
+        self.assertEqual(feriados.no_habiles([eleccion, navidad]), {navidad: 'Es Feriado (Navidad)'})
+        # El calendario ya armado de este proceso debe descartarse al cambiar los ajustes
+        self.addCleanup(feriados.invalidar)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            FeriadoManual.objects.create(fecha=eleccion, nombre='Elecciones')
+            FeriadoManual.objects.create(fecha=navidad, nombre='Navidad', es_feriado=False)
+
+        self.assertEqual(feriados.no_habiles([eleccion, navidad]), {eleccion: 'Es Feriado (Elecciones)'})
+        self.assertEqual(feriados.nombre_feriado(eleccion), 'Elecciones')
+        self.assertIsNone(feriados.nombre_feriado(navidad))
+
+
+class BusquedaClientesTests(TestCase):
+    """Typeahead de clientes y mascotas (clinic.busqueda)."""
+
+    def setUp(self):
+        from . import rut
+
+        clave = f'9876543{rut.digito_verificador(9876543)}'
+        self.rut = rut.formatear(clave)
+        self.mascota = crear_mascota(rut=self.rut, nombre='Toby')
+
+    def test_rut_con_ceros_a_la_izquierda(self):
+        from .busqueda import buscar_clientes, buscar_mascotas
+
+        for consulta in (self.rut, '0' + self.rut, '09.876', '9876543', self.rut.replace('.', '')):
+            with self.subTest(consulta=consulta):
+                self.assertEqual(list(buscar_clientes(consulta)), [self.mascota.cliente])
+                self.assertEqual(list(buscar_mascotas(consulta)), [self.mascota])
+
+    def test_api_mascotas_con_cliente_invalido(self):
+        self.client.force_login(crear_usuario('recepcion', Usuario.Roles.RECEPCIONISTA))
+        url = '/api/buscar/mascotas/'
+
+        self.assertEqual(self.client.get(url, {'q': 'Toby', 'cliente': 'abc'}).status_code, 400)
+        response = self.client.get(url, {'q': 'Toby', 'cliente': self.mascota.cliente_id})
+        self.assertEqual([m['id'] for m in response.json()], [self.mascota.id])
+
+
+class ValidacionRutClienteTests(TestCase):
+    """Validación del RUT en el registro y en /api/clientes/ (clinic.rut.validar_cliente)."""
+
+    url = '/api/clientes/'
+
+    def setUp(self):
+        self.client.force_login(crear_usuario('recepcion', Usuario.Roles.RECEPCIONISTA))
+        self.existente = crear_mascota(rut='11.111.111-1').cliente
+
+    def crear(self, rut):
+        return self.client.post(
+            self.url, {'rut': rut, 'nombre': 'Luis', 'apellido': 'Mora', 'telefono': '987654321'},
+            content_type='application/json'
+        )
+
+    def test_api_rechaza_dv_invalido(self):
+        response = self.crear('12.345.678-9')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('rut', response.json())
+
+    def test_api_rechaza_duplicado_con_otro_formato(self):
+        response = self.crear('11111111-1')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['rut'], ['Ya existe un cliente registrado con este RUT.'])
+        self.assertEqual(Cliente.objects.count(), 1)
+
+    def test_api_guarda_el_rut_formateado(self):
+        response = self.crear('12345678-5')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['rut'], '12.345.678-5')
+
+    def test_api_editar_conserva_su_propio_rut(self):
+        response = self.client.patch(
+            f'{self.url}{self.existente.pk}/', {'rut': '11111111-1'}, content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['rut'], '11.111.111-1')
+
+    def test_formulario_de_registro(self):
+        from .forms import RegistroClienteForm
+
+        datos = {'telefono': '987654321', 'direccion': 'Calle 1'}
+        self.assertFalse(RegistroClienteForm({**datos, 'rut': '11111111-1'}).is_valid())
+        formulario = RegistroClienteForm({**datos, 'rut': '12345678-5'})
+        self.assertTrue(formulario.is_valid(), formulario.errors)
+        self.assertEqual(formulario.cleaned_data['rut'], '12.345.678-5')
+
+
+class ImportacionClientesTests(TestCase):
+    """Importación masiva de clientes y mascotas (clinic.importacion)."""
+
+    def setUp(self):
+        from . import rut
+
+        self.ruts = [rut.formatear(f'{c}{rut.digito_verificador(c)}') for c in (7_100_001, 7_100_002, 7_100_003)]
+        self.csv = 'rut,nombre,apellido,telefono,mascota,especie\n' + ''.join(
+            f'{r},Cliente,{i},91234567{i},Mascota {i},gato\n' for i, r in enumerate(self.ruts)
+        ) + '1-1,Malo,Rut,912345678,Nada,perro\n'
+
+    def importar(self, **opciones):
+        import io
+        from .importacion import importar, leer_filas
+
+        return importar(leer_filas(io.StringIO(self.csv)), **opciones)
+
+    def test_usuarios_sin_contrasena_utilizable_por_defecto(self):
+        resultado = self.importar()
+
+        self.assertEqual(resultado.clientes_creados, 3)
+        self.assertEqual(resultado.mascotas_creadas, 3)
+        self.assertEqual([e[2] for e in resultado.errores], ['RUT inválido'])
+        self.assertEqual(resultado.credenciales, [])
+        for usuario in Usuario.objects.filter(username__in=self.ruts):
+            self.assertFalse(usuario.has_usable_password())
+            self.assertFalse(usuario.check_password('client123'))
+
+    def test_contrasenas_temporales_distintas_por_usuario(self):
+        resultado = self.importar(contrasenas_temporales=True)
+
+        credenciales = dict(resultado.credenciales)
+        self.assertEqual(sorted(credenciales), sorted(self.ruts))
+        self.assertEqual(len(set(credenciales.values())), 3)
+        usuarios = Usuario.objects.filter(username__in=self.ruts)
+        self.assertEqual(len({u.password for u in usuarios}), 3)
+        for usuario in usuarios:
+            self.assertTrue(usuario.check_password(credenciales[usuario.username]))
+
+    def test_simular_no_guarda_ni_genera_contrasenas(self):
+        resultado = self.importar(contrasenas_temporales=True, simular=True)
+
+        self.assertEqual(resultado.clientes_creados, 3)
+        self.assertEqual(resultado.credenciales, [])
+        self.assertFalse(Cliente.objects.exists())
+
+    def test_reimportar_no_duplica(self):
+        self.importar()
+        resultado = self.importar()
+
+        self.assertEqual((resultado.clientes_creados, resultado.clientes_existentes), (0, 3))
+        self.assertEqual((resultado.mascotas_creadas, resultado.mascotas_existentes), (0, 3))
+        self.assertEqual(Cliente.objects.count(), 3)
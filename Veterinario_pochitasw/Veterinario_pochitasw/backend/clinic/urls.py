@@ -10,7 +10,7 @@ from .views import (
     dashboard_cliente, CustomLoginView, registro, registro_rapido,
     crear_cita_recepcion, cancelar_cita, historial_mascota, quienes_somos, contacto,
     # New
-    api_citas_calendario, reagendar_cita, editar_cliente, editar_mascota, registrar_atencion,
+    api_citas_calendario, reagendar_cita, api_reagendar_citas_lote, editar_cliente, editar_mascota, registrar_atencion,
     # HU002 y HU006
     api_disponibilidad_horarios, api_antecedentes_mascota, cancelar_cita_veterinario,
     # Cliente
@@ -18,7 +18,11 @@ from .views import (
     # API Views
     guardar_atencion, registrar_atencion_walkin,
     # Pet Management API
-    api_mascotas_cliente, api_editar_mascota
+    api_mascotas_cliente, api_editar_mascota,
+    # Búsqueda (typeahead)
+    api_buscar_clientes, api_buscar_mascotas, api_buscar_atenciones,
+    # Caché
+    api_estadisticas_cache, api_plantel_veterinarios
 )
 
 router = DefaultRouter()
@@ -34,10 +38,20 @@ urlpatterns = [
     # API
     # API - Custom endpoints must be before router to avoid being caught as PKs
     path('citas/calendario/', api_citas_calendario, name='api_citas_calendario'),
+    path('citas/reagendar_lote/', api_reagendar_citas_lote, name='api_reagendar_citas_lote'),
     # HU002: Disponibilidad de horarios
     path('disponibilidad/', api_disponibilidad_horarios, name='api_disponibilidad_horarios'),
     # HU006: Antecedentes de mascota
     path('mascotas/<int:mascota_id>/antecedentes/', api_antecedentes_mascota, name='api_antecedentes_mascota'),
+    # Búsqueda typeahead para recepción
+    path('buscar/clientes/', api_buscar_clientes, name='api_buscar_clientes'),
+    path('buscar/mascotas/', api_buscar_mascotas, name='api_buscar_mascotas'),
+    # Búsqueda de texto completo en atenciones (veterinarios)
+    path('buscar/atenciones/', api_buscar_atenciones, name='api_buscar_atenciones'),
+    # Aciertos y fallos de la caché (administradores)
+    path('cache/estadisticas/', api_estadisticas_cache, name='api_estadisticas_cache'),
+    # Plantel de veterinarios para selectores (ETag); antes del router
+    path('veterinarios/plantel/', api_plantel_veterinarios, name='api_plantel_veterinarios'),
     path('', include(router.urls)),
     
     # Frontend Pages
@@ -1,6 +1,9 @@
 """
 Utilidades y funciones helper para la aplicación de clínica veterinaria.
 """
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
 
 
 def formatear_rut(rut_input):
@@ -92,15 +95,70 @@ def formatear_telefono(telefono_input):
     return tel_clean if tel_clean else telefono_input
 
 
-def validar_conflicto_horario(veterinario_id, fecha_hora, cita_id=None):
+def normalizar_rut(rut_input):
+    """
+    Normaliza un RUT para búsquedas: la clave canónica de clinic.rut
+    (dígitos sin ceros a la izquierda y el DV en mayúscula), la misma que
+    se guarda en Cliente.rut_normalizado.
+
+    Examples:
+        >>> normalizar_rut("12.345.678-k")
+        "12345678K"
+        >>> normalizar_rut("09.876.543-2")
+        "98765432"
+    """
+    from .rut import canonico
+
+    return canonico(rut_input)
+
+
+def normalizar_telefono(telefono_input):
+    """
+    Normaliza un teléfono para búsquedas: solo los dígitos del número
+    nacional, sin el prefijo de país 56.
+
+    Examples:
+        >>> normalizar_telefono("+56 9 1234 5678")
+        "912345678"
+        >>> normalizar_telefono("912345678")
+        "912345678"
+    """
+    if not telefono_input:
+        return ''
+    digitos = ''.join(c for c in telefono_input if c.isdigit())
+    if digitos.startswith('56') and (telefono_input.strip().startswith('+') or len(digitos) > 9):
+        digitos = digitos[2:]
+    return digitos
+
+
+def rango_del_dia(fecha=None):
+    """
+    Retorna el rango [inicio, fin) de un día local como datetimes aware.
+    
+    Filtrar con fecha__gte/fecha__lt sobre este rango usa los índices de la
+    columna, a diferencia de fecha__date=..., que aplica una función a cada fila.
+    
+    Args:
+        fecha (date): Día a consultar (por defecto, hoy en hora local)
+        
+    Returns:
+        tuple: (inicio, fin) del día
+    """
+    fecha = fecha or timezone.localdate()
+    inicio = timezone.make_aware(datetime.combine(fecha, time.min))
+    return inicio, timezone.make_aware(datetime.combine(fecha + timedelta(days=1), time.min))
+
+
+def validar_conflicto_horario(veterinario_id, fecha_hora, cita_id=None, tipo=None):
     """
     Valida si existe un conflicto de horario para un veterinario.
-    Asume citas de 30 minutos de duración.
+    La duración de cada cita depende de su tipo (ver clinic.agenda.DURACION_POR_TIPO).
     
     Args:
         veterinario_id (int): ID del veterinario
         fecha_hora (datetime|str): Fecha y hora de la cita
         cita_id (int, optional): ID de la cita actual (para excluir al reagendar)
+        tipo (str, optional): Tipo de la cita (CONSULTA, CIRUGIA, etc.)
     
     Returns:
         tuple: (tiene_conflicto: bool, mensaje: str)
@@ -109,47 +167,16 @@ def validar_conflicto_horario(veterinario_id, fecha_hora, cita_id=None):
         >>> validar_conflicto_horario(1, "2025-12-07 10:00:00")
         (False, "")
         >>> validar_conflicto_horario(1, "2025-12-07 10:00:00")  # Si ya existe cita
-        (True, "Conflicto: El veterinario ya tiene una cita a las 10:00")
+        (True, "Conflicto: El veterinario ya tiene una cita a las 10:00. Próximo horario libre: ...")
     """
-    from datetime import timedelta
-    from django.utils.dateparse import parse_datetime
-    from .models import Cita
-    
-    if not veterinario_id or not fecha_hora:
-        return False, ""
-    
-    # Convertir string a datetime si es necesario
-    if isinstance(fecha_hora, str):
-        fecha_hora = parse_datetime(fecha_hora)
+    from .agenda import validar_conflicto
     
-    # Rango de 30 minutos antes y después
-    inicio_ventana = fecha_hora - timedelta(minutes=30)
-    fin_ventana = fecha_hora + timedelta(minutes=30)
-    
-    # Buscar citas del mismo veterinario en ese rango
-    # Usamos gt y lt para permitir citas contiguas (que terminan justo cuando empieza la otra)
-    # Rango de conflicto: (fecha_hora - 30min) < cita_existente < (fecha_hora + 30min)
-    citas_conflicto = Cita.objects.filter(
-        veterinario_id=veterinario_id,
-        fecha_hora__gt=inicio_ventana,
-        fecha_hora__lt=fin_ventana,
-        estado__in=['AGENDADA', 'CONFIRMADA']
-    )
-    
-    # Excluir la cita actual si estamos reagendando
-    if cita_id:
-        citas_conflicto = citas_conflicto.exclude(id=cita_id)
-    
-    if citas_conflicto.exists():
-        cita = citas_conflicto.first()
-        return True, f"Conflicto: El veterinario ya tiene una cita a las {cita.fecha_hora.strftime('%H:%M')}"
-    
-    return False, ""
+    return validar_conflicto(veterinario_id, fecha_hora, tipo=tipo, cita_id=cita_id)
 
 
 def es_feriado_o_domingo(fecha):
     """
-    Verifica si una fecha es domingo o feriado en Chile (2024-2025).
+    Verifica si una fecha es domingo o feriado en Chile (ver clinic.feriados).
     
     Args:
         fecha (date/datetime): Fecha a verificar
@@ -157,30 +184,7 @@ def es_feriado_o_domingo(fecha):
     Returns:
         tuple: (es_especial: bool, razon: str)
     """
-    # Si es datetime, obtener date
-    if hasattr(fecha, 'date'):
-        fecha = fecha.date()
-        
-    # Verificar Domingo (weekday 6)
-    if fecha.weekday() == 6:
-        return True, "Es Domingo"
-        
-    # Lista de feriados Chile 2024-2025 (Hardcoded por simplicidad)
-    feriados = [
-        # 2024
-        '2024-01-01', '2024-03-29', '2024-03-30', '2024-05-01', '2024-05-21',
-        '2024-06-09', '2024-06-20', '2024-07-16', '2024-08-15', '2024-09-18',
-        '2024-09-19', '2024-09-20', '2024-10-12', '2024-10-27', '2024-10-31',
-        '2024-11-01', '2024-12-08', '2024-12-25',
-        # 2025
-        '2025-01-01', '2025-04-18', '2025-04-19', '2025-05-01', '2025-05-21',
-        '2025-06-20', '2025-06-29', '2025-07-16', '2025-08-15', '2025-09-18',
-        '2025-09-19', '2025-10-12', '2025-10-31', '2025-11-01', '2025-12-08',
-        '2025-12-25'
-    ]
-    
-    fecha_str = fecha.strftime('%Y-%m-%d')
-    if fecha_str in feriados:
-        return True, "Es Feriado"
-        
-    return False, ""
+    from .feriados import no_habiles
+    
+    razon = next(iter(no_habiles([fecha]).values()), "")
+    return bool(razon), razon
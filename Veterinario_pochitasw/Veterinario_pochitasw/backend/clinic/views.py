@@ -10,10 +10,11 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action, api_view
 from django.db.models import Q
-from .models import Usuario, Cliente, Veterinario, Mascota, Cita, Atencion, ListaEspera, Producto
+from .models import Usuario, Cliente, Veterinario, Mascota, Cita, Atencion, ListaEspera, Producto, ResumenClinico
 from .serializers import (
     UsuarioSerializer, ClienteSerializer, VeterinarioSerializer, MascotaSerializer, 
-    CitaSerializer, AtencionSerializer, ListaEsperaSerializer, ProductoSerializer
+    CitaSerializer, AtencionSerializer, ListaEsperaSerializer, ProductoSerializer,
+    campos_solicitados
 )
 from .forms import RegistroUsuarioForm, RegistroClienteForm, RegistroMascotaForm
 from django.contrib.auth import login
@@ -24,6 +25,10 @@ from django.utils.dateparse import parse_datetime
 from django.contrib import messages
 from datetime import timedelta
 from .utils import validar_conflicto_horario
+from .precarga import PrecargaMixin
+from .pagination import CitaCursorPagination, AtencionCursorPagination
+from .renderers import JSONRapidoResponse
+from . import plantel
 
 
 # Helper para recepción
@@ -83,9 +88,9 @@ def registro_rapido(request):
         cliente_form = RegistroClienteForm(data)
         mascota_form = RegistroMascotaForm(data)
 
-        # RELAX VALIDATION: Remove strict regex validators to avoid UX frustration
-        # The auto-formatter attempts to fix it, but if it fails matching strict regex
-        # (e.g. foreign ID, short RUT), we generally want to allow it anyway.
+        # RELAX VALIDATION: Remove strict regex validators to avoid UX frustration.
+        # The RUT is still checked by RegistroClienteForm.clean_rut (check digit
+        # and duplicates in any format), which accepts it with or without dots.
         if 'rut' in cliente_form.fields:
             cliente_form.fields['rut'].validators = []
         if 'telefono' in cliente_form.fields:
@@ -279,56 +284,91 @@ def contacto(request):
     return render(request, 'clinic/contacto.html')
 
 # Dashboards
+AGENDA_RECEPCION_POR_PAGINA = 25
+
 def dashboard_recepcion(request):
     # Validar rol
     if not request.user.is_authenticated or request.user.rol not in ['RECEPCIONISTA', 'ADMIN']:
          return redirect('index')
     
-    citas = Cita.objects.all().order_by('fecha_hora')
-    vets = Veterinario.objects.all()
-    clientes = Cliente.objects.all()
-    mascotas = Mascota.objects.all() # Needed for appointment creation dropdown
-    espera = ListaEspera.objects.filter(estado='ESPERANDO')
+    from django.core.paginator import Paginator
+    from .utils import rango_del_dia
+    
+    # Solo citas de hoy en adelante, paginadas
+    inicio_hoy, fin_hoy = rango_del_dia()
+    citas = Cita.objects.filter(
+        fecha_hora__gte=inicio_hoy
+    ).select_related('mascota__cliente', 'veterinario').order_by('fecha_hora')
+    pagina = Paginator(citas, AGENDA_RECEPCION_POR_PAGINA).get_page(request.GET.get('pagina'))
     
+    # Clientes, mascotas y lista de espera se cargan bajo demanda vía JSON
     return render(request, 'clinic/dashboard_recepcion.html', {
-        'citas': citas, 
-        'veterinarios': vets,
-        'clientes': clientes,
-        'mascotas': mascotas,
-        'lista_espera': espera
+        'citas': pagina,
+        'veterinarios': plantel.veterinarios(),
+        'total_citas_hoy': citas.filter(fecha_hora__lt=fin_hoy).count(),
+        'total_espera': ListaEspera.objects.filter(estado='ESPERANDO').count(),
+        'total_clientes': Cliente.objects.count()
     })
 
+# Días (además de hoy) de citas que muestra el dashboard del veterinario.
+# Se puede sobrescribir con settings.CLINIC_AGENDA_VETERINARIO_DIAS o ?dias=
+AGENDA_VETERINARIO_DIAS = 7
+AGENDA_VETERINARIO_DIAS_MAXIMO = 31
+
 def dashboard_veterinario(request):
     if not request.user.is_authenticated or request.user.rol != 'VETERINARIO':
          return redirect('index')
     
+    import logging
+    from django.conf import settings
+    from .cola import motor_cola
+    from .utils import rango_del_dia
+    logger = logging.getLogger(__name__)
+    
+    dias = getattr(settings, 'CLINIC_AGENDA_VETERINARIO_DIAS', AGENDA_VETERINARIO_DIAS)
+    try:
+        dias = int(request.GET.get('dias', dias))
+    except ValueError:
+        pass
+    dias = max(0, min(dias, AGENDA_VETERINARIO_DIAS_MAXIMO))
+    
     try:
         if not hasattr(request.user, 'perfil_veterinario'):
             raise Exception("Usuario has no perfil_veterinario")
             
         vet = request.user.perfil_veterinario
-        # Citas agendadas (Solo pendientes)
+        inicio_hoy, fin_hoy = rango_del_dia()
+        
+        # Citas pendientes de hoy y los próximos `dias` días
         citas_hoy = Cita.objects.filter(
             veterinario=vet,
+            fecha_hora__gte=inicio_hoy,
+            fecha_hora__lt=fin_hoy + timedelta(days=dias),
             estado__in=[Cita.Estado.AGENDADA, Cita.Estado.CONFIRMADA]
-        ).order_by('fecha_hora')
+        ).select_related('mascota__cliente').order_by('fecha_hora')
         
-        # Walk-ins asignados a este veterinario (En Atención)
-        walkins_asignados = ListaEspera.objects.filter(
-            veterinario_asignado=vet, 
-            estado=ListaEspera.Estado.EN_ATENCION
-        ).order_by('fecha_atencion')
+        # Walk-ins en una sola consulta: los que este veterinario está
+        # atendiendo y el pool de hoy que espera (para que el vet pueda elegir)
+        walkins = ListaEspera.objects.filter(
+            Q(veterinario_asignado=vet, estado=ListaEspera.Estado.EN_ATENCION) |
+            Q(estado=ListaEspera.Estado.ESPERANDO, fecha_solicitud__gte=inicio_hoy, fecha_solicitud__lt=fin_hoy)
+        ).select_related('cliente', 'mascota')
         
-        # Pool de pacientes esperando (Sin asignar o esperando)
-        # Mostramos todos los ESPERANDO para que el vet pueda elegir
-        walkins_espera = ListaEspera.objects.filter(
-            estado=ListaEspera.Estado.ESPERANDO
-        ).order_by('-prioridad', 'numero_turno') # Urgentes primero
+        walkins_asignados = []
+        walkins_espera = []
+        for paciente in walkins:
+            if paciente.estado == ListaEspera.Estado.EN_ATENCION:
+                walkins_asignados.append(paciente)
+            else:
+                walkins_espera.append(paciente)
+        walkins_asignados.sort(key=lambda paciente: paciente.fecha_atencion or paciente.fecha_solicitud)
         
-        print(f"DEBUG: Walk-ins Espera Count: {walkins_espera.count()}")
+        # El pool va en el orden de atención de la cola (urgentes adelantados)
+        orden = {pk: posicion for posicion, pk in enumerate(motor_cola.orden())}
+        walkins_espera.sort(key=lambda paciente: (orden.get(paciente.id, len(orden)), paciente.numero_turno or 0))
         
     except Exception as e:
-        print(f"Error en dashboard vet: {e}")
+        logger.warning("Error en dashboard vet: %s", e)
         error_msg = str(e)
         if "pk" in str(e) or "perfil_veterinario" in str(e):
              error_msg = "Este usuario no tiene un perfil de Veterinario asociado. Contacte al administrador."
@@ -339,6 +379,7 @@ def dashboard_veterinario(request):
     
     return render(request, 'clinic/dashboard_veterinario.html', {
         'citas': citas_hoy,
+        'dias_agenda': dias,
         'walkins_asignados': walkins_asignados,
         'walkins_espera': walkins_espera,
         'debug_error': locals().get('error_msg', None)
@@ -403,7 +444,9 @@ def crear_cita_recepcion(request):
                 return redirect('dashboard_recepcion')
 
             # Validar conflicto de horario
-            tiene_conflicto, mensaje_conflicto = validar_conflicto_horario(veterinario_id, fecha_hora)
+            tiene_conflicto, mensaje_conflicto = validar_conflicto_horario(
+                veterinario_id, fecha_hora, tipo=tipo or Cita.Tipo.CONSULTA
+            )
             if tiene_conflicto:
                 print(f"DEBUG: Conflicto detectado: {mensaje_conflicto}")
                 messages.error(request, mensaje_conflicto)
@@ -478,7 +521,7 @@ def reagendar_cita(request, cita_id):
 
             # Validar conflicto de horario
             tiene_conflicto, mensaje_conflicto = validar_conflicto_horario(
-                vet_id_validar, fecha_validar, cita_id=cita_id
+                vet_id_validar, fecha_validar, cita_id=cita_id, tipo=cita.tipo
             )
             if tiene_conflicto:
                 messages.error(request, mensaje_conflicto)
@@ -508,45 +551,190 @@ def reagendar_cita(request, cita_id):
             
     return redirect('dashboard_recepcion')
 
+@api_view(['POST'])
+def api_reagendar_citas_lote(request):
+    """
+    API para reagendar o reasignar varias citas en una sola operación
+    (por ejemplo, cuando un veterinario se ausenta).
+    
+    Body JSON:
+        - movimientos: [{'cita_id', 'veterinario_id', 'fecha_hora'}, ...]
+          (veterinario_id y fecha_hora son opcionales, se mantiene el valor actual)
+        - motivo_reagendamiento: Motivo común del cambio (opcional)
+        - validar_solo: Si es true, solo valida sin aplicar cambios
+    
+    Todos los movimientos se validan entre sí y contra la agenda existente.
+    Si alguno falla no se aplica ninguno.
+    
+    Retorna:
+        JSON con 'aplicado' y un resultado por movimiento con su error (o null)
+    """
+    if not request.user.is_authenticated or request.user.rol not in ['RECEPCIONISTA', 'ADMIN']:
+        return Response({'error': 'Unauthorized'}, status=403)
+    
+    from django.utils import timezone
+    from .agenda import validar_movimientos
+    
+    movimientos_raw = request.data.get('movimientos')
+    if not isinstance(movimientos_raw, list) or not movimientos_raw:
+        return Response({'error': 'Debe enviar una lista de movimientos'}, status=400)
+    
+    movimientos = []
+    for i, mov in enumerate(movimientos_raw):
+        try:
+            fecha_hora = mov.get('fecha_hora')
+            if fecha_hora:
+                fecha_hora = parse_datetime(fecha_hora)
+                if fecha_hora is None:
+                    raise ValueError('fecha_hora')
+                if timezone.is_naive(fecha_hora):
+                    fecha_hora = timezone.make_aware(fecha_hora)
+            movimientos.append({
+                'cita_id': int(mov['cita_id']),
+                'veterinario_id': int(mov['veterinario_id']) if mov.get('veterinario_id') else None,
+                'fecha_hora': fecha_hora
+            })
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return Response({'error': f'Movimiento {i} inválido'}, status=400)
+    
+    citas = Cita.objects.in_bulk([m['cita_id'] for m in movimientos])
+    resultados = validar_movimientos(movimientos, citas)
+    hay_errores = any(r['error'] for r in resultados)
+    
+    aplicado = False
+    if not hay_errores and not request.data.get('validar_solo'):
+        motivo = (request.data.get('motivo_reagendamiento') or '').strip()
+        ahora = timezone.now()
+        with transaction.atomic():
+            bloqueadas = Cita.objects.select_for_update().in_bulk(citas.keys())
+            # Los veterinarios de destino también se bloquean, para que dos
+            # lotes no pasen la validación a la vez con el mismo horario
+            list(Veterinario.objects.select_for_update().filter(
+                id__in={r['veterinario_id'] for r in resultados}
+            ).values_list('id', flat=True))
+            # Revalidar con las filas ya bloqueadas: entre la primera
+            # validación y el bloqueo se pudo confirmar otra reserva
+            resultados = validar_movimientos(movimientos, bloqueadas)
+            hay_errores = any(r['error'] for r in resultados)
+            if not hay_errores:
+                for resultado in resultados:
+                    cita = bloqueadas[resultado['cita_id']]
+                    cita.veterinario_id = resultado['veterinario_id']
+                    cita.fecha_hora = resultado['fecha_hora']
+                    if motivo:
+                        cita.motivo_reagendamiento = motivo
+                        cita.fecha_reagendamiento = ahora
+                campos = ['veterinario', 'fecha_hora']
+                if motivo:
+                    campos += ['motivo_reagendamiento', 'fecha_reagendamiento']
+                Cita.objects.bulk_update(bloqueadas.values(), campos)
+                aplicado = True
+        
+        if aplicado:
+            # bulk_update no dispara señales: sincronizar el índice de agenda
+            from .agenda import indice_agenda
+            from .calendario import invalidar_semanas
+            for cita in bloqueadas.values():
+                indice_agenda.actualizar(cita)
+            invalidar_semanas(
+                [c.fecha_hora for c in citas.values()] + [c.fecha_hora for c in bloqueadas.values()]
+            )
+    
+    return Response({
+        'aplicado': aplicado,
+        'resultados': [{
+            'cita_id': r['cita_id'],
+            'veterinario_id': r['veterinario_id'],
+            'fecha_hora': timezone.localtime(r['fecha_hora']).isoformat() if r['fecha_hora'] else None,
+            'error': r['error']
+        } for r in resultados]
+    }, status=status.HTTP_409_CONFLICT if hay_errores else status.HTTP_200_OK)
+
+# Rangos del calendario más largos que esto se envían como streaming
+CALENDARIO_DIAS_STREAMING = 31
+
+
+def _parse_limite_calendario(valor):
+    """Convierte el parámetro start/end (fecha o fecha-hora ISO) a datetime aware."""
+    from datetime import datetime, time
+    from django.utils import timezone
+    from django.utils.dateparse import parse_date
+    
+    fecha_hora = parse_datetime(valor)
+    if fecha_hora is None:
+        fecha = parse_date(valor)
+        if fecha is None:
+            raise ValueError(valor)
+        fecha_hora = datetime.combine(fecha, time.min)
+    if timezone.is_naive(fecha_hora):
+        fecha_hora = timezone.make_aware(fecha_hora)
+    return fecha_hora
+
+
 def api_citas_calendario(request):
     """
     Retorna citas en formato JSON para el calendario.
-    Opcional: Filtrar por start/end date range si se pasan params.
+    
+    Parámetros GET:
+        - start: Inicio del rango, fecha o fecha-hora ISO (requerido)
+        - end: Fin del rango, fecha o fecha-hora ISO (requerido)
+        - veterinario_id: Filtrar por veterinario (opcional)
+    
+    Los eventos se cachean por semana y veterinario (ver clinic.calendario).
+    Soporta GET condicional: si el ETag o Last-Modified no cambiaron se
+    responde 304 sin consultar la base de datos. Los rangos de más de
+    CALENDARIO_DIAS_STREAMING días se envían como streaming.
     """
     if not request.user.is_authenticated or request.user.rol not in ['RECEPCIONISTA', 'ADMIN']:
          return JsonResponse({'error': 'Unauthorized'}, status=403)
 
+    from django.utils.cache import get_conditional_response, patch_cache_control
+    from django.utils.http import http_date
+    from .calendario import etag_y_modificacion, eventos_por_semana
+
     start_date = request.GET.get('start')
     end_date = request.GET.get('end')
     
-    citas = Cita.objects.filter(estado__in=['AGENDADA', 'CONFIRMADA'])
+    if not start_date or not end_date:
+        return JsonResponse({'error': 'Los parámetros start y end son requeridos'}, status=400)
+    
+    try:
+        inicio = _parse_limite_calendario(start_date)
+        fin = _parse_limite_calendario(end_date)
+        veterinario_id = int(request.GET['veterinario_id']) if request.GET.get('veterinario_id') else None
+    except ValueError:
+        return JsonResponse({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}, status=400)
+    
+    if fin < inicio:
+        return JsonResponse({'error': 'El rango de fechas es inválido'}, status=400)
+    
+    etag, modificado = etag_y_modificacion(inicio, fin, veterinario_id)
+    response = get_conditional_response(request, etag=etag, last_modified=modificado)
     
-    if start_date and end_date:
-        citas = citas.filter(fecha_hora__range=[start_date, end_date])
+    if response is None:
+        semanas = eventos_por_semana(inicio, fin, veterinario_id)
         
-    data = []
-    for c in citas:
-        # Color coding based on status or type
-        color = '#0d6efd' # primary
-        if c.estado == 'CONFIRMADA':
-            color = '#198754' # success
+        if (fin - inicio).days <= CALENDARIO_DIAS_STREAMING:
+            response = JSONRapidoResponse([evento for semana in semanas for evento in semana], safe=False)
+        else:
+            from django.http import StreamingHttpResponse
+            from .renderers import dumps
             
-        data.append({
-            'id': c.id,
-            'title': f"{c.mascota.nombre} ({c.tipo})",
-            'start': c.fecha_hora.isoformat(),
-            'end': c.fecha_hora.isoformat(), # For point events
-            'veterinario': c.veterinario.nombre if c.veterinario else "Sin Asignar",
-            'veterinario_id': c.veterinario.id if c.veterinario else "",
-            'mascota': c.mascota.nombre,
-            'dueño': f"{c.mascota.cliente.nombre} {c.mascota.cliente.apellido}",
-            'color': color,
-            'tipo': c.tipo,
-            'estado': c.estado,
-            'motivo': c.motivo
-        })
-        
-    return JsonResponse(data, safe=False)
+            def generar():
+                yield b'['
+                primero = True
+                for semana in semanas:
+                    if semana:
+                        yield (b'' if primero else b',') + dumps(semana)[1:-1]
+                        primero = False
+                yield b']'
+            
+            response = StreamingHttpResponse(generar(), content_type='application/json')
+    
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modificado)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 # Editar Cliente
 def editar_cliente(request, cliente_id):
@@ -658,38 +846,13 @@ def dashboard_cliente(request):
     import logging
     logger = logging.getLogger(__name__)
     
-    logger.info(f"=== DASHBOARD_CLIENTE CALLED ===")
-    logger.info(f"User: {request.user}")
-    logger.info(f"Is authenticated: {request.user.is_authenticated}")
-    logger.info(f"User rol: {getattr(request.user, 'rol', 'NO ROL ATTR')}")
-    
     if not request.user.is_authenticated or request.user.rol != 'CLIENTE':
-        logger.warning(f"Access denied - redirecting to index")
+        logger.debug("dashboard_cliente: acceso denegado a %s", request.user)
         return redirect('index')
     
-    try:
-        logger.info("Attempting to get perfil_cliente...")
-        cliente = request.user.perfil_cliente
-        logger.info(f"Cliente found: {cliente}")
-        
-        logger.info("Getting mascotas...")
-        mascotas = cliente.mascotas.all()
-        logger.info(f"Mascotas count: {mascotas.count()}")
-        
-        logger.info("Getting citas...")
-        citas = Cita.objects.filter(mascota__cliente=cliente).order_by('-fecha_hora')
-        logger.info(f"Citas count: {citas.count()}")
-    except Exception as e:
-        logger.error(f"ERROR getting cliente data: {type(e).__name__}: {str(e)}")
-        logger.exception("Full traceback:")
-        cliente = None
-        mascotas = []
-        citas = []
-
     if request.method == 'POST':
-        logger.info("POST request received")
         action = request.POST.get('action')
-        logger.info(f"Action: {action}")
+        logger.debug("dashboard_cliente: POST action=%s", action)
         
         if action == 'cancelar':
             cita_id = request.POST.get('cita_id')
@@ -698,10 +861,9 @@ def dashboard_cliente(request):
                 if cita.estado != Cita.Estado.CANCELADA:
                     cita.estado = Cita.Estado.CANCELADA
                     cita.save()
-                    logger.info(f"Cita {cita_id} cancelled")
+                    logger.info("Cita %s cancelada por el cliente", cita_id)
             except Cita.DoesNotExist:
-                logger.warning(f"Cita {cita_id} not found")
-                pass
+                logger.warning("Cita %s no encontrada", cita_id)
             return redirect('dashboard_cliente')
             
         # Creación de cita (default behavior if no specific action or implicit creation)
@@ -711,6 +873,13 @@ def dashboard_cliente(request):
         motivo = request.POST.get('motivo')
         
         if mascota_id and fecha and motivo:
+            tiene_conflicto, mensaje_conflicto = validar_conflicto_horario(
+                vet_id, fecha, tipo=Cita.Tipo.CONSULTA
+            )
+            if tiene_conflicto:
+                messages.error(request, mensaje_conflicto)
+                return redirect('dashboard_cliente')
+            
             Cita.objects.create(
                 mascota_id=mascota_id,
                 veterinario_id=vet_id if vet_id else None,
@@ -719,36 +888,30 @@ def dashboard_cliente(request):
                 estado='AGENDADA'
             )
             messages.success(request, "Cita agendada correctamente.")
-            logger.info(f"New cita created for mascota {mascota_id}")
+            logger.info("Cita creada para la mascota %s", mascota_id)
         
         return redirect('dashboard_cliente')
     
-    logger.info("Getting veterinarios...")
-    veterinarios = Veterinario.objects.all()
-    logger.info(f"Veterinarios count: {veterinarios.count()}")
+    # Una consulta por lista: mascotas, citas (con mascota y veterinario) y veterinarios
+    try:
+        cliente = request.user.perfil_cliente
+        mascotas = list(cliente.mascotas.all())
+        citas = list(
+            Cita.objects.filter(mascota__cliente=cliente)
+            .select_related('mascota', 'veterinario')
+            .order_by('-fecha_hora')
+        )
+    except Exception:
+        logger.exception("dashboard_cliente: error obteniendo los datos del cliente")
+        cliente = None
+        mascotas = []
+        citas = []
     
-    logger.info("Rendering template...")
     return render(request, 'clinic/dashboard_cliente.html', {
         'cliente': cliente,
         'mascotas': mascotas,
         'citas': citas,
-        'veterinarios': veterinarios
-    })
-
-def historial_mascota(request, mascota_id):
-    if not request.user.is_authenticated:
-        return redirect('index')
-    
-    mascota = get_object_or_404(Mascota, id=mascota_id)
-    # Historial de atenciones (citas que tienen atención registrada)
-    atenciones = Atencion.objects.filter(cita__mascota=mascota).order_by('-fecha')
-    # Historial de citas general
-    citas = Cita.objects.filter(mascota=mascota).order_by('-fecha_hora')
-    
-    return render(request, 'clinic/historial_mascota.html', {
-        'mascota': mascota,
-        'atenciones': atenciones,
-        'citas': citas
+        'veterinarios': plantel.veterinarios()
     })
 
 def registrar_atencion(request, cita_id):
@@ -810,124 +973,271 @@ def registrar_atencion(request, cita_id):
 
 # --- API ViewSets (Backend) ---
 
-class ClienteViewSet(viewsets.ModelViewSet):
+class ClienteViewSet(PrecargaMixin, viewsets.ModelViewSet):
     queryset = Cliente.objects.all()
     serializer_class = ClienteSerializer
     
-class VeterinarioViewSet(viewsets.ModelViewSet):
+class VeterinarioViewSet(PrecargaMixin, viewsets.ModelViewSet):
     queryset = Veterinario.objects.all()
     serializer_class = VeterinarioSerializer
 
-class MascotaViewSet(viewsets.ModelViewSet):
+    def list(self, request, *args, **kwargs):
+        # Los listados para selectores (?fields=id,nombre,especialidad, sin
+        # filtros) salen del plantel en memoria, sin consultar la base de datos
+        campos = campos_solicitados(request)
+        otros_parametros = set(request.query_params) - {'fields', 'page', 'page_size', 'format'}
+        if not campos or not campos <= set(plantel.CAMPOS_PLANTEL) or otros_parametros:
+            return super().list(request, *args, **kwargs)
+
+        filas = [
+            {campo: veterinario[campo] for campo in plantel.CAMPOS_PLANTEL if campo in campos}
+            for veterinario in plantel.veterinarios()
+        ]
+        pagina = self.paginate_queryset(filas)
+        if pagina is not None:
+            return self.get_paginated_response(pagina)
+        return Response(filas)
+
+class MascotaViewSet(PrecargaMixin, viewsets.ModelViewSet):
     queryset = Mascota.objects.all()
     serializer_class = MascotaSerializer
     
     def get_queryset(self):
         """Filter mascotas by cliente if parameter is provided"""
-        queryset = Mascota.objects.all()
+        queryset = super().get_queryset()
         cliente_id = self.request.query_params.get('cliente', None)
         if cliente_id is not None:
             queryset = queryset.filter(cliente_id=cliente_id)
         return queryset
 
-class CitaViewSet(viewsets.ModelViewSet):
+class CitaViewSet(PrecargaMixin, viewsets.ModelViewSet):
     queryset = Cita.objects.all().order_by('fecha_hora')
     serializer_class = CitaSerializer
+    pagination_class = CitaCursorPagination
     filterset_fields = ['veterinario', 'estado', 'mascota__cliente']
 
     @action(detail=False, methods=['get'])
     def por_veterinario(self, request):
         vet_id = request.query_params.get('veterinario_id')
         if vet_id:
-            citas = Cita.objects.filter(veterinario_id=vet_id)
+            citas = self.get_queryset().filter(veterinario_id=vet_id)
             serializer = self.get_serializer(citas, many=True)
             return Response(serializer.data)
         return Response([])
 
-class AtencionViewSet(viewsets.ModelViewSet):
+class AtencionViewSet(PrecargaMixin, viewsets.ModelViewSet):
     queryset = Atencion.objects.all()
     serializer_class = AtencionSerializer
+    pagination_class = AtencionCursorPagination
 
-class ListaEsperaViewSet(viewsets.ModelViewSet):
+class ListaEsperaViewSet(PrecargaMixin, viewsets.ModelViewSet):
     queryset = ListaEspera.objects.all()
     serializer_class = ListaEsperaSerializer
     filterset_fields = ['estado', 'prioridad', 'veterinario_asignado']
     
+    def _registros_de_hoy(self):
+        from .utils import rango_del_dia
+        inicio, fin = rango_del_dia()
+        return self.get_queryset().filter(fecha_solicitud__gte=inicio, fecha_solicitud__lt=fin)
+    
+    def _respuesta_cambios(self, version, actual):
+        """
+        Respuesta incremental de la cola del día a partir de `version`.
+        
+        Retorna:
+            - version: Versión a enviar en la próxima petición
+            - completo: True si `cambios` es la cola completa
+            - cambios: Registros del día modificados después de `version`
+              (en cualquier estado; los que ya no están en cola deben quitarse)
+            - ids: IDs de los registros que siguen en cola. Solo se envía cuando
+              faltan versiones entre los cambios (registros eliminados, o
+              modificados más de una vez); si no, es null.
+            - predicciones: {id: [posición, minutos estimados]} de todos los
+              pacientes en espera (cambian con cualquier movimiento de la cola)
+        """
+        from .cola import ESTADOS_EN_COLA, motor_cola
+        
+        hoy = self._registros_de_hoy()
+        en_cola = hoy.filter(estado__in=ESTADOS_EN_COLA)
+        
+        if version is not None and actual == version:
+            return Response({'version': version, 'completo': False, 'cambios': [], 'ids': None})
+        
+        predicciones = {
+            pk: [p['posicion'], p['espera_estimada']] for pk, p in motor_cola.predicciones()[0].items()
+        }
+        
+        # Primera carga, o versión desconocida (por ejemplo, tras reiniciar el contador)
+        if version is None or actual < version:
+            filas = list(en_cola.order_by('numero_turno'))
+            return Response({
+                'version': max([actual, *(f.version for f in filas)]),
+                'completo': True,
+                'cambios': self.get_serializer(filas, many=True).data,
+                'ids': [f.id for f in filas],
+                'predicciones': predicciones,
+            })
+        
+        filas = list(hoy.filter(version__gt=version).order_by('version'))
+        actual = max([actual, *(f.version for f in filas)])
+        ids = None
+        if len(filas) < actual - version:
+            ids = list(en_cola.values_list('id', flat=True))
+        return Response({
+            'version': actual,
+            'completo': False,
+            'cambios': self.get_serializer(filas, many=True).data,
+            'ids': ids,
+            'predicciones': predicciones,
+        })
+    
     @action(detail=False, methods=['get'])
     def hoy(self, request):
-        """Obtener cola de espera del día actual"""
-        from django.utils import timezone
-        today = timezone.now().date()
-        cola = ListaEspera.objects.filter(
-            fecha_solicitud__date=today,
-            estado__in=[ListaEspera.Estado.ESPERANDO, ListaEspera.Estado.EN_ATENCION]
-        ).order_by('numero_turno')
-        serializer = self.get_serializer(cola, many=True)
+        """
+        Obtener cola de espera del día actual.
+        
+        Sin parámetros retorna la cola completa, con la posición y la espera
+        estimada (minutos) de cada paciente en espera. La versión actual va en
+        el header X-Cola-Version y la espera real promedio de los últimos
+        llamados en X-Espera-Promedio. Con ?since=<version> retorna solo los
+        cambios posteriores a esa versión, con el formato de /cambios/.
+        """
+        from .cola import ESTADOS_EN_COLA, motor_cola, version_actual
+        
+        since = request.query_params.get('since')
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                return Response({'error': 'Parámetro since inválido'}, status=status.HTTP_400_BAD_REQUEST)
+            return self._respuesta_cambios(since, version_actual())
+        
+        actual = version_actual()
+        cola = self._registros_de_hoy().filter(estado__in=ESTADOS_EN_COLA).order_by('numero_turno')
+        predicciones, espera_promedio = motor_cola.predicciones()
+        datos = self.get_serializer(cola, many=True).data
+        for fila in datos:
+            fila.update(predicciones.get(fila['id'], {'posicion': None, 'espera_estimada': None}))
+        response = Response(datos)
+        response['X-Cola-Version'] = str(actual)
+        if espera_promedio is not None:
+            response['X-Espera-Promedio'] = str(round(espera_promedio))
+        return response
+
+    @action(detail=False, methods=['get'])
+    def cambios(self, request):
+        """
+        Cambios en la cola del día (long-polling).
+
+        Parámetros GET:
+            - version: Última versión conocida. Sin ella se retorna la cola
+              completa y la versión actual.
+            - espera: Segundos máximos de espera (por defecto y máximo 25)
+
+        Retorna lo mismo que hoy?since=, pero espera a que haya cambios.
+        Si ya hay demasiadas peticiones esperando en el worker responde 503
+        con Retry-After, y el cliente reintenta más tarde.
+        """
+        from .cola import ESPERA_MAXIMA_SEGUNDOS, cupo_de_espera, esperar_cambios, version_actual
+
+        try:
+            version = request.query_params.get('version')
+            version = int(version) if version is not None else None
+            espera = min(float(request.query_params.get('espera', ESPERA_MAXIMA_SEGUNDOS)), ESPERA_MAXIMA_SEGUNDOS)
+        except ValueError:
+            return Response({'error': 'Parámetros inválidos'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if version is None:
+            return self._respuesta_cambios(version, version_actual())
+        with cupo_de_espera() as hay_cupo:
+            if not hay_cupo:
+                response = Response(
+                    {'error': 'Demasiadas esperas simultáneas'}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+                response['Retry-After'] = '5'
+                return response
+            actual = esperar_cambios(version, max(espera, 0))
+        return self._respuesta_cambios(version, actual)
+
+    @action(detail=False, methods=['post'])
+    def siguiente(self, request):
+        """
+        Llamar al siguiente paciente según el orden de la cola.
+        
+        El veterinario es `veterinario_id` (body), o el del usuario si es
+        veterinario; si no, se asigna al veterinario libre que lleva menos
+        walk-ins hoy. Dos llamados simultáneos nunca reciben al mismo paciente.
+        """
+        from .cola import SinVeterinarioDisponible, motor_cola
+        
+        veterinario = None
+        veterinario_id = request.data.get('veterinario_id')
+        if veterinario_id:
+            veterinario = Veterinario.objects.filter(id=veterinario_id).first()
+            if not veterinario:
+                return Response({'error': 'Veterinario no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        elif hasattr(request.user, 'perfil_veterinario'):
+            veterinario = request.user.perfil_veterinario
+        
+        try:
+            paciente = motor_cola.siguiente(veterinario)
+        except SinVeterinarioDisponible:
+            return Response({'error': 'No hay veterinarios disponibles'}, status=status.HTTP_409_CONFLICT)
+        if not paciente:
+            return Response({'error': 'No hay pacientes en espera'}, status=status.HTTP_404_NOT_FOUND)
+        
+        serializer = self.get_serializer(paciente)
         return Response(serializer.data)
     
+    def _transicion(self, pk, desde, error, **campos):
+        """
+        Aplica una transición de estado con cola.transicion y responde con el
+        registro actualizado, 404 si no existe o 409 si otro usuario lo cambió
+        antes (o ya no está en un estado que permita la transición).
+        """
+        from .cola import transicion
+
+        if not transicion(pk, desde, **campos):
+            if not ListaEspera.objects.filter(pk=pk).exists():
+                return Response({'error': 'Registro no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+            return Response({'error': error}, status=status.HTTP_409_CONFLICT)
+
+        serializer = self.get_serializer(self.get_queryset().get(pk=pk))
+        return Response(serializer.data)
+
     @action(detail=True, methods=['post'])
     def llamar_siguiente(self, request, pk=None):
-        """Llamar al siguiente paciente en la cola"""
+        """Llamar a un paciente específico de la cola"""
         from django.utils import timezone
         
-        paciente = self.get_object()
+        campos = {
+            'estado': ListaEspera.Estado.EN_ATENCION,
+            'fecha_atencion': timezone.now(),
+        }
         veterinario_id = request.data.get('veterinario_id')
+        if veterinario_id and plantel.existe(veterinario_id):
+            campos['veterinario_asignado_id'] = int(veterinario_id)
         
-        if paciente.estado != ListaEspera.Estado.ESPERANDO:
-            return Response(
-                {'error': 'Este paciente no está en espera'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Actualizar estado
-        paciente.estado = ListaEspera.Estado.EN_ATENCION
-        paciente.fecha_atencion = timezone.now()
-        
-        if veterinario_id:
-            try:
-                veterinario = Veterinario.objects.get(id=veterinario_id)
-                paciente.veterinario_asignado = veterinario
-            except Veterinario.DoesNotExist:
-                pass
-        
-        paciente.save()
-        
-        serializer = self.get_serializer(paciente)
-        return Response(serializer.data)
+        return self._transicion(
+            pk, [ListaEspera.Estado.ESPERANDO], 'Este paciente no está en espera', **campos
+        )
     
     @action(detail=True, methods=['post'])
     def marcar_atendido(self, request, pk=None):
         """Marcar paciente como atendido"""
-        paciente = self.get_object()
-        
-        if paciente.estado != ListaEspera.Estado.EN_ATENCION:
-            return Response(
-                {'error': 'Este paciente no está en atención'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        paciente.estado = ListaEspera.Estado.ATENDIDO
-        paciente.save()
-        
-        serializer = self.get_serializer(paciente)
-        return Response(serializer.data)
+        return self._transicion(
+            pk, [ListaEspera.Estado.EN_ATENCION], 'Este paciente no está en atención',
+            estado=ListaEspera.Estado.ATENDIDO,
+        )
     
     @action(detail=True, methods=['post'])
     def cancelar_turno(self, request, pk=None):
         """Cancelar turno de un paciente"""
-        paciente = self.get_object()
-        
-        if paciente.estado in [ListaEspera.Estado.ATENDIDO, ListaEspera.Estado.CANCELADO]:
-            return Response(
-                {'error': 'Este turno ya fue procesado'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        paciente.estado = ListaEspera.Estado.CANCELADO
-        paciente.save()
-        
-        serializer = self.get_serializer(paciente)
-        return Response(serializer.data)
+        finales = [ListaEspera.Estado.ATENDIDO, ListaEspera.Estado.CANCELADO]
+        return self._transicion(
+            pk, [e for e in ListaEspera.Estado.values if e not in finales], 'Este turno ya fue procesado',
+            estado=ListaEspera.Estado.CANCELADO,
+        )
 
 class ProductoViewSet(viewsets.ModelViewSet):
     queryset = Producto.objects.all()
@@ -940,58 +1250,82 @@ def api_disponibilidad_horarios(request):
     API para obtener bloques horarios disponibles para una fecha y veterinario.
     
     Parámetros GET:
-        - fecha: Fecha en formato YYYY-MM-DD (requerido)
-        - veterinario_id: ID del veterinario (opcional)
+        - fecha: Fecha en formato YYYY-MM-DD (requerido si no se usa desde/hasta)
+        - veterinario_id: ID del veterinario (opcional). Puede repetirse o
+          separarse por comas para consultar varios veterinarios.
+        - desde / hasta: Rango de fechas YYYY-MM-DD (opcional, modo semana)
     
     Retorna:
         JSON con lista de bloques horarios de 30 minutos (9:00-20:00)
-        Cada bloque indica si está disponible u ocupado
+        Cada bloque indica si está disponible u ocupado, y cada día si es
+        no hábil (domingo o feriado, solo urgencias) con su motivo.
+        En modo múltiple (varios veterinarios o rango de fechas) retorna
+        la grilla completa agrupada por día y veterinario.
     """
     if not request.user.is_authenticated or request.user.rol not in ['RECEPCIONISTA', 'ADMIN']:
         return JsonResponse({'error': 'Unauthorized'}, status=403)
     
-    from datetime import datetime, timedelta
+    from datetime import datetime
+    from .agenda import MAX_DIAS_CONSULTA, bloques_dia, calcular_disponibilidad
+    from .feriados import no_habiles
     
     fecha_str = request.GET.get('fecha')
-    veterinario_id = request.GET.get('veterinario_id')
+    desde_str = request.GET.get('desde')
+    hasta_str = request.GET.get('hasta')
     
-    if not fecha_str:
+    try:
+        veterinario_ids = [
+            int(v) for valor in request.GET.getlist('veterinario_id')
+            for v in valor.split(',') if v.strip()
+        ]
+    except ValueError:
+        return JsonResponse({'error': 'veterinario_id inválido'}, status=400)
+    
+    if not fecha_str and not (desde_str and hasta_str):
         return JsonResponse({'error': 'Fecha requerida'}, status=400)
     
     try:
-        fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+        if desde_str and hasta_str:
+            desde = datetime.strptime(desde_str, '%Y-%m-%d').date()
+            hasta = datetime.strptime(hasta_str, '%Y-%m-%d').date()
+        else:
+            desde = hasta = datetime.strptime(fecha_str, '%Y-%m-%d').date()
     except ValueError:
         return JsonResponse({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}, status=400)
     
-    # Generar bloques de 30 minutos de 9:00 a 20:00
-    bloques = []
-    hora_inicio = 9
-    hora_fin = 20
+    if hasta < desde:
+        return JsonResponse({'error': 'El rango de fechas es inválido'}, status=400)
+    if (hasta - desde).days + 1 > MAX_DIAS_CONSULTA:
+        return JsonResponse({'error': f'El rango no puede superar {MAX_DIAS_CONSULTA} días'}, status=400)
     
-    for hora in range(hora_inicio, hora_fin):
-        for minuto in [0, 30]:
-            inicio = datetime.combine(fecha, datetime.min.time().replace(hour=hora, minute=minuto))
-            fin = inicio + timedelta(minutes=30)
-            
-            # Verificar si hay cita en este bloque
-            citas_query = Cita.objects.filter(
-                fecha_hora__gte=inicio,
-                fecha_hora__lt=fin,
-                estado__in=['AGENDADA', 'CONFIRMADA']
-            )
-            
-            if veterinario_id:
-                citas_query = citas_query.filter(veterinario_id=veterinario_id)
-            
-            ocupado = citas_query.exists()
-            
-            bloques.append({
-                'hora': inicio.strftime('%H:%M'),
-                'datetime': inicio.isoformat(),
-                'disponible': not ocupado
-            })
+    disponibilidad = calcular_disponibilidad(desde, hasta, veterinario_ids)
+    # Domingos y feriados del rango: solo se agendan urgencias
+    cerrados = no_habiles(disponibilidad)
+    
+    # Modo simple: una fecha y a lo más un veterinario (formato original)
+    if desde == hasta and len(veterinario_ids) <= 1 and not desde_str:
+        bitmap = next(iter(disponibilidad[desde].values()))
+        return JSONRapidoResponse({
+            'bloques': bloques_dia(desde, bitmap),
+            'no_habil': desde in cerrados,
+            'motivo': cerrados.get(desde, ''),
+        })
     
-    return JsonResponse({'bloques': bloques})
+    dias = [{
+        'fecha': fecha.isoformat(),
+        'no_habil': fecha in cerrados,
+        'motivo': cerrados.get(fecha, ''),
+        'veterinarios': [{
+            'veterinario_id': vet_id,
+            'bloques': bloques_dia(fecha, bitmap)
+        } for vet_id, bitmap in por_vet.items()]
+    } for fecha, por_vet in disponibilidad.items()]
+    
+    return JSONRapidoResponse({
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'dias': dias
+    })
 
 
 # --- HU006: API para antecedentes de mascota ---
@@ -1000,11 +1334,14 @@ def api_antecedentes_mascota(request, mascota_id):
     API para obtener antecedentes de una mascota.
     
     Retorna:
-        JSON con información básica, historial de citas y última atención
+        JSON con información básica, historial de citas, última atención y
+        resumen clínico (visitas por tipo, operaciones pendientes)
     """
     if not request.user.is_authenticated or request.user.rol not in ['RECEPCIONISTA', 'ADMIN']:
         return JsonResponse({'error': 'Unauthorized'}, status=403)
     
+    from django.utils import timezone
+    
     try:
         mascota = Mascota.objects.get(id=mascota_id)
         
@@ -1018,35 +1355,38 @@ def api_antecedentes_mascota(request, mascota_id):
             'observaciones': mascota.observaciones
         }
         
-        # Últimas 5 citas
-        citas = Cita.objects.filter(mascota=mascota).order_by('-fecha_hora')[:5]
+        # Últimas 5 citas (usa el índice mascota + fecha_hora)
+        citas = Cita.objects.filter(mascota=mascota).select_related('veterinario').order_by('-fecha_hora')[:5]
         historial_citas = [{
-            'fecha': c.fecha_hora.strftime('%d/%m/%Y %H:%M'),
+            'fecha': timezone.localtime(c.fecha_hora).strftime('%d/%m/%Y %H:%M'),
             'tipo': c.get_tipo_display(),
             'estado': c.get_estado_display(),
             'veterinario': c.veterinario.nombre if c.veterinario else 'Sin asignar',
             'motivo': c.motivo
         } for c in citas]
         
-        # Última atención médica
+        # Resumen clínico precalculado: una lectura por clave primaria
+        resumen = ResumenClinico.de(mascota.id)
         ultima_atencion = None
-        try:
-            atencion = Atencion.objects.filter(cita__mascota=mascota).order_by('-fecha').first()
-            if atencion:
-                ultima_atencion = {
-                    'fecha': atencion.fecha.strftime('%d/%m/%Y'),
-                    'diagnostico': atencion.diagnostico,
-                    'tratamiento': atencion.tratamiento,
-                    'medicamentos': atencion.medicamentos,
-                    'requiere_operacion': atencion.requiere_operacion
-                }
-        except:
-            pass
-        
-        return JsonResponse({
+        if resumen.ultima_atencion_id:
+            ultima_atencion = {
+                'fecha': timezone.localtime(resumen.ultima_atencion_fecha).strftime('%d/%m/%Y'),
+                'diagnostico': resumen.ultimo_diagnostico,
+                'tratamiento': resumen.ultimo_tratamiento,
+                'medicamentos': resumen.ultimos_medicamentos,
+                'requiere_operacion': resumen.ultima_requiere_operacion
+            }
+        
+        return JSONRapidoResponse({
             'info_basica': info_basica,
             'historial_citas': historial_citas,
-            'ultima_atencion': ultima_atencion
+            'ultima_atencion': ultima_atencion,
+            'resumen': {
+                'ultima_visita': resumen.ultima_visita,
+                'total_visitas': resumen.total_visitas,
+                'visitas_por_tipo': resumen.visitas_por_tipo,
+                'operaciones_pendientes': resumen.operaciones_pendientes
+            }
         })
         
     except Mascota.DoesNotExist:
@@ -1130,35 +1470,46 @@ def guardar_atencion(request, cita_id):
 @api_view(['POST'])
 @login_required
 def registrar_atencion_walkin(request, lista_id):
+    from django.db.models.functions import Coalesce
+    from django.utils import timezone
+    from .cola import transicion
+
     try:
-        item = ListaEspera.objects.get(id=lista_id)
-        data = request.data
-        
-        # 1. Crear Cita
-        cita = Cita.objects.create(
-            mascota=item.mascota,
-            veterinario=item.veterinario_asignado,  # Asumimos que ya está asignado
-            fecha_hora=timezone.now(),
-            tipo=Cita.Tipo.URGENCIA if item.prioridad == 'URGENTE' else Cita.Tipo.CONSULTA,
-            motivo=item.motivo,
-            estado=Cita.Estado.REALIZADA,
-            es_urgencia=(item.prioridad == 'URGENTE')
-        )
-        
-        # 2. Crear Atención
-        atencion = Atencion.objects.create(
-            cita=cita,
-            diagnostico=data.get('diagnostico'),
-            tratamiento=data.get('tratamiento'),
-            medicamentos=data.get('medicamentos', ''),
-            costo_estimado=data.get('costo_estimado', 0) or 0,
-            requiere_operacion=data.get('requiere_operacion', False) == 'on' or data.get('requiere_operacion') is True
-        )
+        with transaction.atomic():
+            # 1. Cerrar el turno antes de leerlo: solo uno de dos envíos
+            # simultáneos lo logra. fecha_atencion conserva la hora del
+            # llamado si ya la tenía.
+            if not transicion(
+                lista_id, [ListaEspera.Estado.EN_ATENCION],
+                estado=ListaEspera.Estado.ATENDIDO,
+                fecha_atencion=Coalesce('fecha_atencion', timezone.now()),
+            ):
+                if not ListaEspera.objects.filter(id=lista_id).exists():
+                    raise ListaEspera.DoesNotExist
+                return Response({'error': 'Este paciente no está en atención'}, status=409)
+            item = ListaEspera.objects.select_related('mascota', 'veterinario_asignado').get(id=lista_id)
+            data = request.data
+        
+            # 2. Crear Cita
+            cita = Cita.objects.create(
+                mascota=item.mascota,
+                veterinario=item.veterinario_asignado,  # Asumimos que ya está asignado
+                fecha_hora=timezone.now(),
+                tipo=Cita.Tipo.URGENCIA if item.prioridad == 'URGENTE' else Cita.Tipo.CONSULTA,
+                motivo=item.motivo,
+                estado=Cita.Estado.REALIZADA,
+                es_urgencia=(item.prioridad == 'URGENTE')
+            )
         
-        # 3. Actualizar Lista de Espera
-        item.estado = ListaEspera.Estado.ATENDIDO
-        item.fecha_atencion = timezone.now()
-        item.save()
+            # 3. Crear Atención
+            atencion = Atencion.objects.create(
+                cita=cita,
+                diagnostico=data.get('diagnostico'),
+                tratamiento=data.get('tratamiento'),
+                medicamentos=data.get('medicamentos', ''),
+                costo_estimado=data.get('costo_estimado', 0) or 0,
+                requiere_operacion=data.get('requiere_operacion', False) == 'on' or data.get('requiere_operacion') is True
+            )
         
         return Response({'message': 'Atención registrada', 'cita_id': cita.id}, status=201)
 
@@ -1167,22 +1518,186 @@ def registrar_atencion_walkin(request, lista_id):
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
+HISTORIAL_ATENCIONES_POR_PAGINA = 10
+
 @login_required
 def historial_mascota(request, mascota_id):
-    mascota = get_object_or_404(Mascota, id=mascota_id)
+    from django.core.paginator import Paginator
+    
+    mascota = get_object_or_404(Mascota.objects.select_related('cliente'), id=mascota_id)
     # Verificar permisos: dueño o personal
-    if request.user.rol == 'CLIENTE' and mascota.cliente.usuario != request.user:
+    if request.user.rol == 'CLIENTE' and mascota.cliente.usuario_id != request.user.id:
         messages.error(request, "No tienes permiso para ver esta mascota.")
         return redirect('dashboard_cliente')
-        
-    atenciones = Atencion.objects.filter(cita__mascota=mascota).select_related('cita', 'cita__veterinario').order_by('-fecha')
+    
+    # Historial completo paginado (más recientes primero)
+    atenciones = Atencion.objects.filter(cita__mascota=mascota).select_related(
+        'cita', 'cita__veterinario'
+    ).order_by('-fecha', '-id')
+    pagina = Paginator(atenciones, HISTORIAL_ATENCIONES_POR_PAGINA).get_page(request.GET.get('pagina'))
     
     return render(request, 'clinic/historial_mascota.html', {
         'mascota': mascota,
-        'atenciones': atenciones
+        'resumen': ResumenClinico.de(mascota.id),
+        'atenciones': pagina
     })
 
 
+# ===== API DE BÚSQUEDA (TYPEAHEAD) =====
+
+def _limite_busqueda(request):
+    from .busqueda import BUSQUEDA_LIMITE_POR_DEFECTO, BUSQUEDA_LIMITE_MAXIMO
+    try:
+        limite = int(request.GET.get('limite', BUSQUEDA_LIMITE_POR_DEFECTO))
+    except ValueError:
+        limite = BUSQUEDA_LIMITE_POR_DEFECTO
+    return max(1, min(limite, BUSQUEDA_LIMITE_MAXIMO))
+
+
+def api_buscar_clientes(request):
+    """
+    API de búsqueda de clientes para los campos typeahead de recepción.
+    
+    Parámetros GET:
+        - q: RUT o teléfono (en cualquier formato), o nombre/apellido.
+          Sin texto retorna los clientes más recientes.
+        - limite: Máximo de resultados (por defecto 20, máximo 50)
+    """
+    if not request.user.is_authenticated or request.user.rol not in ['RECEPCIONISTA', 'ADMIN']:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    
+    from .busqueda import buscar_clientes
+    
+    clientes = buscar_clientes(request.GET.get('q'), _limite_busqueda(request))
+    resultados = clientes.values('id', 'rut', 'nombre', 'apellido', 'telefono')
+    return JsonResponse(list(resultados), safe=False)
+
+
+def api_buscar_mascotas(request):
+    """
+    API de búsqueda de mascotas (con su dueño) para los campos typeahead.
+    
+    Parámetros GET:
+        - q: Nombre de la mascota, o nombre/RUT/teléfono del dueño
+        - cliente: Restringir a las mascotas de un cliente (opcional)
+        - limite: Máximo de resultados (por defecto 20, máximo 50)
+    """
+    if not request.user.is_authenticated or request.user.rol not in ['RECEPCIONISTA', 'ADMIN']:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    
+    from .busqueda import buscar_mascotas
+    
+    try:
+        cliente_id = int(request.GET['cliente']) if request.GET.get('cliente') else None
+    except ValueError:
+        return JsonResponse({'error': 'Parámetro cliente inválido'}, status=400)
+    
+    mascotas = buscar_mascotas(request.GET.get('q'), _limite_busqueda(request), cliente_id=cliente_id)
+    return JsonResponse([{
+        'id': m.id,
+        'nombre': m.nombre,
+        'especie': m.especie,
+        'cliente_id': m.cliente_id,
+        'cliente_nombre': f"{m.cliente.nombre} {m.cliente.apellido}"
+    } for m in mascotas], safe=False)
+
+
+def api_buscar_atenciones(request):
+    """
+    Búsqueda de texto completo en las atenciones (diagnóstico, tratamiento
+    y medicamentos), para que los veterinarios consulten casos anteriores.
+    
+    Parámetros GET:
+        - q: Texto a buscar (requerido). No distingue acentos
+        - mascota: ID de mascota (opcional)
+        - veterinario: ID de veterinario (opcional)
+        - desde, hasta: Rango de fechas YYYY-MM-DD, ambas inclusive (opcionales)
+        - limite: Máximo de resultados (por defecto 20, máximo 100)
+    """
+    if not request.user.is_authenticated or request.user.rol not in ['VETERINARIO', 'ADMIN']:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    
+    from datetime import date
+    from .busqueda_clinica import (
+        buscar_atenciones, BUSQUEDA_CLINICA_LIMITE_POR_DEFECTO, BUSQUEDA_CLINICA_LIMITE_MAXIMO
+    )
+    from .utils import rango_del_dia
+    
+    q = request.GET.get('q', '').strip()
+    if not q:
+        return JsonResponse({'error': 'El parámetro q es requerido'}, status=400)
+    
+    try:
+        desde = rango_del_dia(date.fromisoformat(request.GET['desde']))[0] if request.GET.get('desde') else None
+        hasta = rango_del_dia(date.fromisoformat(request.GET['hasta']))[1] if request.GET.get('hasta') else None
+    except ValueError:
+        return JsonResponse({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}, status=400)
+    
+    try:
+        limite = int(request.GET.get('limite', BUSQUEDA_CLINICA_LIMITE_POR_DEFECTO))
+        mascota_id = int(request.GET['mascota']) if request.GET.get('mascota') else None
+        veterinario_id = int(request.GET['veterinario']) if request.GET.get('veterinario') else None
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros numéricos inválidos'}, status=400)
+    limite = max(1, min(limite, BUSQUEDA_CLINICA_LIMITE_MAXIMO))
+    
+    atenciones = buscar_atenciones(
+        q, mascota_id=mascota_id, veterinario_id=veterinario_id, desde=desde, hasta=hasta, limite=limite
+    )
+    return JSONRapidoResponse([{
+        'id': a.id,
+        'fecha': a.fecha,
+        'mascota_id': a.cita.mascota_id,
+        'mascota_nombre': a.cita.mascota.nombre,
+        'veterinario': a.cita.veterinario.nombre if a.cita.veterinario else None,
+        'diagnostico': a.diagnostico,
+        'tratamiento': a.tratamiento,
+        'medicamentos': a.medicamentos,
+        'requiere_operacion': a.requiere_operacion,
+        'relevancia': round(a.relevancia, 4),
+    } for a in atenciones], safe=False)
+
+
+
+def api_estadisticas_cache(request):
+    """
+    Aciertos y fallos de la caché (nivel local y compartido) del worker
+    que atiende la petición. Cada worker de gunicorn lleva sus propios
+    contadores; el campo pid indica cuál respondió.
+    """
+    if not request.user.is_authenticated or request.user.rol != 'ADMIN':
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    
+    from django.core.cache import cache
+    
+    if not hasattr(cache, 'estadisticas'):
+        return JsonResponse({'error': 'La caché configurada no entrega estadísticas'}, status=501)
+    return JsonResponse(cache.estadisticas())
+
+
+def api_plantel_veterinarios(request):
+    """
+    Plantel de veterinarios (id, nombre, especialidad) para los selectores
+    del frontend.
+    
+    Sale de la lista en memoria de clinic.plantel. La respuesta lleva un
+    ETag con la versión del plantel: con If-None-Match se responde 304 si
+    no cambió, sin consultar la base de datos.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    
+    from django.utils.cache import get_conditional_response, patch_cache_control
+    
+    version, veterinarios = plantel.plantel()
+    etag = plantel.etag(version)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JSONRapidoResponse({'version': version, 'veterinarios': list(veterinarios)})
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
 # ===== API ENDPOINTS FOR PET MANAGEMENT =====
 
 @api_view(['GET'])
@@ -1215,7 +1730,7 @@ def api_mascotas_cliente(request, cliente_id):
                 'fecha_nacimiento': mascota.fecha_nacimiento.strftime('%Y-%m-%d') if mascota.fecha_nacimiento else ''
             })
         
-        return JsonResponse(pets_data, safe=False)
+        return JSONRapidoResponse(pets_data, safe=False)
     
     except Cliente.DoesNotExist:
         return JsonResponse({'error': 'Cliente no encontrado'}, status=404)
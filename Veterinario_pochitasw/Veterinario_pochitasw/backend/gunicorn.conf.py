@@ -0,0 +1,16 @@
+"""
+Configuración de gunicorn, la misma para start.sh, railway.toml y railway.json.
+
+Workers con hilos (gthread): las peticiones de long-polling de la cola
+walk-in (/api/lista-espera/cambios/) quedan abiertas hasta 25 s ocupando
+un hilo, no el worker completo. clinic.cola limita cuántas esperan a la vez
+en cada proceso (ESPERAS_SIMULTANEAS) para dejar hilos libres.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = 8
+timeout = 120
+errorlog = '-'
@@ -1,5 +1,6 @@
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -110,18 +111,62 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': PROJECT_ROOT / 'base_de_datos' / 'db.sqlite3',
+            'OPTIONS': {
+                # Las transacciones toman el bloqueo de escritura al empezar:
+                # con varios hilos, una transacción que lee y luego escribe
+                # espera su turno en vez de fallar con "database is locked"
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
+            # Base de pruebas en un archivo (no en memoria), para que las
+            # pruebas de concurrencia puedan usar varias conexiones
+            'TEST': {'NAME': os.path.join(tempfile.gettempdir(), 'pochita-test.sqlite3')},
         }
     }
 
-# Cache configuration (requerido para django-ratelimit)
-# Usando DummyCache para desarrollo (compatible con ratelimit)
+# Cache configuration (ratelimit, sesiones y cachés de la app)
+# 'default' es una caché en dos niveles (clinic/cache.py): un LRU en memoria
+# de cada proceso delante de 'compartida', que ven todos los workers.
+# CACHE_URL elige el nivel compartido:
+#   - redis://host:6379/0 (o rediss://): Redis o un servidor compatible
+#     (Valkey, KeyDB...). Requiere el paquete redis
+#   - file:///ruta/al/directorio: archivos en disco (por defecto, en el
+#     directorio temporal del sistema)
+cache_url = os.environ.get('CACHE_URL', '')
+if cache_url.startswith(('redis://', 'rediss://')):
+    cache_compartida = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': cache_url,
+    }
+else:
+    cache_compartida = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': cache_url.removeprefix('file://') or os.path.join(tempfile.gettempdir(), 'pochita-cache'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
+        'BACKEND': 'clinic.cache.TieredCache',
+        'OPTIONS': {
+            'COMPARTIDA': 'compartida',
+            'MAX_ENTRADAS_LOCAL': 1000,
+            'TTL_LOCAL': 5,
+            # Claves que deben verse al instante en todos los workers
+            'SOLO_COMPARTIDA': [
+                'rl:',  # contadores de django-ratelimit
+                'django.contrib.sessions.cached_db',
+                'calendario:semana:', 'calendario:generacion',  # versiones del calendario
+                'plantel:',  # versión del plantel de veterinarios
+                'feriados:',  # versión de los feriados manuales
+            ],
+        },
+    },
+    'compartida': cache_compartida,
 }
 
+RATELIMIT_USE_CACHE = 'default'
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -175,6 +220,11 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # JSON con orjson si está instalado (ver clinic/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'clinic.renderers.JSONRapidoRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 # Spectacular Settings
@@ -222,6 +272,8 @@ if not DEBUG:
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
 SESSION_COOKIE_AGE = 31536000  # 365 días (1 año)
+# Sesiones leídas desde la caché compartida; la base de datos queda como respaldo
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 
 # CSRF Security
 CSRF_COOKIE_HTTPONLY = True
@@ -230,6 +282,7 @@ CSRF_COOKIE_SAMESITE = 'Lax'
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# Silenciar errores de ratelimit en desarrollo
-SILENCED_SYSTEM_CHECKS = ['django_ratelimit.E003']
+# django-ratelimit no reconoce clinic.cache.TieredCache, que es compartida y
+# hace add() e incr() atómicos en el nivel compartido
+SILENCED_SYSTEM_CHECKS = ['django_ratelimit.W001']
 
@@ -14,12 +14,17 @@ python manage.py migrate --noinput || {
     echo "WARNING: Migrations failed, but continuing..."
 }
 
+echo "Indexing attentions for full-text search..."
+python manage.py indexar_atenciones --faltantes || {
+    echo "WARNING: Indexing failed, but continuing..."
+}
+
 echo "Collecting static files..."
 python manage.py collectstatic --noinput || {
     echo "WARNING: Collectstatic failed, but continuing..."
 }
 
 echo "Starting Gunicorn..."
-PORT=${PORT:-8080}
-exec gunicorn pochita_project.wsgi --log-file - --timeout 120 --workers 2 --bind 0.0.0.0:$PORT
+# Workers, hilos y puerto en gunicorn.conf.py (igual que railway.toml/json)
+exec gunicorn pochita_project.wsgi --config gunicorn.conf.py
 
@@ -42,8 +42,18 @@ function initCalendar() {
     }
 }
 
+function formatDateParam(date) {
+    return date.getFullYear() + '-' + String(date.getMonth() + 1).padStart(2, '0') + '-' + String(date.getDate()).padStart(2, '0');
+}
+
 function loadAppointments() {
-    fetch('/api/citas/calendario/')
+    // The API requires a window: request the current week (Mon-Sun)
+    const monday = new Date();
+    monday.setDate(monday.getDate() - ((monday.getDay() + 6) % 7));
+    const nextMonday = new Date(monday);
+    nextMonday.setDate(monday.getDate() + 7);
+
+    fetch(`/api/citas/calendario/?start=${formatDateParam(monday)}&end=${formatDateParam(nextMonday)}`)
         .then(response => response.json())
         .then(data => {
             renderEvents(data);
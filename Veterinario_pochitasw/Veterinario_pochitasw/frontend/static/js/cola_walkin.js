@@ -0,0 +1,73 @@
+/**
+ * Sincronización de la cola walk-in del día.
+ *
+ * Usa long-polling sobre /api/lista-espera/cambios/: el servidor mantiene
+ * la petición abierta hasta que la cola cambia y responde solo con los
+ * registros modificados. El estado completo se mantiene aquí y se entrega
+ * a `alCambiar` como lista ordenada por número de turno, junto con las
+ * predicciones del servidor: {id: [posición, minutos estimados]}.
+ */
+function suscribirColaWalkin(alCambiar) {
+    const ESTADOS_EN_COLA = ['ESPERANDO', 'EN_ATENCION'];
+    const REINTENTO_MS = 5000;
+    const cola = new Map();
+    let predicciones = {};
+    let version = null;
+
+    function aplicar(respuesta) {
+        if (respuesta.completo) {
+            cola.clear();
+        }
+        respuesta.cambios.forEach(p => {
+            if (ESTADOS_EN_COLA.includes(p.estado)) {
+                cola.set(p.id, p);
+            } else {
+                cola.delete(p.id);
+            }
+        });
+        // Quitar registros eliminados o de días anteriores
+        if (respuesta.ids) {
+            const vigentes = new Set(respuesta.ids);
+            for (const id of cola.keys()) {
+                if (!vigentes.has(id)) cola.delete(id);
+            }
+        }
+        if (respuesta.predicciones) {
+            predicciones = respuesta.predicciones;
+        }
+        alCambiar([...cola.values()].sort((a, b) => a.numero_turno - b.numero_turno), predicciones);
+    }
+
+    function esperar() {
+        const url = version === null
+            ? '/api/lista-espera/cambios/'
+            : `/api/lista-espera/cambios/?version=${version}`;
+
+        fetch(url)
+            .then(r => {
+                if (!r.ok) throw new Error(`HTTP error! status: ${r.status}`);
+                return r.json();
+            })
+            .then(respuesta => {
+                if (respuesta.completo || respuesta.cambios.length > 0 || respuesta.ids) {
+                    aplicar(respuesta);
+                }
+                version = respuesta.version;
+                esperar();
+            })
+            .catch(err => {
+                console.error('Error sincronizando la cola:', err);
+                setTimeout(esperar, REINTENTO_MS);
+            });
+    }
+
+    esperar();
+}
+
+/**
+ * Minutos que lleva esperando un paciente (null si ya no está en espera).
+ */
+function minutosEsperando(paciente) {
+    if (paciente.estado !== 'ESPERANDO') return null;
+    return Math.max(0, Math.floor((Date.now() - new Date(paciente.fecha_solicitud)) / 60000));
+}